@@ -0,0 +1,145 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Hashable, List, Tuple
+
+
+class RateLimiter:
+    """Token buckets per client and budget, in O(1) memory per active client.
+    
+    Each budget (e.g. "lookup" and "list") has a refill rate per second and
+    a burst size. A bucket is two floats: its token count and when it was
+    last refilled; refilling happens lazily on access. Buckets are kept in
+    least-recently-used order, so the idle ones are always at the front:
+    once a bucket has been idle long enough to have refilled completely it
+    is indistinguishable from a new one and is dropped. `max_clients` caps
+    the table for floods of distinct clients by dropping the least recently
+    seen bucket, which only ever resets a client to a full bucket.
+    """
+    
+    def __init__(self, budgets: Dict[str, Tuple[float, float]], max_clients: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self._budgets = budgets
+        self._max_clients = max_clients
+        self._clock = clock
+        # Seconds after which any bucket has refilled
+        self._idle_seconds = max(burst / rate for rate, burst in budgets.values())
+        # (client, budget) -> [tokens, last refill]
+        self._buckets: "OrderedDict[Tuple[Hashable, str], List[float]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def acquire(self, client: Hashable, budget: str, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 if allowed, else the seconds until it would be"""
+        rate, burst = self._budgets[budget]
+        now = self._clock()
+        key = (client, budget)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [burst, now]
+            self._evict(now)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate
+    
+    def _evict(self, now: float):
+        buckets = self._buckets
+        # Two idle buckets per new one keeps the table from growing past the active set
+        for _ in range(2):
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self._idle_seconds:
+                break
+            del buckets[key]
+        while len(buckets) > self._max_clients:
+            buckets.popitem(last=False)
+
+
+class AdmissionMiddleware:
+    """Caps the number of requests being handled at once.
+    
+    Requests beyond `max_concurrency` wait in a FIFO queue for a free slot.
+    When the queue already holds `max_queue` requests, or a request has
+    waited `queue_timeout` seconds, it is answered with 503 and a
+    Retry-After header straight away, before any routing, body parsing or
+    store work, so overload costs the event loop almost nothing. A slot
+    is handed directly from a finishing request to the oldest waiter.
+    """
+    
+    def __init__(self, app, max_concurrency: int, max_queue: int = 100, queue_timeout: float = 1.0):
+        self.app = app
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if not await self._admit():
+            self.rejected += 1
+            await _send_error(send, 503, "Server is busy, retry later", math.ceil(self._queue_timeout))
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._release()
+    
+    async def _admit(self) -> bool:
+        if self._active < self._max_concurrency and not self._waiters:
+            self._active += 1
+            return True
+        if len(self._waiters) >= self._max_queue:
+            return False
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        # asyncio.wait never cancels the waiter, so a slot handed over just
+        # as the timeout fires is still seen here and not lost
+        try:
+            await asyncio.wait((waiter,), timeout=self._queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while queued; pass on a slot it was just given
+            if waiter.done():
+                self._release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        if waiter.done():
+            return True
+        self._waiters.remove(waiter)
+        waiter.cancel()
+        return False
+    
+    def _release(self):
+        if self._waiters:
+            # The slot passes to the next waiter, so the active count stays
+            self._waiters.popleft().set_result(None)
+        else:
+            self._active -= 1
+
+
+async def _send_error(send, status: int, detail: str, retry_after: int):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,124 @@
+import itertools
+import logging
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from models import LowStockEvent
+from timers import TimerHeap
+
+logger = logging.getLogger(__name__)
+
+Consumer = Callable[[LowStockEvent], None]
+# (event, consumer, attempts made so far)
+Delivery = Tuple[LowStockEvent, Consumer, int]
+
+
+class AlertDispatcher:
+    """Delivers low-stock events to consumers from a background thread.
+    
+    `publish` only appends to an in-memory queue, so it is safe to call
+    from the store's write path. The worker calls each consumer in turn;
+    a consumer that raises is retried with exponential backoff until
+    `max_attempts` is reached. A consumer can be any callable, e.g. a
+    webhook from `webhook_consumer` or `queue.Queue.put_nowait` for an
+    in-process reader. When more than `max_pending` deliveries are waiting,
+    new events are dropped and counted rather than blocking the writer.
+    """
+    
+    def __init__(self, max_attempts: int = 5, retry_base_seconds: float = 1.0,
+                 max_pending: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self._max_attempts = max_attempts
+        self._retry_base = retry_base_seconds
+        self._max_pending = max_pending
+        self._clock = clock
+        self._consumers: List[Consumer] = []
+        self._condition = threading.Condition()
+        self._ready: Deque[Delivery] = deque()
+        # Failed deliveries waiting for their next attempt
+        self._retries = TimerHeap()
+        self._waiting: Dict[int, Delivery] = {}
+        self._retry_ids = itertools.count()
+        self._worker: Optional[threading.Thread] = None
+        self._running = False
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+    
+    def subscribe(self, consumer: Consumer):
+        with self._condition:
+            self._consumers.append(consumer)
+    
+    def publish(self, event: LowStockEvent):
+        with self._condition:
+            if not self._consumers:
+                return
+            if len(self._ready) + len(self._waiting) + len(self._consumers) > self._max_pending:
+                self.dropped += 1
+                return
+            self._ready.extend((event, consumer, 0) for consumer in self._consumers)
+            self._condition.notify()
+    
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._worker = threading.Thread(target=self._run, name="alerts", daemon=True)
+        self._worker.start()
+    
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker once the current delivery returns; queued events are discarded"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._worker:
+            self._worker.join(timeout)
+            self._worker = None
+        pending = len(self._ready) + len(self._waiting)
+        if pending:
+            logger.warning("Discarding %d undelivered low-stock alert(s)", pending)
+    
+    def _next_delivery(self) -> Optional[Delivery]:
+        """Wait for a delivery that is due; returns None once stopped"""
+        with self._condition:
+            while self._running:
+                for retry_id in self._retries.pop_due(self._clock()):
+                    self._ready.append(self._waiting.pop(retry_id))
+                if self._ready:
+                    return self._ready.popleft()
+                deadline = self._retries.next_deadline()
+                self._condition.wait(None if deadline is None else max(deadline - self._clock(), 0))
+            return None
+    
+    def _run(self):
+        while (delivery := self._next_delivery()) is not None:
+            event, consumer, attempts = delivery
+            try:
+                consumer(event)
+            except Exception as e:
+                attempts += 1
+                with self._condition:
+                    if attempts >= self._max_attempts:
+                        self.failed += 1
+                        logger.error("Giving up on low-stock alert %d after %d attempts: %s", event.id, attempts, e)
+                        continue
+                    retry_id = next(self._retry_ids)
+                    self._waiting[retry_id] = (event, consumer, attempts)
+                    self._retries.schedule(retry_id, self._clock() + self._retry_base * 2 ** (attempts - 1))
+            else:
+                with self._condition:
+                    self.delivered += 1
+
+
+def webhook_consumer(url: str, timeout: float = 5.0) -> Consumer:
+    """POST each event as JSON to `url`; any error or non-2xx response triggers a retry"""
+    def deliver(event: LowStockEvent):
+        request = urllib.request.Request(
+            url, data=event.model_dump_json().encode(), method="POST",
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+    return deliver
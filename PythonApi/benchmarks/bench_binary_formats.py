@@ -0,0 +1,79 @@
+"""Binary list format benchmark.
+
+Fetches the full catalog listing and the listing of the largest category
+as JSON, row-shaped MessagePack and columnar MessagePack, and reports the
+body size, the server time per request (the catalog listing rendered
+cold, as after a write, and from the per-version cache) and the time a
+consumer spends decoding the body. Decoding MessagePack uses the msgpack
+package when it is installed; the server side needs only the standard
+library.
+
+    python benchmarks/bench_binary_formats.py [--products 50000] [--requests 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+from binary_format import COLUMNAR, MSGPACK
+from seeding import generate_catalog
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = (("JSON", "application/json"), ("MessagePack", MSGPACK), ("columnar", COLUMNAR))
+
+
+def decode_time(media_type: str, body: bytes) -> str:
+    if media_type == "application/json":
+        decode = json.loads
+    elif msgpack is not None:
+        decode = msgpack.unpackb
+    else:
+        return "   (msgpack not installed)"
+    start = time.perf_counter()
+    decode(body)
+    return f"{(time.perf_counter() - start) * 1000:8.2f} ms to decode"
+
+
+async def run(client: httpx.AsyncClient, path: str, requests: int, cold: bool):
+    for name, media_type in FORMATS:
+        headers = {"Accept": media_type, "Accept-Encoding": "identity"}
+        (await client.get(path, headers=headers)).raise_for_status()
+        start = time.perf_counter()
+        for _ in range(requests):
+            if cold:
+                main.listing_cache.clear()
+            response = await client.get(path, headers=headers)
+        elapsed = (time.perf_counter() - start) / requests
+        label = f"{path.split('?')[0]} {name}{' cold' if cold else ''}"
+        print(f"{label:>40}: {len(response.content) / 1e6:6.2f} MB  {elapsed * 1000:8.2f} ms/request"
+              f"  {decode_time(media_type, response.content)}")
+
+
+async def run_all(requests: int, category_id: int):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run(client, "/api/Products", requests, cold=True)
+        await run(client, "/api/Products", requests, cold=False)
+        await run(client, f"/api/Products/category/{category_id}", requests, cold=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    
+    main.db.clear_data()
+    main.db.bulk_load(*generate_catalog(args.products, 100, 0))
+    largest = max(main.db.get_all_categories(), key=lambda category: category.productCount)
+    asyncio.run(run_all(args.requests, largest.id))
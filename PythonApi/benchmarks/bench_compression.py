@@ -0,0 +1,78 @@
+"""Catalog listing compression benchmark.
+
+Requests GET /api/Products over a synthetic catalog with each content
+coding and reports the bytes on the wire and the server time per request:
+
+- cold: the cache is emptied before every request, so each one renders
+  (and compresses) the listing, as when every read follows a write
+- cached: repeated reads of an unchanged store, served from the
+  per-version cache
+- level N: the cost of a single compression of the full listing at each
+  zlib level, to weigh CPU against bandwidth when picking
+  Settings.compression_level
+
+    python benchmarks/bench_compression.py [--products 50000] [--requests 50]
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+from seeding import generate_catalog
+
+CODINGS = ("identity", "gzip", "deflate")
+
+
+async def run(client: httpx.AsyncClient, coding: str, requests: int, cold: bool):
+    wire_bytes = 0
+    if not cold:
+        # Fill the cache for this coding first
+        (await client.get("/api/Products", headers={"Accept-Encoding": coding})).raise_for_status()
+    start = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            main.listing_cache.clear()
+        async with client.stream("GET", "/api/Products", headers={"Accept-Encoding": coding}) as response:
+            response.raise_for_status()
+            # Raw bytes, so the client does not spend time decompressing
+            wire_bytes = sum([len(chunk) async for chunk in response.aiter_raw()])
+    elapsed = time.perf_counter() - start
+    label = f"{'cold' if cold else 'cached'} {coding}"
+    print(f"{label:>18}: {wire_bytes / 1e6:7.2f} MB  {elapsed / requests * 1000:8.2f} ms/request")
+
+
+async def run_all(requests: int):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for cold in (True, False):
+            for coding in CODINGS:
+                await run(client, coding, requests, cold)
+
+
+def run_levels():
+    _, body = main.db.get_versioned_products()
+    body = main.listing_encoder.dump_json(body)
+    for level in (1, 6, 9):
+        start = time.perf_counter()
+        size = len(gzip.compress(body, compresslevel=level, mtime=0))
+        elapsed = time.perf_counter() - start
+        print(f"{f'gzip level {level}':>18}: {size / 1e6:7.2f} MB  {elapsed * 1000:8.2f} ms/compression"
+              f"  ({len(body) / size:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    
+    main.db.clear_data()
+    main.db.bulk_load(*generate_catalog(args.products, 100, 0))
+    asyncio.run(run_all(args.requests))
+    run_levels()
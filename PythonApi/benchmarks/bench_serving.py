@@ -0,0 +1,127 @@
+"""Serving profile load test.
+
+Starts run_app.py in a fresh process for each profile (Settings.server_*
+through environment variables) over a synthetic catalog and drives it
+with many concurrent keep-alive connections sending GET /api/Products/{id}
+for random ids. Reports throughput, latency percentiles and how many
+requests were turned away with 503. The load generator is a minimal
+HTTP/1.1 client on asyncio streams, so that the server rather than the
+client is the bottleneck; it can also connect over a Unix socket.
+
+    python benchmarks/bench_serving.py [--connections 64] [--seconds 5] [--products 10000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 8771
+SOCKET = os.path.join(tempfile.gettempdir(), "bench_serving.sock")
+
+# name -> (environment, client keeps connections open)
+PROFILES = {
+    "uvicorn defaults": ({"SERVER_LOOP": "asyncio", "SERVER_HTTP": "h11", "SERVER_KEEP_ALIVE_SECONDS": "5",
+                          "SERVER_ACCESS_LOG": "true"}, True),
+    "tuned": ({"SERVER_ACCESS_LOG": "false"}, True),
+    "tuned, no client keep-alive": ({"SERVER_ACCESS_LOG": "false"}, False),
+    "tuned, unix socket": ({"SERVER_ACCESS_LOG": "false", "SERVER_UDS": SOCKET}, True),
+    "tuned, limit_concurrency=16": ({"SERVER_ACCESS_LOG": "false", "SERVER_LIMIT_CONCURRENCY": "16"}, True),
+}
+
+
+async def connect(uds: bool):
+    if uds:
+        return await asyncio.open_unix_connection(SOCKET)
+    return await asyncio.open_connection("127.0.0.1", PORT)
+
+
+async def request(reader, writer, path: str, keep_alive: bool) -> int:
+    connection = b"keep-alive" if keep_alive else b"close"
+    writer.write(b"GET " + path.encode() + b" HTTP/1.1\r\nHost: bench\r\nConnection: " + connection + b"\r\n\r\n")
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head[9:12])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            length = int(line[15:])
+    await reader.readexactly(length)
+    return status
+
+
+async def connection(uds: bool, keep_alive: bool, products: int, deadline: float, latencies, statuses):
+    writer = None
+    while time.perf_counter() < deadline:
+        path = f"/api/Products/{random.randint(1, products)}"
+        start = time.perf_counter()
+        if writer is None:
+            reader, writer = await connect(uds)
+        status = await request(reader, writer, path, keep_alive)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive or status == 503:
+            # The server closes the connection after these
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(uds: bool, keep_alive: bool, connections: int, seconds: float, products: int):
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(connection(uds, keep_alive, products, deadline, latencies, statuses)
+                           for _ in range(connections)))
+    return latencies, statuses
+
+
+async def wait_until_ready(uds: bool):
+    for _ in range(600):
+        try:
+            reader, writer = await connect(uds)
+            status = await request(reader, writer, "/api/Products/1", True)
+            writer.close()
+            if status == 200:
+                return
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def run(name: str, connections: int, seconds: float, products: int):
+    environment, keep_alive = PROFILES[name]
+    uds = "SERVER_UDS" in environment
+    env = dict(os.environ, PORT=str(PORT), SEED_MODE="synthetic", SEED_PRODUCTS=str(products), **environment)
+    server = subprocess.Popen([sys.executable, "run_app.py"], cwd=APP_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_until_ready(uds))
+        latencies, statuses = asyncio.run(load(uds, keep_alive, connections, seconds, products))
+    finally:
+        server.terminate()
+        server.wait()
+    
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{name:>30}: {statuses.get(200, 0) / seconds:8.0f} ok/s  {statuses.get(503, 0) / seconds:8.0f} 503/s"
+          f"  p50 {p50:6.1f} ms  p99 {p99:6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--profile", choices=list(PROFILES), action="append",
+                        help="Profiles to run (default: all)")
+    args = parser.parse_args()
+    
+    for name in args.profile or PROFILES:
+        run(name, args.connections, args.seconds, args.products)
@@ -0,0 +1,59 @@
+"""Single-flight benchmark for identical concurrent reads.
+
+Sends bursts of identical GET /api/Products/category/{id} requests for
+the largest category, all at once, as after a cache expiry, with
+single-flight on and off. Reports the time until the whole burst is
+answered and how many scans were run for it. A last pass interleaves
+writes to the category between bursts, so each burst reads a new store
+version.
+
+    python benchmarks/bench_single_flight.py [--products 50000] [--burst 200] [--bursts 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+from seeding import generate_catalog
+
+
+async def run(label: str, category_id: int, burst: int, bursts: int, enabled: bool, write: bool):
+    main.settings.single_flight_enabled = enabled
+    executions = sum(main.single_flight.executions.values())
+    product_id = main.db.get_products_by_category(category_id, ["id"])[0]["id"]
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        path = f"/api/Products/category/{category_id}"
+        elapsed = 0.0
+        for n in range(bursts):
+            if write:
+                main.db.adjust_product_inventory(product_id, -1 if n % 2 else 1)
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.get(path) for _ in range(burst)))
+            elapsed += time.perf_counter() - start
+            for response in responses:
+                response.raise_for_status()
+    scans = sum(main.single_flight.executions.values()) - executions if enabled else burst * bursts
+    print(f"{label:>28}: {elapsed / bursts * 1000:8.1f} ms/burst of {burst}  {scans / bursts:6.1f} scans/burst")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=5)
+    args = parser.parse_args()
+    
+    main.db.clear_data()
+    main.db.bulk_load(*generate_catalog(args.products, 100, 0))
+    largest = max(main.db.get_all_categories(), key=lambda category: category.productCount)
+    print(f"category {largest.id}: {largest.productCount} products")
+    
+    asyncio.run(run("single-flight off", largest.id, args.burst, args.bursts, enabled=False, write=False))
+    asyncio.run(run("single-flight on", largest.id, args.burst, args.bursts, enabled=True, write=False))
+    asyncio.run(run("on, write between bursts", largest.id, args.burst, args.bursts, enabled=True, write=True))
@@ -0,0 +1,64 @@
+"""Cold start benchmark.
+
+Starts uvicorn in a fresh process for each startup mode and measures how
+long it takes until the server answers requests, and how long the first
+OpenAPI request (what the docs UI waits for) takes after that.
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure(mode: str) -> tuple:
+    port = free_port()
+    env = dict(os.environ, STARTUP_MODE=mode)
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/Products/1", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.005)
+        ready = time.perf_counter()
+        httpx.get(f"http://127.0.0.1:{port}/openapi.json").raise_for_status()
+        schema = time.perf_counter()
+        return (ready - start) * 1000, (schema - ready) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    
+    for mode in ("standard", "fast"):
+        ready_samples, schema_samples = [], []
+        for _ in range(args.runs):
+            ready_ms, schema_ms = measure(mode)
+            ready_samples.append(ready_ms)
+            schema_samples.append(schema_ms)
+        print(f"{mode:>9}: ready {statistics.median(ready_samples):6.0f} ms, "
+              f"first schema {statistics.median(schema_samples):5.1f} ms (medians of {args.runs})")
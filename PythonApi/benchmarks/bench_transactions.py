@@ -0,0 +1,121 @@
+"""Multi-operation transaction benchmark.
+
+Applies the same groups of changes (move and reprice a product, sell one
+unit, rename its new category) as individual calls and as transactions.
+The store pass compares one lock acquisition per change with one lock
+acquisition and undo log per group, from one thread and from contending
+writer threads; a last store pass measures groups that fail on a final
+operation and are rolled back. The API pass compares three requests per
+group with a single POST /api/Transactions.
+
+    python benchmarks/bench_transactions.py [--groups 20000] [--threads 8] [--requests 2000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import main
+from database import InMemoryDatabase, TransactionError
+from models import ProductStatus, TransactionOperation
+
+CATEGORIES = 10
+
+
+def setup(db: InMemoryDatabase, products: int):
+    categories = [db.create_category(f"Bench category {i}") for i in range(CATEGORIES)]
+    ids = [db.create_product(f"Bench product {i}", f"TXB-{i:06d}", 1_000_000, 1.0, category_id=categories[i % CATEGORIES])
+           for i in range(products)]
+    return categories, ids
+
+
+def operations(categories, id: int, n: int, fail: bool = False):
+    category = categories[n % CATEGORIES]
+    return [
+        TransactionOperation(op="updateProduct", id=id, price=1.0 + n % 7, categoryId=category),
+        TransactionOperation(op="adjustInventory", id=id, delta=-1),
+        TransactionOperation(op="updateCategory", id=category, name=f"Bench category {n % CATEGORIES}"),
+        *([TransactionOperation(op="adjustInventory", id=id, delta=-10_000_000)] if fail else []),
+    ]
+
+
+def individual(db: InMemoryDatabase, categories, id: int, n: int):
+    product = db.get_product_by_id(id)
+    category = categories[n % CATEGORIES]
+    db.update_product(id, product.name, product.sku, product.quantity, 1.0 + n % 7, ProductStatus.InStock,
+                      product.description, category)
+    db.adjust_product_inventory(id, -1)
+    db.update_category(category, f"Bench category {n % CATEGORIES}")
+
+
+def run_store(label: str, groups: int, threads: int, mode: str):
+    db = InMemoryDatabase()
+    categories, ids = setup(db, 1000)
+    per_thread = groups // threads
+    # Operations are built up front, as request parsing would have done
+    work = [(n, operations(categories, ids[n % len(ids)], n, fail=mode == "rollback")) for n in range(groups)]
+    
+    def writer(offset: int):
+        for n, group in work[offset:offset + per_thread]:
+            if mode == "individual":
+                individual(db, categories, ids[n % len(ids)], n)
+                continue
+            try:
+                db.apply_transaction(group)
+            except TransactionError:
+                pass
+    
+    workers = [threading.Thread(target=writer, args=(i * per_thread,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    print(f"{label:>24}: {per_thread * threads / elapsed:9.0f} groups/s  ({threads} thread(s))")
+
+
+async def run_api(label: str, requests: int, transactional: bool):
+    main.db.clear_data()
+    categories, ids = setup(main.db, 1000)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for n in range(requests):
+            id, category = ids[n % len(ids)], categories[n % CATEGORIES]
+            if transactional:
+                response = await client.post("/api/Transactions", json={"operations": [
+                    operation.model_dump(exclude_unset=True) for operation in operations(categories, id, n)
+                ]})
+                response.raise_for_status()
+                continue
+            
+            product = (await client.get(f"/api/Products/{id}")).json()
+            product.update(price=1.0 + n % 7, categoryId=category)
+            (await client.put(f"/api/Products/{id}", json=product)).raise_for_status()
+            (await client.post(f"/api/Products/{id}/inventory/adjustments", json={"delta": -1})).raise_for_status()
+            (await client.put(f"/api/ProductCategories/{category}",
+                              json={"name": f"Bench category {n % CATEGORIES}", "isActive": True})).raise_for_status()
+        elapsed = time.perf_counter() - start
+    print(f"{label:>24}: {requests / elapsed:9.0f} groups/s  (API)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    
+    for threads in (1, args.threads):
+        run_store("individual calls", args.groups, threads, "individual")
+        run_store("transactions", args.groups, threads, "commit")
+        run_store("rolled-back transactions", args.groups, threads, "rollback")
+    
+    asyncio.run(run_api("individual requests", args.requests, transactional=False))
+    asyncio.run(run_api("transaction requests", args.requests, transactional=True))
@@ -0,0 +1,39 @@
+import asyncio
+from collections import Counter
+from typing import Callable, Dict, Hashable, Tuple, TypeVar
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Shares one in-flight computation among identical concurrent reads.
+    
+    Keys are tuples whose first item names the kind of read. The first
+    caller for a key runs the computation in the threadpool; callers with
+    the same key that arrive before it finishes wait for the same result
+    instead of computing it again. Nothing is kept afterwards, so later
+    callers always compute afresh. Callers that include the store version
+    in the key never share a result computed before their own writes.
+    Must be used from a single event loop.
+    """
+    
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        # Per kind of read: computations run, and callers that shared one
+        self.executions: Counter = Counter()
+        self.coalesced: Counter = Counter()
+    
+    async def run(self, key: Tuple[Hashable, ...], compute: Callable[[], T]) -> T:
+        future = self._in_flight.get(key)
+        if future is None:
+            self.executions[key[0]] += 1
+            future = self._in_flight[key] = asyncio.ensure_future(run_in_threadpool(compute))
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced[key[0]] += 1
+        # A caller that goes away must not cancel the computation for the others
+        return await asyncio.shield(future)
+    
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,158 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+# Content codings that can be produced, most preferred first when a client
+# accepts several equally
+ENCODINGS = ("gzip", "deflate")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The supported coding an Accept-Encoding header prefers, or None for identity"""
+    if not accept_encoding:
+        return None
+    
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    
+    best, best_weight = None, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, coding: str, level: int) -> bytes:
+    if coding == "gzip":
+        # A fixed mtime keeps the output identical for identical bodies
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if coding == "deflate":
+        # HTTP "deflate" is the zlib format, not a raw deflate stream
+        return zlib.compress(body, level)
+    raise ValueError(f"Unsupported content coding '{coding}'")
+
+
+class _Entry:
+    __slots__ = ("version", "body", "encoded", "size")
+    
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        # Content coding -> compressed body, filled in on first request
+        self.encoded: Dict[str, bytes] = {}
+        self.size = len(body)
+
+
+class EncodedResponseCache:
+    """Encoded response bodies, and their compressed forms, per store version.
+    
+    Each key (e.g. a listing and its fields= projection) holds the body
+    rendered at one store version. A request at the same version reuses
+    it, and each content coding is compressed at most once per version,
+    so a hot listing costs one render and one compression per coding
+    between writes instead of both on every request. Bodies under
+    `min_size` are sent uncompressed, where the framing overhead and CPU
+    would outweigh the saving. Entries are evicted least recently used
+    once the cached bytes exceed `max_bytes`; the newest entry is always
+    kept.
+    
+    Thread-safe. Rendering and compression run outside the cache's lock,
+    so `lookup` answers hits from the event loop without waiting on a
+    miss that `get` is filling in from a worker thread.
+    """
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, min_size: int = 1024, level: int = 6):
+        self._max_bytes = max_bytes
+        self._min_size = min_size
+        self._level = level
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @property
+    def cached_bytes(self) -> int:
+        return self._bytes
+    
+    def get(self, key: Hashable, version: int, render: Callable[[], Tuple[int, bytes]],
+            coding: Optional[str] = None) -> Tuple[bytes, Optional[str]]:
+        """The body for `key` at `version` and the coding it is in (None when uncompressed).
+        
+        `render` is called when nothing is cached for this version and
+        returns the body together with the version it was rendered at,
+        which may be newer than `version` if a write landed in between.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(key)
+            else:
+                entry = None
+        if entry is None:
+            rendered_version, body = render()
+            with self._lock:
+                entry = self._put(key, rendered_version, body)
+        
+        if coding is None or len(entry.body) < self._min_size:
+            return entry.body, None
+        body = entry.encoded.get(coding)
+        if body is None:
+            body = compress(entry.body, coding, self._level)
+            with self._lock:
+                # Unless another thread got there first or the entry was evicted meanwhile
+                if coding not in entry.encoded and self._entries.get(key) is entry:
+                    entry.encoded[coding] = body
+                    entry.size += len(body)
+                    self._bytes += len(body)
+                    self._evict()
+        return body, coding
+    
+    def lookup(self, key: Hashable, version: int, coding: Optional[str] = None
+               ) -> Optional[Tuple[bytes, Optional[str]]]:
+        """What `get` would return, if it needs neither a render nor a compression; otherwise None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            if coding is None or len(entry.body) < self._min_size:
+                return entry.body, None
+            body = entry.encoded.get(coding)
+            return (body, coding) if body is not None else None
+    
+    def _put(self, key: Hashable, version: int, body: bytes) -> _Entry:
+        old = self._entries.get(key)
+        if old is not None and old.version > version:
+            return old  # A newer render finished first
+        self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        entry = self._entries[key] = _Entry(version, body)
+        self._bytes += entry.size
+        self._evict()
+        return entry
+    
+    def _evict(self):
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
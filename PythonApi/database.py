@@ -1,270 +1,1593 @@
-from typing import List, Optional
-from models import ProductItem, Product, ProductCategoryItem, ProductCategory, ProductStatus
-import threading
-
-
-class InMemoryDatabase:
-    def __init__(self):
-        self._products: List[Product] = []
-        self._categories: List[ProductCategory] = []
-        self._next_product_id = 1
-        self._next_category_id = 1
-        self._lock = threading.Lock()
-        
-        # Initialize with some sample data
-        self._initialize_sample_data()
-    
-    def _initialize_sample_data(self):
-        """Initialize database with sample categories and products"""
-        # Create sample categories
-        categories = [
-            {"name": "Electronics", "description": "Electronic devices and accessories"},
-            {"name": "Clothing", "description": "Apparel and fashion items"},
-            {"name": "Books", "description": "Books and educational materials"},
-            {"name": "Home & Garden", "description": "Home improvement and garden supplies"},
-            {"name": "Sports", "description": "Sports equipment and accessories"}
-        ]
-        
-        for cat_data in categories:
-            category = ProductCategory(
-                id=self._next_category_id,
-                name=cat_data["name"],
-                description=cat_data["description"],
-                isActive=True
-            )
-            self._categories.append(category)
-            self._next_category_id += 1
-        
-        # Create sample products
-        products = [
-            {"name": "Wireless Headphones", "sku": "WH-001", "price": 199.99, "quantity": 50, "categoryId": 1},
-            {"name": "Smartphone", "sku": "SP-002", "price": 699.99, "quantity": 25, "categoryId": 1},
-            {"name": "Cotton T-Shirt", "sku": "CT-003", "price": 29.99, "quantity": 100, "categoryId": 2},
-            {"name": "Jeans", "sku": "JN-004", "price": 79.99, "quantity": 75, "categoryId": 2},
-            {"name": "Python Programming Book", "sku": "PB-005", "price": 49.99, "quantity": 30, "categoryId": 3},
-            {"name": "Garden Hose", "sku": "GH-006", "price": 39.99, "quantity": 20, "categoryId": 4},
-            {"name": "Basketball", "sku": "BB-007", "price": 24.99, "quantity": 15, "categoryId": 5}
-        ]
-        
-        for prod_data in products:
-            product = Product(
-                id=self._next_product_id,
-                name=prod_data["name"],
-                sku=prod_data["sku"],
-                price=prod_data["price"],
-                quantity=prod_data["quantity"],
-                status=ProductStatus.InStock if prod_data["quantity"] > 0 else ProductStatus.OutOfStock,
-                categoryId=prod_data["categoryId"]
-            )
-            self._products.append(product)
-            self._next_product_id += 1
-    
-    # Product methods
-    def get_all_products(self) -> List[ProductItem]:
-        with self._lock:
-            result = []
-            for product in self._products:
-                category_name = None
-                if product.categoryId:
-                    category = self.get_category_by_id(product.categoryId)
-                    category_name = category.name if category else None
-                
-                result.append(ProductItem(
-                    id=product.id,
-                    name=product.name,
-                    sku=product.sku,
-                    quantity=product.quantity,
-                    price=product.price,
-                    status=product.status,
-                    description=product.description,
-                    categoryId=product.categoryId,
-                    categoryName=category_name
-                ))
-            return result
-    
-    def get_product_by_id(self, id: int) -> Optional[Product]:
-        with self._lock:
-            for product in self._products:
-                if product.id == id:
-                    return product
-            return None
-    
-    def get_product_by_sku(self, sku: str) -> Optional[Product]:
-        with self._lock:
-            for product in self._products:
-                if product.sku == sku:
-                    return product
-            return None
-    
-    def get_products_by_status(self, status: ProductStatus) -> List[ProductItem]:
-        with self._lock:
-            result = []
-            for product in self._products:
-                if product.status == status:
-                    category_name = None
-                    if product.categoryId:
-                        category = self.get_category_by_id(product.categoryId)
-                        category_name = category.name if category else None
-                    
-                    result.append(ProductItem(
-                        id=product.id,
-                        name=product.name,
-                        sku=product.sku,
-                        quantity=product.quantity,
-                        price=product.price,
-                        status=product.status,
-                        description=product.description,
-                        categoryId=product.categoryId,
-                        categoryName=category_name
-                    ))
-            return result
-    
-    def get_products_by_category(self, category_id: int) -> List[ProductItem]:
-        with self._lock:
-            result = []
-            category = self.get_category_by_id(category_id)
-            category_name = category.name if category else None
-            
-            for product in self._products:
-                if product.categoryId == category_id:
-                    result.append(ProductItem(
-                        id=product.id,
-                        name=product.name,
-                        sku=product.sku,
-                        quantity=product.quantity,
-                        price=product.price,
-                        status=product.status,
-                        description=product.description,
-                        categoryId=product.categoryId,
-                        categoryName=category_name
-                    ))
-            return result
-    
-    def create_product(self, name: str, sku: str, quantity: int, price: float, 
-                      status: ProductStatus = ProductStatus.InStock, 
-                      description: Optional[str] = None, 
-                      category_id: Optional[int] = None) -> int:
-        with self._lock:
-            # Check if SKU already exists
-            for product in self._products:
-                if product.sku == sku:
-                    raise ValueError(f"Product with SKU '{sku}' already exists")
-            
-            product = Product(
-                id=self._next_product_id,
-                name=name,
-                sku=sku,
-                quantity=quantity,
-                price=price,
-                status=status,
-                description=description,
-                categoryId=category_id
-            )
-            self._products.append(product)
-            self._next_product_id += 1
-            return product.id
-    
-    def update_product(self, id: int, name: str, sku: str, quantity: int, price: float,
-                      status: ProductStatus, description: Optional[str] = None,
-                      category_id: Optional[int] = None) -> bool:
-        with self._lock:
-            for product in self._products:
-                if product.id == id:
-                    # Check if SKU is being changed and conflicts with another product
-                    if product.sku != sku:
-                        for other_product in self._products:
-                            if other_product.id != id and other_product.sku == sku:
-                                raise ValueError(f"Product with SKU '{sku}' already exists")
-                    
-                    product.name = name
-                    product.sku = sku
-                    product.quantity = quantity
-                    product.price = price
-                    product.status = status
-                    product.description = description
-                    product.categoryId = category_id
-                    return True
-            return False
-    
-    def update_product_inventory(self, id: int, quantity: int) -> bool:
-        with self._lock:
-            for product in self._products:
-                if product.id == id:
-                    product.quantity = quantity
-                    # Update status based on quantity
-                    if quantity == 0:
-                        product.status = ProductStatus.OutOfStock
-                    elif product.status == ProductStatus.OutOfStock and quantity > 0:
-                        product.status = ProductStatus.InStock
-                    return True
-            return False
-    
-    def delete_product(self, id: int) -> bool:
-        with self._lock:
-            for i, product in enumerate(self._products):
-                if product.id == id:
-                    del self._products[i]
-                    return True
-            return False
-    
-    # Category methods
-    def get_all_categories(self) -> List[ProductCategoryItem]:
-        with self._lock:
-            result = []
-            for category in self._categories:
-                product_count = sum(1 for p in self._products if p.categoryId == category.id)
-                result.append(ProductCategoryItem(
-                    id=category.id,
-                    name=category.name,
-                    description=category.description,
-                    isActive=category.isActive,
-                    productCount=product_count
-                ))
-            return result
-    
-    def get_category_by_id(self, id: int) -> Optional[ProductCategory]:
-        with self._lock:
-            for category in self._categories:
-                if category.id == id:
-                    return category
-            return None
-    
-    def create_category(self, name: str, description: Optional[str] = None, 
-                       is_active: bool = True) -> int:
-        with self._lock:
-            category = ProductCategory(
-                id=self._next_category_id,
-                name=name,
-                description=description,
-                isActive=is_active
-            )
-            self._categories.append(category)
-            self._next_category_id += 1
-            return category.id
-    
-    def update_category(self, id: int, name: str, description: Optional[str] = None,
-                       is_active: bool = True) -> bool:
-        with self._lock:
-            for category in self._categories:
-                if category.id == id:
-                    category.name = name
-                    category.description = description
-                    category.isActive = is_active
-                    return True
-            return False
-    
-    def delete_category(self, id: int) -> bool:
-        with self._lock:
-            # Check if any products are using this category
-            for product in self._products:
-                if product.categoryId == id:
-                    return False  # Cannot delete category with products
-            
-            for i, category in enumerate(self._categories):
-                if category.id == id:
-                    del self._categories[i]
-                    return True
-            return False
-
-
-db = InMemoryDatabase()
\ No newline at end of file
+from typing import Any, Callable, Dict, Iterable, List, Literal, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from itertools import islice
+from array import array
+from functools import partial
+from operator import attrgetter, itemgetter
+from models import (
+    ProductItem, Product, ProductCategoryItem, ProductCategory, ProductStatus,
+    ProductAvailability, Reservation, CreateProductCommand, LowStockEvent, ScheduledStatusChange,
+    ProductChange, ProductChangeFeed, Location, ProductLocationStock, LocationQuantity, StockMatrix, StockMatrixRow,
+    MovementReason, StockMovement, StockMovementPage, SalesVelocity, PriceVersion, CatalogValuation,
+    TransactionOperation, TransactionResult
+)
+from history import BEFORE_HISTORY, PriceHistory
+from ledger import LEDGER_CHUNK_SIZE, MovementLedger
+from reservations import ReservationBook
+from seeding import sample_catalog, seed_database
+from sorted_index import SortedIndex
+from timers import TimerHeap
+from transitions import InvalidTransitionError, check_transition, stock_status
+from settings import settings
+from datetime import datetime, timezone
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# A full ProductItem, or a dict holding only the projected columns
+ProductRow = Union[ProductItem, Dict[str, Any]]
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a request needs more stock than is currently available"""
+
+
+class TransactionError(ValueError):
+    """Raised when an operation of a transaction fails; none of the transaction is applied"""
+    
+    def __init__(self, index: int, error: ValueError):
+        super().__init__(f"Operation {index} failed: {error}")
+        self.index = index
+        self.error = error
+
+
+class InventoryChange(NamedTuple):
+    """A stock write: either an absolute quantity or a delta to apply"""
+    value: int
+    is_delta: bool = False
+    # Recorded in the movement ledger; see default_reason
+    reason: Optional[MovementReason] = None
+    
+    def default_reason(self) -> MovementReason:
+        if self.reason is not None:
+            return self.reason
+        if not self.is_delta:
+            return MovementReason.Count
+        return MovementReason.Sale if self.value < 0 else MovementReason.Restock
+
+
+# Product attributes that have a sorted index
+RangeField = Literal["price", "quantity"]
+
+
+class Tombstone(NamedTuple):
+    """What is kept of a deleted product until compaction"""
+    sku: str
+    deleted_at: float
+
+
+def _reserve(stock: array, index: int):
+    """Zero-extend a location stock array so that `index` is valid"""
+    if index >= len(stock):
+        stock.frombytes(bytes(stock.itemsize * (index + 1 - len(stock))))
+
+
+class CategoryTotals:
+    """Running totals over the products of a category and all its descendants"""
+    __slots__ = ("products", "quantity", "stock_value")
+    
+    def __init__(self):
+        self.products = 0
+        self.quantity = 0
+        self.stock_value = 0.0
+    
+    def add(self, products: int, quantity: int, stock_value: float):
+        self.products += products
+        self.quantity += quantity
+        self.stock_value += stock_value
+
+
+class InMemoryDatabase:
+    def __init__(self, clock: Callable[[], float] = time.time, ledger_max_entries: int = 10_000_000,
+                 history_max_versions: int = 1000):
+        # Products keyed by id (insertion order == id order) plus a SKU index
+        self._products: Dict[int, Product] = {}
+        self._products_by_sku: Dict[str, Product] = {}
+        self._categories: Dict[int, ProductCategory] = {}
+        # Child category ids per parent id (None for top-level categories) and
+        # product totals per category subtree, kept current on every change
+        self._category_children: Dict[Optional[int], Set[int]] = {}
+        self._subtree_totals: Dict[int, CategoryTotals] = {}
+        # Product ids per category id, and ProductItem views built from the
+        # current product and category state
+        self._category_products: Dict[Optional[int], Set[int]] = {}
+        # Product ids ordered by price and by quantity, for range queries
+        self._sorted_indexes: Dict[str, SortedIndex] = {"price": SortedIndex(), "quantity": SortedIndex()}
+        # Product ids per status, and status changes scheduled for later
+        self._status_products: Dict[ProductStatus, Set[int]] = {status: set() for status in ProductStatus}
+        self._scheduled_statuses: Dict[int, Tuple[ProductStatus, float]] = {}
+        self._status_timers = TimerHeap()
+        self._item_cache: Dict[int, ProductItem] = {}
+        # Ids of products whose stock is below their reorder threshold, and
+        # the callbacks told when a product enters or leaves that set
+        self._low_stock: Set[int] = set()
+        self._low_stock_listeners: List[Callable[[LowStockEvent], None]] = []
+        self._next_event_id = 1
+        # Warehouses, and the stock each holds per product: one array per
+        # location indexed by product id, so a location x product slice is a
+        # single C-level gather. Products with location stock also have their
+        # location total here; the rest of their quantity is unassigned.
+        self._locations: Dict[int, Location] = {}
+        self._location_stock: Dict[int, array] = {}
+        self._location_totals: Dict[int, int] = {}
+        self._next_location_id = 1
+        # Every stock movement, with hourly and daily sales rollups
+        self._ledger_chunks = max(-(-ledger_max_entries // LEDGER_CHUNK_SIZE), 1)
+        self._ledger = MovementLedger(max_chunks=self._ledger_chunks)
+        # Past prices and quantities, for point-in-time reads
+        self._history = PriceHistory(max_versions=history_max_versions)
+        # Change feed: the store version is bumped by every product change,
+        # and each product id maps to the version of its latest change. Dicts
+        # keep insertion order, so re-inserting on change keeps the log sorted
+        # by version. Deleted products leave a tombstone (in deletion order)
+        # until compaction.
+        self._version = 0
+        self._change_log: Dict[int, int] = {}
+        self._tombstones: Dict[int, Tombstone] = {}
+        # Changes at or below this version may have been compacted away
+        self._compacted_version = 0
+        self._next_product_id = 1
+        self._next_category_id = 1
+        self._lock = threading.Lock()
+        # Side effects held back until the running transaction commits
+        self._deferred: Optional[List[Callable[[], None]]] = None
+        self._clock = clock
+        self._reservations = ReservationBook()
+    
+    # Seeding methods
+    def initialize_sample_data(self):
+        """Add the built-in demo categories and products"""
+        with self._lock:
+            first_category_id, first_product_id = self._next_category_id, self._next_product_id
+        self.bulk_load(*sample_catalog(first_category_id, first_product_id))
+    
+    def bulk_load(self, categories: Iterable[ProductCategory], products: Iterable[Product]):
+        """Add many categories and products in one pass.
+        
+        Records keep their ids, which must not collide with existing ones.
+        Indexes are built directly instead of going through create_product,
+        so this is the path to use for large catalogs.
+        """
+        with self._lock:
+            categories = list(categories)
+            products = sorted(products, key=attrgetter("id"))
+            
+            category_ids = set()
+            for category in categories:
+                if category.id in self._categories or category.id in category_ids:
+                    raise ValueError(f"Category with id {category.id} already exists")
+                category_ids.add(category.id)
+            for category in categories:
+                if category.parentId is not None and category.parentId not in self._categories \
+                        and category.parentId not in category_ids:
+                    raise ValueError(f"Parent category {category.parentId} of category {category.id} does not exist")
+            
+            product_ids = set()
+            skus = set()
+            for product in products:
+                if product.id in self._products or product.id in product_ids:
+                    raise ValueError(f"Product with id {product.id} already exists")
+                if product.sku in self._products_by_sku or product.sku in skus:
+                    raise ValueError(f"Product with SKU '{product.sku}' already exists")
+                product_ids.add(product.id)
+                skus.add(product.sku)
+            
+            self._categories.update((category.id, category) for category in categories)
+            self._products.update((product.id, product) for product in products)
+            self._products_by_sku.update((product.sku, product) for product in products)
+            self._sorted_indexes["price"].update((product.price, product.id) for product in products)
+            self._sorted_indexes["quantity"].update((product.quantity, product.id) for product in products)
+            members = self._category_products
+            for product in products:
+                ids = members.get(product.categoryId)
+                if ids is None:
+                    ids = members[product.categoryId] = set()
+                ids.add(product.id)
+            for product in products:
+                self._status_products[product.status].add(product.id)
+                self._track_stock_level(product, notify=False)
+                self._tombstones.pop(product.id, None)
+                self._history.forget(product.id)
+                self._record_change(product.id)
+            
+            for category in categories:
+                self._category_children.setdefault(category.parentId, set()).add(category.id)
+            self._rebuild_subtree_totals()
+            
+            if categories:
+                self._next_category_id = max(self._next_category_id, max(c.id for c in categories) + 1)
+            if products:
+                self._next_product_id = max(self._next_product_id, max(p.id for p in products) + 1)
+    
+    def clear_data(self):
+        """Remove all products, categories and reservations"""
+        with self._lock:
+            self._products.clear()
+            self._products_by_sku.clear()
+            self._categories.clear()
+            self._category_children.clear()
+            self._subtree_totals.clear()
+            self._category_products.clear()
+            for index in self._sorted_indexes.values():
+                index.clear()
+            for bucket in self._status_products.values():
+                bucket.clear()
+            self._scheduled_statuses.clear()
+            self._status_timers = TimerHeap()
+            # The version keeps counting, and moves on, so that syncing clients
+            # and version-keyed caches notice the reset
+            self._version += 1
+            self._change_log.clear()
+            self._tombstones.clear()
+            self._ledger = MovementLedger(max_chunks=self._ledger_chunks)
+            self._history.clear()
+            self._locations.clear()
+            self._location_stock.clear()
+            self._location_totals.clear()
+            self._next_location_id = 1
+            self._compacted_version = self._version
+            self._item_cache.clear()
+            self._low_stock.clear()
+            self._reservations = ReservationBook()
+            self._next_product_id = 1
+            self._next_category_id = 1
+    
+    # Product methods
+    def _add_product(self, product: Product):
+        """Store a new product and index it; the caller must hold the lock"""
+        self._products[product.id] = product
+        self._index_product(product)
+        self._history.created(product.id, self._clock())
+        self._record_change(product.id)
+    
+    def _index_product(self, product: Product):
+        """Add a product to the secondary indexes; the caller must hold the lock"""
+        self._products_by_sku[product.sku] = product
+        self._category_products.setdefault(product.categoryId, set()).add(product.id)
+        self._sorted_indexes["price"].add(product.price, product.id)
+        self._sorted_indexes["quantity"].add(product.quantity, product.id)
+        self._status_products[product.status].add(product.id)
+        self._add_to_totals(product.categoryId, 1, product.quantity, product.quantity * product.price)
+    
+    def _unindex_product(self, product: Product):
+        """Remove a product from the secondary indexes and drop its cached view.
+        
+        Must be called before any indexed attribute of the product changes.
+        """
+        del self._products_by_sku[product.sku]
+        members = self._category_products[product.categoryId]
+        members.discard(product.id)
+        if not members:
+            del self._category_products[product.categoryId]
+        self._sorted_indexes["price"].remove(product.price, product.id)
+        self._sorted_indexes["quantity"].remove(product.quantity, product.id)
+        self._status_products[product.status].discard(product.id)
+        self._add_to_totals(product.categoryId, -1, -product.quantity, -product.quantity * product.price)
+        self._item_cache.pop(product.id, None)
+    
+    def _category_name(self, category_id: Optional[int]) -> Optional[str]:
+        """Resolve a category name; the caller must hold the lock"""
+        category = self._categories.get(category_id)
+        return category.name if category else None
+    
+    def _make_item(self, product: Product) -> ProductItem:
+        return ProductItem(
+            id=product.id,
+            name=product.name,
+            sku=product.sku,
+            quantity=product.quantity,
+            price=product.price,
+            status=product.status,
+            description=product.description,
+            categoryId=product.categoryId,
+            categoryName=self._category_name(product.categoryId),
+            reorderThreshold=product.reorderThreshold
+        )
+    
+    def _build_item(self, product: Product) -> ProductItem:
+        """Return the cached ProductItem view of a product, building it on a miss.
+        
+        Cached items are shared between callers and must not be mutated.
+        """
+        item = self._item_cache.get(product.id)
+        if item is None:
+            item = self._item_cache[product.id] = self._make_item(product)
+        return item
+    
+    def _projector(self, fields: Optional[Sequence[str]], cached: bool = True) -> Callable[[Product], ProductRow]:
+        """Build a row factory for the requested columns.
+        
+        With no fields the full ProductItem is produced (from the item cache
+        unless `cached` is false). Otherwise only the requested columns are
+        read and the category join is skipped unless `categoryName` was
+        asked for.
+        """
+        if fields is None:
+            return self._build_item if cached else self._make_item
+        
+        columns = [field for field in fields if field != "categoryName"]
+        with_category = len(columns) != len(fields)
+        getter = attrgetter(*columns) if columns else None
+        
+        def project(product: Product) -> Dict[str, Any]:
+            if getter is None:
+                row = {}
+            elif len(columns) == 1:
+                row = {columns[0]: getter(product)}
+            else:
+                row = dict(zip(columns, getter(product)))
+            if with_category:
+                row["categoryName"] = self._category_name(product.categoryId)
+            return row
+        
+        return project
+    
+    def _as_of_projector(self, fields: Optional[Sequence[str]], as_of: Optional[datetime], many: bool = False
+                         ) -> Callable[[Product], Optional[ProductRow]]:
+        """Like _projector, with price and quantity as they were at `as_of`.
+        
+        The row factory returns None for products created after `as_of`.
+        Other attributes are always current. With `many`, history is read
+        up front for every product it covers rather than per product. The
+        caller must hold the lock.
+        """
+        project = self._projector(fields)
+        if as_of is None:
+            return project
+        
+        timestamp = as_of.timestamp()
+        project_past = self._projector(fields, cached=False)
+        if many:
+            past = dict(self._history.changes_since(timestamp))
+            values_at = lambda product, current: past.get(product.id, current)
+        else:
+            values_at = lambda product, current: self._history.at(product.id, timestamp, current)
+        
+        def project_as_of(product: Product) -> Optional[ProductRow]:
+            current = (product.price, product.quantity)
+            values = values_at(product, current)
+            if values is None:
+                return None
+            if values == current:
+                return project(product)
+            price, quantity = values
+            return project_past(product.model_copy(update={"price": price, "quantity": quantity}))
+        
+        return project_as_of
+    
+    def get_all_products(self, fields: Optional[Sequence[str]] = None,
+                         as_of: Optional[datetime] = None) -> List[ProductRow]:
+        """All products; with `as_of`, those that existed then, at their price and quantity then"""
+        with self._lock:
+            if as_of is None:
+                project = self._projector(fields)
+                return [project(product) for product in self._products.values()]
+            project = self._as_of_projector(fields, as_of, many=True)
+            return [row for product in self._products.values() if (row := project(product)) is not None]
+    
+    def get_versioned_products(self, fields: Optional[Sequence[str]] = None) -> Tuple[int, List[ProductRow]]:
+        """All products and the store version they are as of, read under one lock"""
+        with self._lock:
+            project = self._projector(fields)
+            return self._version, [project(product) for product in self._products.values()]
+    
+    def get_product_by_id(self, id: int) -> Optional[Product]:
+        with self._lock:
+            return self._products.get(id)
+    
+    def get_product_by_sku(self, sku: str) -> Optional[Product]:
+        with self._lock:
+            return self._products_by_sku.get(sku)
+    
+    def get_product_item_by_id(self, id: int, fields: Optional[Sequence[str]] = None,
+                               as_of: Optional[datetime] = None) -> Optional[ProductRow]:
+        with self._lock:
+            product = self._products.get(id)
+            return self._as_of_projector(fields, as_of)(product) if product else None
+    
+    def get_product_item_by_sku(self, sku: str, fields: Optional[Sequence[str]] = None,
+                                as_of: Optional[datetime] = None) -> Optional[ProductRow]:
+        with self._lock:
+            product = self._products_by_sku.get(sku)
+            return self._as_of_projector(fields, as_of)(product) if product else None
+    
+    def lookup_products(self, ids: Sequence[int] = (), skus: Sequence[str] = (),
+                        fields: Optional[Sequence[str]] = None
+                        ) -> Tuple[List[ProductRow], List[int], List[str]]:
+        """Resolve many ids and SKUs in a single pass under one lock.
+        
+        Returns the matching rows (each product at most once, in request
+        order), followed by the ids and SKUs that did not match anything.
+        """
+        with self._lock:
+            project = self._projector(fields)
+            seen = set()
+            rows = []
+            missing_ids = []
+            missing_skus = []
+            
+            for id in ids:
+                product = self._products.get(id)
+                if product is None:
+                    missing_ids.append(id)
+                elif product.id not in seen:
+                    seen.add(product.id)
+                    rows.append(project(product))
+            
+            for sku in skus:
+                product = self._products_by_sku.get(sku)
+                if product is None:
+                    missing_skus.append(sku)
+                elif product.id not in seen:
+                    seen.add(product.id)
+                    rows.append(project(product))
+            
+            return rows, missing_ids, missing_skus
+    
+    def get_product_ids(self) -> List[int]:
+        """Snapshot of all product ids, for jobs that walk the catalog in chunks"""
+        with self._lock:
+            return list(self._products)
+    
+    def get_catalog(self) -> Tuple[List[ProductCategory], List[Product]]:
+        """Copies of every category and product, in the form bulk_load takes"""
+        with self._lock:
+            return (
+                [category.model_copy() for category in self._categories.values()],
+                [product.model_copy() for product in self._products.values()]
+            )
+    
+    def reindex_products(self, ids: Sequence[int]) -> int:
+        """Rebuild the index entries of the given products; returns how many had drifted"""
+        repaired = 0
+        with self._lock:
+            for id in ids:
+                product = self._products.get(id)
+                if product is None:
+                    continue
+                missing = [name for name, index in self._sorted_indexes.items()
+                           if (getattr(product, name), id) not in index]
+                drifted = (missing or self._products_by_sku.get(product.sku) is not product
+                           or id not in self._category_products.get(product.categoryId, ())
+                           or id not in self._status_products[product.status])
+                if drifted:
+                    self._products_by_sku[product.sku] = product
+                    self._category_products.setdefault(product.categoryId, set()).add(id)
+                    self._status_products[product.status].add(id)
+                    for name in missing:
+                        self._sorted_indexes[name].add(getattr(product, name), id)
+                if self._track_stock_level(product, notify=False) or drifted:
+                    repaired += 1
+                self._item_cache.pop(id, None)
+        return repaired
+    
+    def get_products_by_status(self, status: ProductStatus,
+                               fields: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        with self._lock:
+            project = self._projector(fields)
+            return [project(self._products[id]) for id in sorted(self._status_products[status])]
+    
+    def get_products_by_category(self, category_id: int,
+                                 fields: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        with self._lock:
+            project = self._projector(fields)
+            member_ids = sorted(self._category_products.get(category_id, ()))
+            return [project(self._products[product_id]) for product_id in member_ids]
+    
+    def get_products_in_range(self, field: RangeField, minimum: Optional[float] = None,
+                              maximum: Optional[float] = None, limit: Optional[int] = None,
+                              descending: bool = False,
+                              fields: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        """Products with `field` between the inclusive bounds, ordered by it.
+        
+        Served from the sorted index, so this costs O(log n + k) for k rows;
+        with no bounds and descending=True it is a top-k query.
+        """
+        with self._lock:
+            project = self._projector(fields)
+            ids = self._sorted_indexes[field].irange(minimum, maximum, reverse=descending)
+            return [project(self._products[id]) for id in islice(ids, limit)]
+    
+    def _create_product(self, name: str, sku: str, quantity: int, price: float,
+                        status: ProductStatus, description: Optional[str],
+                        category_id: Optional[int], reorder_threshold: Optional[int] = None) -> Product:
+        """Create and index a product; the caller must hold the lock"""
+        # Check if SKU already exists
+        if sku in self._products_by_sku:
+            raise ValueError(f"Product with SKU '{sku}' already exists")
+        
+        product = Product(
+            id=self._next_product_id,
+            name=name,
+            sku=sku,
+            quantity=quantity,
+            price=price,
+            status=status,
+            description=description,
+            categoryId=category_id,
+            reorderThreshold=reorder_threshold
+        )
+        self._add_product(product)
+        if quantity:
+            self._record_movement(product, quantity, MovementReason.ProductUpdate)
+        self._track_stock_level(product)
+        self._next_product_id += 1
+        return product
+    
+    def _update_product(self, product: Product, name: str, sku: str, quantity: int, price: float,
+                        status: ProductStatus, description: Optional[str],
+                        category_id: Optional[int], reorder_threshold: Optional[int] = None):
+        """Replace the fields of a product and re-index it; the caller must hold the lock"""
+        # Check if SKU is being changed and conflicts with another product
+        if product.sku != sku and sku in self._products_by_sku:
+            raise ValueError(f"Product with SKU '{sku}' already exists")
+        check_transition(product.status, status)
+        held = self._location_totals.get(product.id, 0)
+        if quantity < held:
+            raise ValueError(f"Quantity {quantity} is below the {held} unit(s) held at locations")
+        
+        if quantity != product.quantity:
+            self._record_movement(product, quantity - product.quantity, MovementReason.ProductUpdate)
+        self._record_version(product, price, quantity)
+        self._unindex_product(product)
+        product.name = name
+        product.sku = sku
+        product.quantity = quantity
+        product.price = price
+        product.status = status
+        product.description = description
+        product.categoryId = category_id
+        product.reorderThreshold = reorder_threshold
+        self._index_product(product)
+        self._track_stock_level(product)
+        self._record_change(product.id)
+    
+    def create_product(self, name: str, sku: str, quantity: int, price: float, 
+                      status: ProductStatus = ProductStatus.InStock, 
+                      description: Optional[str] = None, 
+                      category_id: Optional[int] = None,
+                      reorder_threshold: Optional[int] = None) -> int:
+        with self._lock:
+            return self._create_product(name, sku, quantity, price, status, description, category_id,
+                                        reorder_threshold).id
+    
+    def update_product(self, id: int, name: str, sku: str, quantity: int, price: float,
+                      status: ProductStatus, description: Optional[str] = None,
+                      category_id: Optional[int] = None,
+                      reorder_threshold: Optional[int] = None) -> bool:
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return False
+            
+            self._update_product(product, name, sku, quantity, price, status, description, category_id,
+                                 reorder_threshold)
+            return True
+    
+    def upsert_products(self, commands: Sequence[CreateProductCommand]) -> Tuple[int, int, Dict[int, str]]:
+        """Create or replace products keyed by SKU under a single lock acquisition.
+        
+        Returns the number of products created and updated, and the errors
+        of rejected commands (e.g. an invalid status change) by position.
+        """
+        created = updated = 0
+        errors: Dict[int, str] = {}
+        with self._lock:
+            for position, command in enumerate(commands):
+                product = self._products_by_sku.get(command.sku)
+                try:
+                    if product is None:
+                        self._create_product(command.name, command.sku, command.quantity, command.price,
+                                             command.status, command.description, command.categoryId,
+                                             command.reorderThreshold)
+                        created += 1
+                    else:
+                        self._update_product(product, command.name, command.sku, command.quantity, command.price,
+                                             command.status, command.description, command.categoryId,
+                                             command.reorderThreshold)
+                        updated += 1
+                except ValueError as e:
+                    errors[position] = str(e)
+        return created, updated, errors
+    
+    def _apply_inventory(self, product: Product, quantity: int, reason: Optional[MovementReason]):
+        """Set the stock level of a product and record the movement under `reason`.
+        
+        Pass no reason when the caller has already recorded the movements.
+        The caller must hold the lock.
+        """
+        if reason is not None and quantity != product.quantity:
+            self._record_movement(product, quantity - product.quantity, reason)
+        self._record_version(product, product.price, quantity)
+        if quantity != product.quantity:
+            index = self._sorted_indexes["quantity"]
+            index.remove(product.quantity, product.id)
+            index.add(quantity, product.id)
+            delta = quantity - product.quantity
+            self._add_to_totals(product.categoryId, 0, delta, delta * product.price)
+        self._item_cache.pop(product.id, None)
+        product.quantity = quantity
+        self._set_status(product, stock_status(product.status, quantity))
+        self._track_stock_level(product)
+        self._record_change(product.id)
+    
+    def _set_inventory(self, product: Product, quantity: int, reason: MovementReason = MovementReason.Count):
+        """Set the stock level, which cannot drop below what locations hold; the caller must hold the lock"""
+        held = self._location_totals.get(product.id, 0)
+        if quantity < held:
+            raise InsufficientStockError(
+                f"Cannot set product {product.id} to {quantity} unit(s); {held} are held at locations")
+        self._apply_inventory(product, quantity, reason)
+    
+    def update_product_inventory(self, id: int, quantity: int) -> bool:
+        """Set the total stock level; it cannot drop below what locations hold"""
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return False
+            
+            self._set_inventory(product, quantity)
+            return True
+    
+    def adjust_product_inventory(self, id: int, delta: int, reason: Optional[MovementReason] = None) -> Optional[int]:
+        """Add `delta` to the stock level and return the new quantity"""
+        result = self.apply_inventory_batch(id, [InventoryChange(delta, is_delta=True, reason=reason)])
+        if result is None:
+            return None
+        if isinstance(result[0], Exception):
+            raise result[0]
+        return result[0]
+    
+    def apply_inventory_batch(self, id: int, changes: Sequence[InventoryChange]
+                              ) -> Optional[List[Union[int, InsufficientStockError]]]:
+        """Apply several stock writes to one product as a single mutation.
+        
+        Changes are applied in order. The result holds the quantity seen
+        after each change, or an InsufficientStockError for a delta that
+        would have taken stock below zero, or any write that would take it
+        below the stock held at locations (that change is skipped). Returns
+        None if the product does not exist.
+        """
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return None
+            
+            quantity = product.quantity
+            held = self._location_totals.get(id, 0)
+            applied = False
+            results: List[Union[int, InsufficientStockError]] = []
+            for change in changes:
+                previous = quantity
+                if not change.is_delta:
+                    if change.value < held:
+                        results.append(InsufficientStockError(
+                            f"Cannot set product {id} to {change.value} unit(s); {held} are held at locations"))
+                        continue
+                    quantity = change.value
+                elif quantity + change.value < held:
+                    results.append(InsufficientStockError(
+                        f"Cannot remove {-change.value} unit(s) of product {id}; only {quantity - held} in stock"
+                        + (" outside locations" if held else "")))
+                    continue
+                else:
+                    quantity += change.value
+                # Each change is its own ledger entry even though the batch is one mutation
+                if quantity != previous:
+                    self._record_movement(product, quantity - previous, change.default_reason())
+                applied = True
+                results.append(quantity)
+            
+            if applied:
+                self._apply_inventory(product, quantity, None)
+            return results
+    
+    def delete_product(self, id: int) -> bool:
+        """Remove a product, leaving a tombstone for the change feed"""
+        with self._lock:
+            product = self._products.pop(id, None)
+            if product is None:
+                return False
+            
+            self._unindex_product(product)
+            self._low_stock.discard(id)
+            self._reservations.remove_product(id)
+            self._scheduled_statuses.pop(id, None)
+            self._status_timers.cancel(id)
+            if self._location_totals.pop(id, None) is not None:
+                for location_id, stock in self._location_stock.items():
+                    if id < len(stock) and stock[id]:
+                        self._locations[location_id].totalQuantity -= stock[id]
+                        stock[id] = 0
+            self._tombstones[id] = Tombstone(product.sku, self._clock())
+            # Gone from the catalog from now on, as far as valuations are concerned
+            self._record_version(product, product.price, 0)
+            self._record_change(id)
+            return True
+    
+    # Transaction methods
+    def _emit(self, effect: Callable, *args):
+        """Run a side effect now, or at commit inside a transaction; the caller must hold the lock"""
+        if self._deferred is None:
+            effect(*args)
+        else:
+            self._deferred.append(partial(effect, *args))
+    
+    def _restore_product(self, product: Product, snapshot: Dict[str, Any]):
+        """Put back every attribute of a product from a copy of its fields; the caller must hold the lock"""
+        self._unindex_product(product)
+        for field, value in snapshot.items():
+            setattr(product, field, value)
+        self._index_product(product)
+        self._track_stock_level(product)
+        self._record_change(product.id)
+    
+    def _transaction_product(self, id: int) -> Product:
+        product = self._products.get(id)
+        if product is None:
+            raise ValueError(f"Product {id} not found")
+        return product
+    
+    def _apply_operation(self, operation: TransactionOperation, undo_log: List[Callable[[], None]]):
+        """Apply one transaction step and log how to undo it; the caller must hold the lock"""
+        given = operation.model_fields_set
+        
+        def value(field: str, current: Any, required: bool = False) -> Any:
+            if field not in given:
+                if required:
+                    raise ValueError(f"{operation.op} needs {field}")
+                return current
+            new = getattr(operation, field)
+            if new is None and current is not None and field in ("name", "sku", "price", "status", "isActive"):
+                raise ValueError(f"{field} cannot be null")
+            return new
+        
+        if operation.op == "updateCategory":
+            category = self._categories.get(operation.id)
+            if category is None:
+                raise ValueError(f"Category {operation.id} not found")
+            snapshot = dict(category.__dict__)
+            self._update_category(
+                category,
+                value("name", category.name),
+                value("description", category.description),
+                value("isActive", category.isActive),
+                value("reorderThreshold", category.reorderThreshold),
+                value("parentId", category.parentId)
+            )
+            undo_log.append(partial(
+                self._update_category, category, snapshot["name"], snapshot["description"],
+                snapshot["isActive"], snapshot["reorderThreshold"], snapshot["parentId"]
+            ))
+            return
+        
+        product = self._transaction_product(operation.id)
+        # A plain copy of the fields is several times cheaper than model_copy
+        snapshot = dict(product.__dict__)
+        if operation.op == "updateProduct":
+            category_id = value("categoryId", product.categoryId)
+            if category_id is not None and category_id not in self._categories:
+                raise ValueError(f"Category {category_id} not found")
+            self._update_product(
+                product,
+                value("name", product.name),
+                value("sku", product.sku),
+                product.quantity,
+                value("price", product.price),
+                value("status", product.status),
+                value("description", product.description),
+                category_id,
+                value("reorderThreshold", product.reorderThreshold)
+            )
+        elif operation.op == "setInventory":
+            self._set_inventory(product, value("quantity", None, required=True),
+                                operation.reason or MovementReason.Count)
+        else:
+            delta = value("delta", None, required=True)
+            change = InventoryChange(delta, is_delta=True, reason=operation.reason)
+            held = self._location_totals.get(product.id, 0)
+            if product.quantity + delta < held:
+                raise InsufficientStockError(
+                    f"Cannot remove {-delta} unit(s) of product {product.id}; only {product.quantity - held} in stock"
+                    + (" outside locations" if held else ""))
+            self._apply_inventory(product, product.quantity + delta, change.default_reason())
+        undo_log.append(partial(self._restore_product, product, snapshot))
+    
+    def apply_transaction(self, operations: Sequence[TransactionOperation]) -> TransactionResult:
+        """Apply product, stock and category changes all together or not at all.
+        
+        Operations run in order under a single lock acquisition, each
+        seeing the effects of the ones before it. Every step logs how to
+        undo itself; if one fails, the undo log is replayed backwards and
+        TransactionError is raised with the failed step's position. Ledger
+        entries, price history and low-stock alerts are held back until
+        commit, so a rolled-back transaction leaves none behind; the same
+        goes for change feed entries and the store version.
+        """
+        with self._lock:
+            undo_log: List[Callable[[], None]] = []
+            self._deferred = []
+            try:
+                for index, operation in enumerate(operations):
+                    try:
+                        self._apply_operation(operation, undo_log)
+                    except Exception as e:
+                        for undo in reversed(undo_log):
+                            undo()
+                        if isinstance(e, ValueError):
+                            raise TransactionError(index, e) from e
+                        raise
+                deferred = self._deferred
+            finally:
+                self._deferred = None
+            for effect in deferred:
+                effect()
+            
+            return TransactionResult(
+                version=self._version,
+                productIds=list(dict.fromkeys(o.id for o in operations if o.op != "updateCategory")),
+                categoryIds=list(dict.fromkeys(o.id for o in operations if o.op == "updateCategory"))
+            )
+    
+    # Price history methods
+    def _record_version(self, product: Product, price: float, quantity: int):
+        """Keep the product's current price and quantity as history before they change.
+        
+        The caller must hold the lock.
+        """
+        if price != product.price or quantity != product.quantity:
+            self._emit(self._history.record, product.id, self._clock(), price, quantity,
+                       (product.price, product.quantity))
+    
+    def get_price_history(self, id: int) -> Optional[List[PriceVersion]]:
+        """Every retained price and quantity of a product, oldest first"""
+        with self._lock:
+            if id not in self._products:
+                return None
+            return [
+                PriceVersion(
+                    since=None if timestamp == BEFORE_HISTORY else datetime.fromtimestamp(timestamp, tz=timezone.utc),
+                    price=price,
+                    quantity=quantity
+                )
+                for timestamp, price, quantity in self._history.versions(id)
+            ]
+    
+    def get_catalog_valuation(self, as_of: Optional[datetime] = None) -> CatalogValuation:
+        """Units and stock value of the whole catalog, now or at a past time.
+        
+        Past valuations include products deleted since.
+        """
+        with self._lock:
+            in_stock = total_quantity = 0
+            total_value = 0.0
+            for product in self._products.values():
+                if product.quantity:
+                    in_stock += 1
+                    total_quantity += product.quantity
+                    total_value += product.price * product.quantity
+            
+            if as_of is None:
+                timestamp = self._clock()
+            else:
+                # Swap in the past values of the few products that changed since
+                timestamp = as_of.timestamp()
+                for id, past in self._history.changes_since(timestamp):
+                    product = self._products.get(id)
+                    if product is not None and product.quantity:
+                        in_stock -= 1
+                        total_quantity -= product.quantity
+                        total_value -= product.price * product.quantity
+                    if past is not None and past[1]:
+                        in_stock += 1
+                        total_quantity += past[1]
+                        total_value += past[0] * past[1]
+            
+            return CatalogValuation(
+                asOf=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+                productsInStock=in_stock,
+                totalQuantity=total_quantity,
+                totalValue=total_value
+            )
+    
+    def prune_price_history(self, retention_seconds: float, max_items: int = 1000) -> int:
+        """Discard history older than the retention window, a few products at a time.
+        
+        Call repeatedly until it returns 0; each call visits up to
+        `max_items` products under one lock acquisition and returns how
+        many are left in the round.
+        """
+        with self._lock:
+            if not self._history.pruning():
+                self._history.start_pruning(self._clock() - retention_seconds)
+            return self._history.prune(max_items, self._products.__contains__)
+    
+    # Movement ledger methods
+    def _record_movement(self, product: Product, delta: int, reason: MovementReason):
+        """Append to the ledger under the product and its categories; the caller must hold the lock"""
+        scopes = [("product", product.id)]
+        scopes.extend(("category", id) for id in self._ancestry(product.categoryId))
+        self._emit(self._ledger.append, self._clock(), product.id, delta, reason, scopes)
+    
+    def get_movements(self, since: int = 0, limit: int = 1000) -> StockMovementPage:
+        """Ledger entries from sequence `since` on, oldest first"""
+        with self._lock:
+            entries = self._ledger.read(since, limit)
+            movements = [
+                StockMovement(sequence=sequence, timestamp=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+                              productId=product_id, delta=delta, reason=reason)
+                for sequence, (timestamp, product_id, delta, reason) in entries
+            ]
+            return StockMovementPage(movements=movements, next=entries[-1][0] + 1 if entries else len(self._ledger))
+    
+    def _velocity(self, scope: Tuple[str, int], days: float, quantity: int) -> SalesVelocity:
+        now = self._clock()
+        sold = self._ledger.units_sold(scope, now - days * 86400, now)
+        per_day = sold / days
+        return SalesVelocity(
+            windowDays=days,
+            unitsSold=sold,
+            unitsPerDay=per_day,
+            quantity=quantity,
+            daysOfStock=max(quantity, 0) / per_day if per_day else None
+        )
+    
+    def get_product_velocity(self, id: int, days: float) -> Optional[SalesVelocity]:
+        """Units sold per day over the last `days` days and how long current stock would last"""
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return None
+            velocity = self._velocity(("product", id), days, product.quantity)
+            velocity.productId = id
+            return velocity
+    
+    def get_category_velocity(self, id: int, days: float) -> Optional[SalesVelocity]:
+        """Like get_product_velocity, over every product in the category's subtree"""
+        with self._lock:
+            if id not in self._categories:
+                return None
+            velocity = self._velocity(("category", id), days, self._subtree_totals[id].quantity)
+            velocity.categoryId = id
+            return velocity
+    
+    # Location methods
+    def create_location(self, name: str) -> Location:
+        with self._lock:
+            location = Location(id=self._next_location_id, name=name)
+            self._locations[location.id] = location
+            self._location_stock[location.id] = array("q")
+            self._next_location_id += 1
+            return location.model_copy()
+    
+    def get_locations(self) -> List[Location]:
+        with self._lock:
+            return [location.model_copy() for location in self._locations.values()]
+    
+    def _stock_at(self, location_id: int, product_id: int) -> int:
+        stock = self._location_stock[location_id]
+        return stock[product_id] if product_id < len(stock) else 0
+    
+    def get_product_locations(self, product_id: int) -> Optional[ProductLocationStock]:
+        """Stock of a product per location, plus the part not assigned to any"""
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            
+            locations = [
+                LocationQuantity(locationId=location_id, quantity=quantity)
+                for location_id in self._locations
+                if (quantity := self._stock_at(location_id, product_id))
+            ]
+            return ProductLocationStock(
+                productId=product_id,
+                quantity=product.quantity,
+                unassigned=product.quantity - self._location_totals.get(product_id, 0),
+                locations=locations
+            )
+    
+    def set_location_stock(self, product_id: int, location_id: int, quantity: int) -> Optional[int]:
+        """Set a product's stock at one location and return its new total quantity.
+        
+        The total moves by the same amount, so the aggregate stays the sum
+        of the location stock plus the unassigned part. Raises ValueError
+        for an unknown location or a negative quantity; returns None if
+        the product does not exist.
+        """
+        if quantity < 0:
+            raise ValueError("Location stock cannot be negative")
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            if location_id not in self._locations:
+                raise ValueError(f"Location {location_id} does not exist")
+            
+            stock = self._location_stock[location_id]
+            _reserve(stock, product_id)
+            delta = quantity - stock[product_id]
+            if delta:
+                stock[product_id] = quantity
+                self._locations[location_id].totalQuantity += delta
+                held = self._location_totals.get(product_id, 0) + delta
+                if held:
+                    self._location_totals[product_id] = held
+                else:
+                    del self._location_totals[product_id]
+                self._apply_inventory(product, product.quantity + delta, MovementReason.Count)
+            return product.quantity
+    
+    def get_stock_matrix(self, location_ids: Sequence[int], product_ids: Sequence[int] = (),
+                         skus: Sequence[str] = ()) -> StockMatrix:
+        """Stock for every (product, location) pair; unknown products are skipped.
+        
+        Each location column is read with one itemgetter call over its
+        array and the columns are transposed with zip, rather than
+        visiting every cell from Python.
+        """
+        with self._lock:
+            for location_id in location_ids:
+                if location_id not in self._locations:
+                    raise ValueError(f"Location {location_id} does not exist")
+            ids = [id for id in product_ids if id in self._products]
+            ids.extend(self._products_by_sku[sku].id for sku in skus if sku in self._products_by_sku)
+            columns = []
+            if ids:
+                gather = itemgetter(*ids)
+                for location_id in location_ids:
+                    stock = self._location_stock[location_id]
+                    _reserve(stock, max(ids))
+                    column = gather(stock)
+                    columns.append(column if len(ids) > 1 else (column,))
+            
+            cells = zip(*columns) if columns else [()] * len(ids)
+            rows = [
+                StockMatrixRow(productId=id, sku=self._products[id].sku, quantities=list(quantities))
+                for id, quantities in zip(ids, cells)
+            ]
+            return StockMatrix(locationIds=list(location_ids), rows=rows)
+    
+    # Change feed methods
+    @property
+    def version(self) -> int:
+        """Store version; moves on with every change to a product's view"""
+        return self._version
+    
+    def _record_change(self, product_id: int):
+        """Bump the store version and move the product to the end of the change log.
+        
+        Inside a transaction this waits for the commit, so a rolled-back
+        transaction leaves the version and the change feed as they were.
+        """
+        if self._deferred is not None:
+            self._deferred.append(partial(self._record_change, product_id))
+            return
+        self._version += 1
+        self._change_log.pop(product_id, None)
+        self._change_log[product_id] = self._version
+    
+    def get_changes(self, since: int, limit: Optional[int] = None) -> ProductChangeFeed:
+        """Products created, changed or deleted after version `since`, oldest change first.
+        
+        Walks the change log backwards from the newest entry, so the cost
+        is proportional to the number of changes rather than the catalog.
+        Each product appears once, with its current state. Pass the
+        returned version as `since` to continue; `resyncRequired` means
+        deletions after `since` may have been compacted and the client
+        should reload everything.
+        """
+        with self._lock:
+            ids = []
+            for product_id in reversed(self._change_log):
+                if self._change_log[product_id] <= since:
+                    break
+                ids.append(product_id)
+            ids.reverse()
+            
+            has_more = limit is not None and len(ids) > limit
+            if has_more:
+                ids = ids[:limit]
+            changes = []
+            for product_id in ids:
+                version = self._change_log[product_id]
+                product = self._products.get(product_id)
+                if product:
+                    item = self._build_item(product)
+                    changes.append(ProductChange(version=version, productId=product_id, sku=item.sku, product=item))
+                else:
+                    tombstone = self._tombstones[product_id]
+                    changes.append(ProductChange(
+                        version=version, productId=product_id, sku=tombstone.sku, deleted=True,
+                        deletedAt=datetime.fromtimestamp(tombstone.deleted_at, tz=timezone.utc)
+                    ))
+            
+            return ProductChangeFeed(
+                version=changes[-1].version if has_more else self._version,
+                changes=changes,
+                hasMore=has_more,
+                resyncRequired=since < self._compacted_version
+            )
+    
+    def compact_tombstones(self, retention_seconds: float, max_items: int = 1000) -> int:
+        """Drop up to `max_items` tombstones older than the retention window.
+        
+        Tombstones are kept in deletion order, so this only looks at the
+        oldest ones and stops at the first that is still retained; callers
+        run it repeatedly to keep each lock hold short. Returns how many
+        were dropped.
+        """
+        with self._lock:
+            cutoff = self._clock() - retention_seconds
+            dropped = []
+            for id, tombstone in self._tombstones.items():
+                if tombstone.deleted_at > cutoff or len(dropped) >= max_items:
+                    break
+                dropped.append(id)
+            for id in dropped:
+                del self._tombstones[id]
+                self._compacted_version = max(self._compacted_version, self._change_log.pop(id, 0))
+            return len(dropped)
+    
+    def get_tombstone_count(self) -> int:
+        with self._lock:
+            return len(self._tombstones)
+    
+    # Status methods
+    def _set_status(self, product: Product, status: ProductStatus):
+        """Move a product to another status bucket; the caller must hold the lock"""
+        if status != product.status:
+            self._status_products[product.status].discard(product.id)
+            self._status_products[status].add(product.id)
+            self._item_cache.pop(product.id, None)
+            product.status = status
+    
+    def change_product_status(self, id: int, status: ProductStatus) -> bool:
+        """Move a product to `status`; raises InvalidTransitionError if that is not allowed"""
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return False
+            
+            check_transition(product.status, status)
+            self._set_status(product, status)
+            self._record_change(id)
+            return True
+    
+    def schedule_status_change(self, id: int, status: ProductStatus, at: datetime) -> Optional[ScheduledStatusChange]:
+        """Change a product's status at a given time, replacing any change already scheduled.
+        
+        The transition is checked now and again when it fires, since the
+        status may have changed in between.
+        """
+        with self._lock:
+            product = self._products.get(id)
+            if product is None:
+                return None
+            
+            check_transition(product.status, status)
+            deadline = at.timestamp()
+            self._scheduled_statuses[id] = (status, deadline)
+            self._status_timers.schedule(id, deadline)
+            return ScheduledStatusChange(productId=id, status=status, at=datetime.fromtimestamp(deadline, tz=timezone.utc))
+    
+    def get_scheduled_status_change(self, id: int) -> Optional[ScheduledStatusChange]:
+        with self._lock:
+            scheduled = self._scheduled_statuses.get(id)
+            if scheduled is None:
+                return None
+            status, deadline = scheduled
+            return ScheduledStatusChange(productId=id, status=status, at=datetime.fromtimestamp(deadline, tz=timezone.utc))
+    
+    def cancel_status_change(self, id: int) -> bool:
+        with self._lock:
+            self._status_timers.cancel(id)
+            return self._scheduled_statuses.pop(id, None) is not None
+    
+    def apply_scheduled_status_changes(self) -> int:
+        """Apply the scheduled changes that are due; returns how many were applied"""
+        applied = 0
+        with self._lock:
+            for id in self._status_timers.pop_due(self._clock()):
+                status, _ = self._scheduled_statuses.pop(id)
+                product = self._products[id]
+                try:
+                    check_transition(product.status, status)
+                except InvalidTransitionError as e:
+                    logger.warning("Skipping scheduled status change for product %d: %s", id, e)
+                    continue
+                self._set_status(product, status)
+                self._record_change(id)
+                applied += 1
+        return applied
+    
+    # Low-stock methods
+    def _reorder_threshold(self, product: Product) -> Optional[int]:
+        """The product's own threshold, else its category's; the caller must hold the lock"""
+        if product.reorderThreshold is not None:
+            return product.reorderThreshold
+        category = self._categories.get(product.categoryId)
+        return category.reorderThreshold if category else None
+    
+    def _track_stock_level(self, product: Product, notify: bool = True) -> bool:
+        """Move a product into or out of the low-stock set after its stock or threshold changed.
+        
+        Listeners are told about every crossing. Returns whether membership
+        changed. The caller must hold the lock.
+        """
+        threshold = self._reorder_threshold(product)
+        below = threshold is not None and product.quantity < threshold
+        if below == (product.id in self._low_stock):
+            return False
+        
+        if below:
+            self._low_stock.add(product.id)
+        else:
+            self._low_stock.discard(product.id)
+        if notify and self._low_stock_listeners:
+            event = LowStockEvent(
+                id=self._next_event_id,
+                productId=product.id,
+                sku=product.sku,
+                quantity=product.quantity,
+                threshold=threshold,
+                belowThreshold=below,
+                occurredAt=datetime.fromtimestamp(self._clock(), tz=timezone.utc)
+            )
+            self._next_event_id += 1
+            for listener in self._low_stock_listeners:
+                self._emit(listener, event)
+        return True
+    
+    def add_low_stock_listener(self, listener: Callable[[LowStockEvent], None]):
+        """Register a callback for threshold crossings.
+        
+        Listeners run on the writing thread with the store lock held, so
+        they must hand the event off (e.g. to a queue) instead of doing I/O.
+        """
+        with self._lock:
+            self._low_stock_listeners.append(listener)
+    
+    def get_low_stock_products(self, fields: Optional[Sequence[str]] = None) -> List[ProductRow]:
+        """Products currently below their reorder threshold, by id"""
+        with self._lock:
+            project = self._projector(fields)
+            return [project(self._products[id]) for id in sorted(self._low_stock)]
+    
+    # Reservation methods
+    def reserve_inventory(self, product_id: int, quantity: int, ttl_seconds: float) -> Optional[Reservation]:
+        """Hold stock for a product until the reservation is confirmed, released or expires"""
+        if quantity <= 0:
+            raise ValueError("Reservation quantity must be positive")
+        if ttl_seconds <= 0:
+            raise ValueError("Reservation TTL must be positive")
+        
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            
+            now = self._clock()
+            self._reservations.expire(now)
+            available = product.quantity - self._reservations.held(product_id)
+            if quantity > available:
+                raise InsufficientStockError(
+                    f"Only {max(available, 0)} unit(s) of product {product_id} available")
+            
+            return self._reservations.add(product_id, quantity, now + ttl_seconds)
+    
+    def get_reservation(self, id: int) -> Optional[Reservation]:
+        with self._lock:
+            self._reservations.expire(self._clock())
+            return self._reservations.get(id)
+    
+    def confirm_reservation(self, id: int) -> bool:
+        """Turn a hold into a sale by deducting its quantity from stock.
+        
+        Stock writes do not check holds, so stock may have fallen below one
+        since it was taken; confirming it then raises InsufficientStockError
+        and leaves the hold in place rather than selling less than was held.
+        """
+        with self._lock:
+            self._reservations.expire(self._clock())
+            reservation = self._reservations.get(id)
+            if reservation is None:
+                return False
+            
+            product = self._products[reservation.productId]
+            remaining = product.quantity - reservation.quantity
+            held = self._location_totals.get(product.id, 0)
+            if remaining < held:
+                raise InsufficientStockError(
+                    f"Cannot confirm reservation {id}: product {product.id} has {product.quantity} unit(s)"
+                    f" in stock{f' with {held} held at locations' if held else ''}"
+                    f", {reservation.quantity} reserved")
+            self._reservations.remove(id)
+            self._apply_inventory(product, remaining, MovementReason.Sale)
+            return True
+    
+    def release_reservation(self, id: int) -> bool:
+        with self._lock:
+            return self._reservations.remove(id) is not None
+    
+    def expire_reservations(self) -> int:
+        """Reclaim holds whose TTL has passed; returns how many were released"""
+        with self._lock:
+            return len(self._reservations.expire(self._clock()))
+    
+    def get_product_availability(self, product_id: int) -> Optional[ProductAvailability]:
+        with self._lock:
+            product = self._products.get(product_id)
+            if product is None:
+                return None
+            
+            self._reservations.expire(self._clock())
+            reserved = self._reservations.held(product_id)
+            return ProductAvailability(
+                productId=product_id,
+                quantity=product.quantity,
+                reserved=reserved,
+                available=max(product.quantity - reserved, 0)
+            )
+    
+    # Category methods
+    def _ancestry(self, category_id: Optional[int]) -> Iterable[int]:
+        """The category followed by its ancestors up to the root; the caller must hold the lock"""
+        while category_id is not None:
+            category = self._categories.get(category_id)
+            if category is None:
+                return
+            yield category_id
+            category_id = category.parentId
+    
+    def _add_to_totals(self, category_id: Optional[int], products: int, quantity: int, stock_value: float):
+        """Apply a change in a category's products to it and every ancestor; the caller must hold the lock"""
+        for id in self._ancestry(category_id):
+            self._subtree_totals[id].add(products, quantity, stock_value)
+    
+    def _rebuild_subtree_totals(self):
+        """Recompute every subtree total from the products; the caller must hold the lock"""
+        self._subtree_totals = {id: CategoryTotals() for id in self._categories}
+        for category_id, member_ids in self._category_products.items():
+            if category_id not in self._categories:
+                continue
+            quantity = stock_value = 0
+            for product_id in member_ids:
+                product = self._products[product_id]
+                quantity += product.quantity
+                stock_value += product.quantity * product.price
+            self._add_to_totals(category_id, len(member_ids), quantity, stock_value)
+    
+    def _build_category_item(self, category: ProductCategory) -> ProductCategoryItem:
+        totals = self._subtree_totals[category.id]
+        return ProductCategoryItem(
+            id=category.id,
+            name=category.name,
+            description=category.description,
+            isActive=category.isActive,
+            reorderThreshold=category.reorderThreshold,
+            parentId=category.parentId,
+            productCount=len(self._category_products.get(category.id, ())),
+            subtreeProductCount=totals.products,
+            subtreeQuantity=totals.quantity,
+            subtreeStockValue=round(totals.stock_value, 2)
+        )
+    
+    def _descendants(self, id: int) -> List[int]:
+        """Ids of all categories below `id`, breadth first; the caller must hold the lock"""
+        found = []
+        level = [id]
+        while level:
+            level = [child for parent in level for child in sorted(self._category_children.get(parent, ()))]
+            found.extend(level)
+        return found
+    
+    def _check_parent(self, id: Optional[int], parent_id: Optional[int]):
+        """Reject a missing parent or one that would create a cycle; the caller must hold the lock"""
+        if parent_id is None:
+            return
+        if parent_id not in self._categories:
+            raise ValueError(f"Parent category {parent_id} does not exist")
+        if id is not None and id in self._ancestry(parent_id):
+            raise ValueError("A category cannot be moved below itself or one of its descendants")
+    
+    def get_category_descendants(self, id: int) -> Optional[List[ProductCategoryItem]]:
+        with self._lock:
+            if id not in self._categories:
+                return None
+            return [self._build_category_item(self._categories[child]) for child in self._descendants(id)]
+    
+    def get_products_in_subtree(self, id: int,
+                                fields: Optional[Sequence[str]] = None) -> Optional[List[ProductRow]]:
+        """Products of a category and all its descendants, by id"""
+        with self._lock:
+            if id not in self._categories:
+                return None
+            project = self._projector(fields)
+            product_ids = []
+            for category_id in [id, *self._descendants(id)]:
+                product_ids.extend(self._category_products.get(category_id, ()))
+            product_ids.sort()
+            return [project(self._products[product_id]) for product_id in product_ids]
+    
+    def get_all_categories(self) -> List[ProductCategoryItem]:
+        with self._lock:
+            return [self._build_category_item(category) for category in self._categories.values()]
+    
+    def get_category_by_id(self, id: int) -> Optional[ProductCategory]:
+        with self._lock:
+            return self._categories.get(id)
+    
+    def get_category_item_by_id(self, id: int) -> Optional[ProductCategoryItem]:
+        with self._lock:
+            category = self._categories.get(id)
+            return self._build_category_item(category) if category else None
+    
+    def create_category(self, name: str, description: Optional[str] = None, 
+                       is_active: bool = True, reorder_threshold: Optional[int] = None,
+                       parent_id: Optional[int] = None) -> int:
+        with self._lock:
+            self._check_parent(None, parent_id)
+            category = ProductCategory(
+                id=self._next_category_id,
+                name=name,
+                description=description,
+                isActive=is_active,
+                reorderThreshold=reorder_threshold,
+                parentId=parent_id
+            )
+            self._categories[category.id] = category
+            self._category_children.setdefault(parent_id, set()).add(category.id)
+            self._subtree_totals[category.id] = CategoryTotals()
+            # Products may already point at the new id
+            for product_id in self._category_products.get(category.id, ()):
+                product = self._products[product_id]
+                self._add_to_totals(category.id, 1, product.quantity, product.quantity * product.price)
+                # Their views now carry the category name
+                self._item_cache.pop(product_id, None)
+                self._record_change(product_id)
+            self._next_category_id += 1
+            return category.id
+    
+    def update_category(self, id: int, name: str, description: Optional[str] = None,
+                       is_active: bool = True, reorder_threshold: Optional[int] = None,
+                       parent_id: Optional[int] = None) -> bool:
+        with self._lock:
+            category = self._categories.get(id)
+            if category is None:
+                return False
+            
+            self._update_category(category, name, description, is_active, reorder_threshold, parent_id)
+            return True
+    
+    def _update_category(self, category: ProductCategory, name: str, description: Optional[str],
+                         is_active: bool, reorder_threshold: Optional[int], parent_id: Optional[int]):
+        """Replace the fields of a category, keeping totals and product views current.
+        
+        The caller must hold the lock.
+        """
+        id = category.id
+        if category.parentId != parent_id:
+            self._check_parent(id, parent_id)
+            # Move the whole subtree's totals from the old ancestors to the new ones
+            totals = self._subtree_totals[id]
+            moved = (totals.products, totals.quantity, totals.stock_value)
+            self._add_to_totals(category.parentId, -moved[0], -moved[1], -moved[2])
+            self._category_children[category.parentId].discard(id)
+            category.parentId = parent_id
+            self._category_children.setdefault(parent_id, set()).add(id)
+            self._add_to_totals(parent_id, *moved)
+        
+        if category.name != name:
+            # Cached product views carry the old category name
+            for product_id in self._category_products.get(id, ()):
+                self._item_cache.pop(product_id, None)
+                self._record_change(product_id)
+        
+        category.name = name
+        category.description = description
+        category.isActive = is_active
+        if category.reorderThreshold != reorder_threshold:
+            category.reorderThreshold = reorder_threshold
+            for product_id in self._category_products.get(id, ()):
+                self._track_stock_level(self._products[product_id])
+    
+    def _move_category_products(self, source_id: int, target_id: Optional[int]) -> int:
+        """Move every product of one category to another, or to none; the caller must hold the lock.
+        
+        The source's member set is handed over (or merged into the target's)
+        and subtree totals move in one step, so the cost is one pass over
+        the moved products rather than a re-index of each.
+        """
+        if source_id == target_id:
+            return len(self._category_products.get(source_id, ()))
+        member_ids = self._category_products.pop(source_id, None)
+        if not member_ids:
+            return 0
+        
+        quantity = stock_value = 0
+        for product_id in member_ids:
+            product = self._products[product_id]
+            quantity += product.quantity
+            stock_value += product.quantity * product.price
+            product.categoryId = target_id
+            self._item_cache.pop(product_id, None)
+            # The category's reorder threshold may have applied
+            self._track_stock_level(product)
+            self._record_change(product_id)
+        self._add_to_totals(source_id, -len(member_ids), -quantity, -stock_value)
+        self._add_to_totals(target_id, len(member_ids), quantity, stock_value)
+        
+        moved = len(member_ids)
+        target_ids = self._category_products.get(target_id)
+        if target_ids is None:
+            self._category_products[target_id] = member_ids
+        elif len(target_ids) >= moved:
+            target_ids |= member_ids
+        else:
+            member_ids |= target_ids
+            self._category_products[target_id] = member_ids
+        return moved
+    
+    def _check_target(self, target_id: Optional[int]):
+        if target_id is not None and target_id not in self._categories:
+            raise ValueError(f"Category {target_id} does not exist")
+    
+    def move_category_products(self, source_id: int, target_id: Optional[int]) -> Optional[int]:
+        """Move all products of a category to another category, or out of any with None.
+        
+        Returns how many products moved, or None if the source category does
+        not exist; raises ValueError if the target does not.
+        """
+        with self._lock:
+            if source_id not in self._categories:
+                return None
+            self._check_target(target_id)
+            return self._move_category_products(source_id, target_id)
+    
+    def delete_category(self, id: int, reassign_to: Optional[int] = None, orphan_products: bool = False) -> bool:
+        """Delete a category, first moving its products to `reassign_to` or, with `orphan_products`, to none.
+        
+        Returns False if the category does not exist, or still has products
+        and neither option was given.
+        """
+        with self._lock:
+            category = self._categories.get(id)
+            if category is None:
+                return False
+            if self._category_children.get(id):
+                raise ValueError("Cannot delete category with subcategories")
+            # The target is checked even when there is nothing to move
+            if reassign_to == id:
+                raise ValueError("Cannot reassign products to the category being deleted")
+            self._check_target(reassign_to)
+            
+            if self._category_products.get(id):
+                if reassign_to is not None:
+                    self._move_category_products(id, reassign_to)
+                elif orphan_products:
+                    self._move_category_products(id, None)
+                else:
+                    return False  # Cannot delete category with products
+            
+            del self._categories[id]
+            del self._subtree_totals[id]
+            self._category_children[category.parentId].discard(id)
+            return True
+
+
+db = InMemoryDatabase(ledger_max_entries=settings.ledger_max_entries,
+                      history_max_versions=settings.history_max_versions)
+seed_database(db, settings)
\ No newline at end of file
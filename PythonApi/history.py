@@ -0,0 +1,177 @@
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# (price, quantity)
+PriceQuantity = Tuple[float, int]
+# Time of the version a product had before history was kept for it
+BEFORE_HISTORY = float("-inf")
+
+
+class HistoryUnavailableError(ValueError):
+    """Raised for a point in time whose history has been discarded"""
+
+
+class _Versions:
+    """Price and quantity versions of one product, oldest first"""
+    __slots__ = ("times", "prices", "quantities", "since")
+    
+    def __init__(self, since: float):
+        self.times = array("d")
+        self.prices = array("d")
+        self.quantities = array("q")
+        # Earliest time these versions can answer for
+        self.since = since
+    
+    def append(self, timestamp: float, price: float, quantity: int):
+        if self.times and self.times[-1] == timestamp:
+            # Several writes within one clock tick keep only the last
+            self.prices[-1] = price
+            self.quantities[-1] = quantity
+            return
+        self.times.append(timestamp)
+        self.prices.append(price)
+        self.quantities.append(quantity)
+    
+    def drop_before(self, index: int):
+        del self.times[:index]
+        del self.prices[:index]
+        del self.quantities[:index]
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+class PriceHistory:
+    """Versioned price and quantity per product, for point-in-time reads.
+    
+    Versions are only kept for products whose price or quantity changed
+    (or that were deleted); a product that never changed has had its
+    current values since it was created, so all that is kept for it is
+    its creation time, and bulk-loaded products not even that. A
+    product's versions are three parallel arrays ordered by time, so
+    the version in effect at any moment is one bisect away.
+    
+    Memory is bounded by `max_versions` per product (the oldest are
+    trimmed) and by `prune`, which discards everything older than a
+    cutoff except the version still in effect at the cutoff. Not
+    thread-safe; the owner is expected to hold its own lock.
+    """
+    
+    def __init__(self, max_versions: int = 1000):
+        self._max_versions = max_versions
+        self._versions: Dict[int, _Versions] = {}
+        # Creation time of products without versions
+        self._created: Dict[int, float] = {}
+        # Reads before this time are refused once pruning has started
+        self._horizon = BEFORE_HISTORY
+        # Products still to visit in the current pruning round
+        self._prune_queue: List[int] = []
+    
+    def created(self, id: int, timestamp: float):
+        self._created[id] = timestamp
+    
+    def forget(self, id: int):
+        self._versions.pop(id, None)
+        self._created.pop(id, None)
+    
+    def record(self, id: int, timestamp: float, price: float, quantity: int, previous: PriceQuantity):
+        """Record a new price and quantity; `previous` are the values being replaced"""
+        versions = self._versions.get(id)
+        if versions is None:
+            versions = self._versions[id] = _Versions(BEFORE_HISTORY)
+            versions.append(self._created.pop(id, BEFORE_HISTORY), *previous)
+        versions.append(timestamp, price, quantity)
+        
+        if len(versions.times) > 2 * self._max_versions:
+            # Trim in halves so appends stay amortised O(1)
+            versions.drop_before(len(versions.times) - self._max_versions)
+            versions.since = versions.times[0]
+    
+    def _check(self, timestamp: float, versions: Optional[_Versions] = None):
+        since = max(self._horizon, versions.since if versions else BEFORE_HISTORY)
+        if timestamp < since:
+            raise HistoryUnavailableError(f"History before {_format_time(since)} has been discarded")
+    
+    def at(self, id: int, timestamp: float, current: PriceQuantity) -> Optional[PriceQuantity]:
+        """Price and quantity at `timestamp`, or None if the product did not exist yet.
+        
+        `current` are the product's present values, used when nothing has
+        changed since it was created.
+        """
+        versions = self._versions.get(id)
+        self._check(timestamp, versions)
+        if versions is None:
+            return current if timestamp >= self._created.get(id, BEFORE_HISTORY) else None
+        
+        i = bisect_right(versions.times, timestamp) - 1
+        if i < 0:
+            return None
+        return versions.prices[i], versions.quantities[i]
+    
+    def changes_since(self, timestamp: float) -> Iterator[Tuple[int, Optional[PriceQuantity]]]:
+        """(id, price and quantity then) of every product whose values may have changed since `timestamp`.
+        
+        Products not listed have had their current values since then. A
+        product created later is listed with None.
+        """
+        self._check(timestamp)
+        for id, created in self._created.items():
+            if timestamp < created:
+                yield id, None
+        for id, versions in self._versions.items():
+            self._check(timestamp, versions)
+            i = bisect_right(versions.times, timestamp) - 1
+            yield id, (versions.prices[i], versions.quantities[i]) if i >= 0 else None
+    
+    def versions(self, id: int) -> List[Tuple[float, float, int]]:
+        """(time, price, quantity) of every retained version of a product"""
+        versions = self._versions.get(id)
+        if versions is None:
+            return []
+        return list(zip(versions.times, versions.prices, versions.quantities))
+    
+    def pruning(self) -> bool:
+        """Whether a pruning round is under way"""
+        return bool(self._prune_queue)
+    
+    def start_pruning(self, cutoff: float):
+        """Begin a pruning round; `prune` then visits every product once"""
+        self._horizon = max(self._horizon, cutoff)
+        self._prune_queue = list(self._versions)
+        self._prune_queue.extend(self._created)
+    
+    def prune(self, max_items: int, is_live: Callable[[int], bool]) -> int:
+        """Prune up to `max_items` products of the current round; returns how many are left.
+        
+        Deleted products (`is_live` false) whose last version is older
+        than the cutoff are forgotten entirely.
+        """
+        cutoff = self._horizon
+        queue = self._prune_queue
+        for _ in range(min(max_items, len(queue))):
+            id = queue.pop()
+            created = self._created.get(id)
+            if created is not None:
+                # Existing since before the horizon is as good as always existing
+                if created <= cutoff:
+                    del self._created[id]
+                continue
+            
+            versions = self._versions.get(id)
+            if versions is None:
+                continue
+            keep = bisect_right(versions.times, cutoff) - 1
+            if keep == len(versions.times) - 1 and not is_live(id):
+                del self._versions[id]
+            elif keep > 0:
+                versions.drop_before(keep)
+        return len(queue)
+    
+    def clear(self):
+        self._versions.clear()
+        self._created.clear()
+        self._horizon = BEFORE_HISTORY
+        self._prune_queue = []
@@ -0,0 +1,160 @@
+import codecs
+import csv
+import json
+import logging
+from typing import TYPE_CHECKING, Callable, List, Optional
+from pydantic import ValidationError
+from models import CreateProductCommand, ImportFormat, ImportResult, ImportRowError, ProductStatus
+
+if TYPE_CHECKING:
+    from database import InMemoryDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogImporter:
+    """Incremental product importer for CSV and JSON-lines feeds.
+    
+    Bytes are fed in arbitrary chunks as they arrive. Complete records are
+    validated as CreateProductCommand and upserted by SKU once `batch_size`
+    rows are buffered, so memory stays bounded by the batch size plus one
+    partial record regardless of the size of the feed. A record longer than
+    `max_record_length` characters (such as one left open by a stray quote)
+    fails as a row and is dropped. At most `max_errors` row errors are kept;
+    the failure count covers all of them.
+    
+    CSV input needs a header row naming the CreateProductCommand fields.
+    Status may be given as a number or a name (e.g. `InStock`).
+    """
+    
+    def __init__(self, db: "InMemoryDatabase", format: ImportFormat, batch_size: int = 1000,
+                 max_errors: int = 100, on_progress: Optional[Callable[[ImportResult], None]] = None,
+                 max_record_length: int = 1 << 20):
+        self._db = db
+        self._format = format
+        self._batch_size = batch_size
+        self._max_errors = max_errors
+        self._on_progress = on_progress
+        self._max_record_length = max_record_length
+        
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._partial = ""  # Text after the last complete line
+        self._record = ""  # CSV record still inside a quoted field
+        self._skipping = False  # Dropping the rest of an overlong line
+        self._header: Optional[List[str]] = None
+        self._batch: List[CreateProductCommand] = []
+        # Row number of each batched command, for reporting store rejections
+        self._batch_rows: List[int] = []
+        self.result = ImportResult()
+    
+    def feed(self, chunk: bytes):
+        text = self._partial + self._decoder.decode(chunk)
+        lines = text.split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            if self._skipping:
+                self._skipping = False
+                continue
+            self._line(line)
+        if len(self._record) + len(self._partial) > self._max_record_length:
+            if not self._skipping:
+                self._too_long()
+            self._partial = ""
+            self._skipping = True
+    
+    def finish(self) -> ImportResult:
+        """Process any trailing record and flush the last batch"""
+        remainder = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if remainder and not self._skipping:
+            self._line(remainder)
+        self._skipping = False
+        if self._record:
+            self._fail(self.result.processed + 1, "Unterminated quoted field")
+            self._record = ""
+        self._flush()
+        return self.result
+    
+    def _line(self, line: str):
+        if self._format == "jsonl":
+            if line.strip():
+                self._row(self._parse_json(line))
+            return
+        
+        # A CSV record ends once its quotes are balanced; quoted fields may span lines
+        record = self._record + line
+        if record.count('"') % 2:
+            if len(record) >= self._max_record_length:
+                self._too_long()
+                return
+            self._record = record + "\n"
+            return
+        self._record = ""
+        
+        record = record.rstrip("\r")
+        if not record.strip():
+            return
+        values = next(csv.reader([record]))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return
+        if len(values) != len(self._header):
+            self._row(ValueError(f"Expected {len(self._header)} columns, found {len(values)}"))
+            return
+        # Empty CSV cells mean "not set"
+        self._row({name: value for name, value in zip(self._header, values) if value != ""})
+    
+    def _too_long(self):
+        self._record = ""
+        self._row(ValueError(f"Record is longer than {self._max_record_length} characters"))
+    
+    def _parse_json(self, line: str):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            return ValueError(f"Invalid JSON: {e}")
+        if not isinstance(row, dict):
+            return ValueError("Each line must be a JSON object")
+        return row
+    
+    def _row(self, row):
+        self.result.processed += 1
+        if isinstance(row, Exception):
+            self._fail(self.result.processed, str(row))
+            return
+        
+        status = row.get("status")
+        if isinstance(status, str) and status in ProductStatus.__members__:
+            row["status"] = ProductStatus[status]
+        try:
+            self._batch.append(CreateProductCommand.model_validate(row))
+            self._batch_rows.append(self.result.processed)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+            self._fail(self.result.processed, errors)
+            return
+        
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+    
+    def _fail(self, row: int, error: str):
+        self.result.failed += 1
+        if len(self.result.errors) < self._max_errors:
+            self.result.errors.append(ImportRowError(row=row, error=error))
+        else:
+            self.result.errorsTruncated = True
+    
+    def _flush(self):
+        if self._batch:
+            created, updated, errors = self._db.upsert_products(self._batch)
+            self.result.created += created
+            self.result.updated += updated
+            for position, error in errors.items():
+                self._fail(self._batch_rows[position], error)
+            self._batch = []
+            self._batch_rows = []
+        
+        logger.info("Import progress: %d rows processed, %d created, %d updated, %d failed",
+                    self.result.processed, self.result.created, self.result.updated, self.result.failed)
+        if self._on_progress:
+            self._on_progress(self.result)
@@ -0,0 +1,230 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import IO, TYPE_CHECKING, Any, Callable, Dict, Optional
+from importer import CatalogImporter, ImportFormat
+from models import Job, JobStatus
+
+if TYPE_CHECKING:
+    from database import InMemoryDatabase
+
+logger = logging.getLogger(__name__)
+
+# Products handled per store call by the chunked jobs
+JOB_CHUNK_SIZE = 5000
+# Bytes read from an uploaded feed per importer call
+IMPORT_READ_SIZE = 1024 * 1024
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to running work so it can report progress and notice cancellation"""
+    
+    def __init__(self, manager: "JobManager", job_id: int):
+        self._manager = manager
+        self._job_id = job_id
+        self.cancelled = threading.Event()
+    
+    def report(self, progress: float, result: Optional[Dict[str, Any]] = None):
+        """Publish progress (0..1) and optionally a partial result"""
+        self._manager._update(self._job_id, progress=min(max(progress, 0.0), 1.0), result=result)
+    
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+
+class JobManager:
+    """Runs long operations on a bounded thread pool and tracks their state.
+    
+    Work is a callable taking a JobContext and returning a JSON-friendly
+    dict. It should do its work in chunks, calling `check_cancelled` and
+    `report` in between, so the store lock is only held per chunk.
+    Finished jobs are kept for polling until `max_finished` newer ones
+    have completed. A job may own an artifact file (e.g. an export), which
+    is deleted together with the job, and a `discard` callback that
+    releases what the work would have cleaned up (e.g. an uploaded feed)
+    if the job is cancelled before it starts.
+    """
+    
+    def __init__(self, max_workers: int = 2, max_finished: int = 100):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._max_finished = max_finished
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Job] = {}
+        self._contexts: Dict[int, JobContext] = {}
+        self._futures: Dict[int, Future] = {}
+        self._artifacts: Dict[int, str] = {}
+        self._discards: Dict[int, Callable[[], None]] = {}
+        self._finished: "OrderedDict[int, None]" = OrderedDict()
+        self._next_id = 1
+    
+    def submit(self, kind: str, work: Callable[[JobContext], Dict[str, Any]],
+               artifact: Optional[str] = None, discard: Optional[Callable[[], None]] = None) -> Job:
+        with self._lock:
+            job = Job(id=self._next_id, kind=kind, status=JobStatus.Queued,
+                      createdAt=datetime.now(timezone.utc))
+            self._next_id += 1
+            context = JobContext(self, job.id)
+            self._jobs[job.id] = job
+            self._contexts[job.id] = context
+            if artifact:
+                self._artifacts[job.id] = artifact
+            if discard:
+                self._discards[job.id] = discard
+            self._futures[job.id] = self._executor.submit(self._run, job.id, work, context)
+            return job.model_copy()
+    
+    def get(self, id: int) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(id)
+            return job.model_copy() if job else None
+    
+    def get_artifact(self, id: int) -> Optional[str]:
+        """Path of the file produced by a successful job"""
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is None or job.status != JobStatus.Succeeded:
+                return None
+            return self._artifacts.get(id)
+    
+    def cancel(self, id: int) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is None:
+                return None
+            if job.status in (JobStatus.Queued, JobStatus.Running):
+                # A queued job may already be starting, so flag it either way
+                self._contexts[id].cancelled.set()
+                if job.status == JobStatus.Queued and self._futures[id].cancel():
+                    self._finish(job, JobStatus.Cancelled)
+            return job.model_copy()
+    
+    def shutdown(self):
+        with self._lock:
+            for context in self._contexts.values():
+                context.cancelled.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for id in list(self._futures):
+                self._finish(self._jobs[id], JobStatus.Cancelled)
+            for path in self._artifacts.values():
+                _remove(path)
+            self._artifacts.clear()
+    
+    def _run(self, id: int, work: Callable[[JobContext], Dict[str, Any]], context: JobContext):
+        self._update(id, status=JobStatus.Running, startedAt=datetime.now(timezone.utc))
+        try:
+            result = work(context)
+        except JobCancelled:
+            with self._lock:
+                self._finish(self._jobs[id], JobStatus.Cancelled)
+        except Exception as e:
+            logger.exception("Job %d failed", id)
+            with self._lock:
+                self._finish(self._jobs[id], JobStatus.Failed, error=str(e))
+        else:
+            with self._lock:
+                job = self._jobs[id]
+                job.progress = 1.0
+                self._finish(job, JobStatus.Succeeded, result=result)
+    
+    def _update(self, id: int, **changes):
+        with self._lock:
+            job = self._jobs[id]
+            for name, value in changes.items():
+                if value is not None:
+                    setattr(job, name, value)
+    
+    def _finish(self, job: Job, status: JobStatus, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None):
+        """Record the final state and evict the oldest finished jobs; the caller holds the lock"""
+        discard = self._discards.pop(job.id, None)
+        if discard and job.status == JobStatus.Queued:
+            # The work never ran, so nothing else will release its resources
+            try:
+                discard()
+            except Exception:
+                logger.exception("Discarding job %d failed", job.id)
+        job.status = status
+        job.finishedAt = datetime.now(timezone.utc)
+        if result is not None:
+            job.result = result
+        job.error = error
+        self._contexts.pop(job.id, None)
+        self._futures.pop(job.id, None)
+        
+        self._finished[job.id] = None
+        while len(self._finished) > self._max_finished:
+            old_id, _ = self._finished.popitem(last=False)
+            del self._jobs[old_id]
+            path = self._artifacts.pop(old_id, None)
+            if path:
+                _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def import_job(db: "InMemoryDatabase", feed: IO[bytes], format: ImportFormat) -> Callable[[JobContext], Dict[str, Any]]:
+    """Import an uploaded feed; the importer upserts one batch per lock acquisition"""
+    def work(context: JobContext) -> Dict[str, Any]:
+        total = max(feed.seek(0, os.SEEK_END), 1)
+        feed.seek(0)
+        importer = CatalogImporter(db, format)
+        try:
+            while chunk := feed.read(IMPORT_READ_SIZE):
+                context.check_cancelled()
+                importer.feed(chunk)
+                context.report(feed.tell() / total, importer.result.model_dump())
+            return importer.finish().model_dump()
+        finally:
+            feed.close()
+    return work
+
+
+def reindex_job(db: "InMemoryDatabase") -> Callable[[JobContext], Dict[str, Any]]:
+    """Verify and repair the secondary indexes of every product, chunk by chunk"""
+    def work(context: JobContext) -> Dict[str, Any]:
+        ids = db.get_product_ids()
+        repaired = 0
+        for start in range(0, len(ids), JOB_CHUNK_SIZE):
+            context.check_cancelled()
+            repaired += db.reindex_products(ids[start:start + JOB_CHUNK_SIZE])
+            context.report((start + JOB_CHUNK_SIZE) / max(len(ids), 1))
+        return {"products": len(ids), "repaired": repaired}
+    return work
+
+
+def export_job(db: "InMemoryDatabase", path: str) -> Callable[[JobContext], Dict[str, Any]]:
+    """Write every product as JSON lines (the import format) to `path`, chunk by chunk"""
+    def work(context: JobContext) -> Dict[str, Any]:
+        ids = db.get_product_ids()
+        rows = 0
+        with open(path, "w") as f:
+            for start in range(0, len(ids), JOB_CHUNK_SIZE):
+                context.check_cancelled()
+                items, _, _ = db.lookup_products(ids=ids[start:start + JOB_CHUNK_SIZE])
+                f.writelines(item.model_dump_json(exclude={"categoryName"}) + "\n" for item in items)
+                rows += len(items)
+                context.report((start + JOB_CHUNK_SIZE) / max(len(ids), 1))
+        return {"products": rows}
+    return work
+
+
+def new_export_path() -> str:
+    handle, path = tempfile.mkstemp(prefix="products-", suffix=".jsonl")
+    os.close(handle)
+    return path
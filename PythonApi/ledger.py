@@ -0,0 +1,125 @@
+from array import array
+from typing import Dict, Hashable, Iterable, List, Tuple
+from models import MovementReason
+
+# Entries per ledger chunk; a full chunk is never touched again
+LEDGER_CHUNK_SIZE = 65536
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Movements that count towards sales velocity
+SALE_REASONS = frozenset({MovementReason.Sale})
+
+# timestamp, product id, delta, reason
+Movement = Tuple[float, int, int, MovementReason]
+
+
+class _Chunk:
+    __slots__ = ("timestamps", "product_ids", "deltas", "reasons")
+    
+    def __init__(self):
+        self.timestamps = array("d")
+        self.product_ids = array("q")
+        self.deltas = array("q")
+        self.reasons = array("b")
+
+
+class MovementLedger:
+    """Append-only log of stock movements with pre-aggregated sales rollups.
+    
+    Movements are stored column-wise in fixed-size array chunks (25 bytes
+    per entry). Only the newest `max_chunks` chunks are kept; sequence
+    numbers keep counting across dropped chunks. Every sale also bumps an
+    hourly and a daily bucket for each of the scopes it is recorded under
+    (e.g. the product and its categories), so velocity over a window
+    reads at most one bucket per hour or day of the window and never the
+    raw log. Not thread-safe; the owner is expected to hold its own lock.
+    """
+    
+    def __init__(self, max_chunks: int = 160, hourly_retention_hours: int = 7 * 24,
+                 daily_retention_days: int = 400):
+        self._chunks: List[_Chunk] = []
+        self._max_chunks = max_chunks
+        # Sequence number of the first entry still held
+        self._first_sequence = 0
+        self._hourly_retention = hourly_retention_hours
+        self._daily_retention = daily_retention_days
+        # Units sold per scope, keyed by hour or day number since the epoch
+        self._hourly: Dict[Hashable, Dict[int, int]] = {}
+        self._daily: Dict[Hashable, Dict[int, int]] = {}
+    
+    def __len__(self) -> int:
+        """Sequence number the next movement will get"""
+        if not self._chunks:
+            return self._first_sequence
+        return self._first_sequence + (len(self._chunks) - 1) * LEDGER_CHUNK_SIZE + len(self._chunks[-1].deltas)
+    
+    def append(self, timestamp: float, product_id: int, delta: int, reason: MovementReason,
+               scopes: Iterable[Hashable]):
+        if not self._chunks or len(self._chunks[-1].deltas) == LEDGER_CHUNK_SIZE:
+            if len(self._chunks) == self._max_chunks:
+                del self._chunks[0]
+                self._first_sequence += LEDGER_CHUNK_SIZE
+            self._chunks.append(_Chunk())
+        chunk = self._chunks[-1]
+        chunk.timestamps.append(timestamp)
+        chunk.product_ids.append(product_id)
+        chunk.deltas.append(delta)
+        chunk.reasons.append(reason)
+        
+        if delta < 0 and reason in SALE_REASONS:
+            hour = int(timestamp // HOUR)
+            for scope in scopes:
+                _bump(self._hourly, scope, hour, -delta, self._hourly_retention)
+                _bump(self._daily, scope, hour // 24, -delta, self._daily_retention)
+    
+    def read(self, start: int, limit: int) -> List[Tuple[int, Movement]]:
+        """Up to `limit` (sequence, movement) pairs from sequence `start` on"""
+        start = max(start, self._first_sequence)
+        found = []
+        position = start - self._first_sequence
+        index, offset = divmod(position, LEDGER_CHUNK_SIZE)
+        sequence = start
+        while index < len(self._chunks) and len(found) < limit:
+            chunk = self._chunks[index]
+            end = min(len(chunk.deltas), offset + limit - len(found))
+            for i in range(offset, end):
+                found.append((sequence, (chunk.timestamps[i], chunk.product_ids[i], chunk.deltas[i],
+                                         MovementReason(chunk.reasons[i]))))
+                sequence += 1
+            index, offset = index + 1, 0
+        return found
+    
+    def units_sold(self, scope: Hashable, start: float, end: float) -> int:
+        """Units sold under `scope` between two timestamps, at bucket granularity.
+        
+        Windows that fit in the hourly retention are summed from hourly
+        buckets, longer ones from daily buckets. The bucket holding `end`
+        counts and the one holding `start` does not, so a 24 hour window
+        reads exactly 24 hourly buckets.
+        """
+        if end - start <= self._hourly_retention * HOUR:
+            buckets, first, last = self._hourly.get(scope), int(start // HOUR), int(end // HOUR)
+        else:
+            buckets, first, last = self._daily.get(scope), int(start // DAY), int(end // DAY)
+        if not buckets:
+            return 0
+        if last - first > len(buckets):
+            return sum(sold for bucket, sold in buckets.items() if first < bucket <= last)
+        return sum(buckets.get(bucket, 0) for bucket in range(first + 1, last + 1))
+
+
+def _bump(rollups: Dict[Hashable, Dict[int, int]], scope: Hashable, bucket: int, units: int, retention: int):
+    buckets = rollups.get(scope)
+    if buckets is None:
+        buckets = rollups[scope] = {}
+    if bucket in buckets:
+        buckets[bucket] += units
+        return
+    
+    buckets[bucket] = units
+    # Buckets are created in time order, so expired ones are at the front
+    oldest = next(iter(buckets))
+    while oldest <= bucket - retention:
+        del buckets[oldest]
+        oldest = next(iter(buckets))
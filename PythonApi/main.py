@@ -1,221 +1,940 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, RedirectResponse
-from typing import List
-from models import (
-    ProductItem, Product, CreateProductCommand, UpdateProductCommand, UpdateInventoryCommand,
-    ProductCategoryItem, CreateProductCategoryCommand, UpdateProductCategoryCommand,
-    ProductStatus
-)
-from database import db
-
-app = FastAPI(title="Product Inventory API", version="v1", docs_url="/swagger", redoc_url="/redoc")
-app.title = "Product Inventory API"
-app.version = "v1"
-app.description = "Product Inventory Management API"
-
-# Configure CORS to allow all origins
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins
-    allow_credentials=True,
-    allow_methods=["*"],  # Allow all HTTP methods
-    allow_headers=["*"],  # Allow all headers
-)
-
-# Send interactive user to swagger page by default
-@app.get("/")
-async def redirect_to_swagger():
-    return RedirectResponse(url="/swagger")
-
-# Product endpoints
-@app.get("/api/Products", response_model=List[ProductItem], tags=["Products"], operation_id="GetProducts")
-async def get_products():
-    return db.get_all_products()
-
-
-@app.get("/api/Products/{id}", response_model=ProductItem, tags=["Products"], operation_id="GetProductById")
-async def get_product_by_id(id: int):
-    product = db.get_product_by_id(id)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Convert to ProductItem with category name
-    category_name = None
-    if product.categoryId:
-        category = db.get_category_by_id(product.categoryId)
-        category_name = category.name if category else None
-    
-    return ProductItem(
-        id=product.id,
-        name=product.name,
-        sku=product.sku,
-        quantity=product.quantity,
-        price=product.price,
-        status=product.status,
-        description=product.description,
-        categoryId=product.categoryId,
-        categoryName=category_name
-    )
-
-
-@app.get("/api/Products/sku/{sku}", response_model=ProductItem, tags=["Products"], operation_id="GetProductBySku")
-async def get_product_by_sku(sku: str):
-    product = db.get_product_by_sku(sku)
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    # Convert to ProductItem with category name
-    category_name = None
-    if product.categoryId:
-        category = db.get_category_by_id(product.categoryId)
-        category_name = category.name if category else None
-    
-    return ProductItem(
-        id=product.id,
-        name=product.name,
-        sku=product.sku,
-        quantity=product.quantity,
-        price=product.price,
-        status=product.status,
-        description=product.description,
-        categoryId=product.categoryId,
-        categoryName=category_name
-    )
-
-
-@app.get("/api/Products/status/{status}", response_model=List[ProductItem], tags=["Products"], operation_id="GetProductsByStatus")
-async def get_products_by_status(status: ProductStatus):
-    return db.get_products_by_status(status)
-
-
-@app.get("/api/Products/category/{category_id}", response_model=List[ProductItem], tags=["Products"], operation_id="GetProductsByCategory")
-async def get_products_by_category(category_id: int):
-    return db.get_products_by_category(category_id)
-
-
-@app.post("/api/Products", response_model=int, tags=["Products"], operation_id="CreateProduct")
-async def create_product(command: CreateProductCommand):
-    try:
-        product_id = db.create_product(
-            name=command.name,
-            sku=command.sku,
-            quantity=command.quantity,
-            price=command.price,
-            status=command.status,
-            description=command.description,
-            category_id=command.categoryId
-        )
-        return product_id
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-
-@app.put("/api/Products/{id}", tags=["Products"], operation_id="UpdateProduct")
-async def update_product(id: int, command: UpdateProductCommand):
-    try:
-        success = db.update_product(
-            id=id,
-            name=command.name,
-            sku=command.sku,
-            quantity=command.quantity,
-            price=command.price,
-            status=command.status,
-            description=command.description,
-            category_id=command.categoryId
-        )
-        if not success:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
-        return Response(status_code=200)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-
-@app.patch("/api/Products/{id}/inventory", tags=["Products"], operation_id="UpdateInventory")
-async def update_inventory(id: int, command: UpdateInventoryCommand):
-    success = db.update_product_inventory(id, command.quantity)
-    if not success:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    return Response(status_code=200)
-
-
-@app.delete("/api/Products/{id}", tags=["Products"], operation_id="DeleteProduct")
-async def delete_product(id: int):
-    success = db.delete_product(id)
-    if not success:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    return Response(status_code=200)
-
-
-# Category endpoints
-@app.get("/api/ProductCategories", response_model=List[ProductCategoryItem], tags=["Categories"], operation_id="GetCategories")
-async def get_categories():
-    return db.get_all_categories()
-
-
-@app.get("/api/ProductCategories/{id}", response_model=ProductCategoryItem, tags=["Categories"], operation_id="GetCategoryById")
-async def get_category_by_id(id: int):
-    category = db.get_category_by_id(id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    # Get product count for this category
-    product_count = sum(1 for p in db.get_all_products() if p.categoryId == id)
-    
-    return ProductCategoryItem(
-        id=category.id,
-        name=category.name,
-        description=category.description,
-        isActive=category.isActive,
-        productCount=product_count
-    )
-
-
-@app.get("/api/ProductCategories/{id}/products", response_model=List[ProductItem], tags=["Categories"], operation_id="GetProductsInCategory")
-async def get_products_in_category(id: int):
-    category = db.get_category_by_id(id)
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    return db.get_products_by_category(id)
-
-
-@app.post("/api/ProductCategories", response_model=int, tags=["Categories"], operation_id="CreateCategory")
-async def create_category(command: CreateProductCategoryCommand):
-    category_id = db.create_category(
-        name=command.name,
-        description=command.description,
-        is_active=command.isActive
-    )
-    return category_id
-
-
-@app.put("/api/ProductCategories/{id}", tags=["Categories"], operation_id="UpdateCategory")
-async def update_category(id: int, command: UpdateProductCategoryCommand):
-    success = db.update_category(
-        id=id,
-        name=command.name,
-        description=command.description,
-        is_active=command.isActive
-    )
-    if not success:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    return Response(status_code=200)
-
-
-@app.delete("/api/ProductCategories/{id}", tags=["Categories"], operation_id="DeleteCategory")
-async def delete_category(id: int):
-    success = db.delete_category(id)
-    if not success:
-        # Check if it's because there are products in this category
-        products_in_category = db.get_products_by_category(id)
-        if products_in_category:
-            raise HTTPException(status_code=400, detail="Cannot delete category with existing products")
-        else:
-            raise HTTPException(status_code=404, detail="Category not found")
-    
-    return Response(status_code=200)
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, RedirectResponse
+from typing import TYPE_CHECKING, Any, List, Optional
+from pydantic import TypeAdapter
+from models import (
+    ProductItem, Product, CreateProductCommand, UpdateProductCommand, UpdateInventoryCommand,
+    ProductCategoryItem, CreateProductCategoryCommand, UpdateProductCategoryCommand,
+    ProductLookupCommand, ProductLookupResult, ProductStatus, PRODUCT_ITEM_FIELDS,
+    CreateReservationCommand, Reservation, ProductAvailability, AdjustInventoryCommand, InventoryLevel,
+    SingleFlightStats, SingleFlightReport, ImportResult, Job,
+    UpdateStatusCommand, ScheduleStatusCommand, ScheduledStatusChange, ProductChangeFeed,
+    Location, CreateLocationCommand, ProductLocationStock, StockMatrixCommand, StockMatrix,
+    StockMovementPage, SalesVelocity, PriceVersion, CatalogValuation, TransactionCommand, TransactionResult,
+    MoveCategoryProductsCommand, MoveCategoryProductsResult, ImportFormat
+)
+# Modules only some deployments or routes need (admission control, the
+# catalog importer, background jobs, webhook alerts) are imported where
+# they are first used instead of here
+from binary_format import negotiate_format, pack
+from coalescing import SingleFlight
+from compression import EncodedResponseCache, negotiate_encoding
+from seeding import save_catalog_file
+from transitions import InvalidTransitionError
+from datetime import datetime
+from settings import settings
+import asyncio
+import logging
+import math
+import time
+
+if TYPE_CHECKING:
+    from jobs import JobManager
+
+from database import db, InsufficientStockError, RangeField, TransactionError
+
+logger = logging.getLogger(__name__)
+
+# How often background maintenance (reservation expiry, scheduled status
+# changes, tombstone compaction) runs, and how many tombstones are
+# compacted per store lock acquisition
+MAINTENANCE_INTERVAL_SECONDS = 1.0
+COMPACTION_BATCH_SIZE = 1000
+# Price history is pruned less often, a batch of products per lock acquisition
+HISTORY_PRUNE_INTERVAL_SECONDS = 3600.0
+HISTORY_PRUNE_BATCH_SIZE = 1000
+
+
+async def run_maintenance():
+    history_retention_seconds = settings.history_retention_days * 86400
+    next_history_prune = 0.0
+    while True:
+        db.expire_reservations()
+        db.apply_scheduled_status_changes()
+        while db.compact_tombstones(settings.tombstone_retention_seconds, COMPACTION_BATCH_SIZE) == COMPACTION_BATCH_SIZE:
+            # Let requests in between batches
+            await asyncio.sleep(0)
+        if asyncio.get_running_loop().time() >= next_history_prune:
+            while db.prune_price_history(history_retention_seconds, HISTORY_PRUNE_BATCH_SIZE):
+                await asyncio.sleep(0)
+            next_history_prune = asyncio.get_running_loop().time() + HISTORY_PRUNE_INTERVAL_SECONDS
+        await asyncio.sleep(MAINTENANCE_INTERVAL_SECONDS)
+
+
+# Identical concurrent list reads share one computation; see Settings.single_flight_enabled
+single_flight = SingleFlight()
+
+
+# Background job runner, created by the first job request
+jobs: Optional["JobManager"] = None
+
+
+def job_manager() -> "JobManager":
+    global jobs
+    if jobs is None:
+        from jobs import JobManager
+        jobs = JobManager(max_workers=settings.job_workers)
+    return jobs
+
+
+# Low-stock events are handed to a delivery worker so stock writes never wait
+# on consumers; with no consumers configured there is nothing to deliver to
+alerts = None
+if settings.low_stock_webhook_urls:
+    from alerts import AlertDispatcher, webhook_consumer
+    alerts = AlertDispatcher(max_attempts=settings.alert_max_attempts,
+                             retry_base_seconds=settings.alert_retry_base_seconds)
+    for url in settings.low_stock_webhook_urls:
+        alerts.subscribe(webhook_consumer(url))
+    db.add_low_stock_listener(alerts.publish)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    maintenance = asyncio.create_task(run_maintenance())
+    if alerts is not None:
+        alerts.start()
+    yield
+    maintenance.cancel()
+    if alerts is not None:
+        alerts.stop()
+    if jobs is not None:
+        jobs.shutdown()
+    if settings.snapshot_file:
+        # Requests have drained by now, so the snapshot has every completed write
+        start = time.perf_counter()
+        save_catalog_file(settings.snapshot_file, db.get_catalog())
+        logger.info("Wrote catalog snapshot to %s in %.0f ms", settings.snapshot_file,
+                    (time.perf_counter() - start) * 1000)
+
+
+# Operations that return or touch many products draw on the smaller "list"
+# rate-limit budget; everything else is a "lookup"
+LIST_OPERATIONS = frozenset({
+    "GetProducts", "GetCatalogValuation", "GetLowStockProducts", "GetProductChanges", "GetProductsByStatus",
+    "GetProductsByCategory", "GetProductsInRange", "LookupProducts", "ImportProducts", "GetStockMovements",
+    "GetStockMatrix", "ApplyTransaction", "SubmitImportJob", "SubmitReindexJob", "SubmitExportJob",
+    "DownloadJobResult", "GetProductsInCategory", "GetCategoryDescendants", "GetProductsInCategorySubtree",
+    "MoveCategoryProducts",
+})
+
+rate_limiter = None
+if settings.rate_limit_enabled:
+    from admission import RateLimiter
+    rate_limiter = RateLimiter({
+        "lookup": (settings.rate_limit_lookup_per_second, settings.rate_limit_lookup_burst),
+        "list": (settings.rate_limit_list_per_second, settings.rate_limit_list_burst),
+    }, max_clients=settings.rate_limit_max_clients)
+
+
+async def enforce_rate_limit(request: Request):
+    # Runs after routing, so the budget comes from the matched route. Async so
+    # that it stays on the event loop instead of going through the threadpool.
+    if rate_limiter is None:
+        return
+    route = request.scope.get("route")
+    budget = "list" if getattr(route, "operation_id", None) in LIST_OPERATIONS else "lookup"
+    api_key = request.headers.get(settings.rate_limit_api_key_header)
+    client = ("key", api_key) if api_key else ("ip", request.client.host if request.client else None)
+    retry_after = rate_limiter.acquire(client, budget)
+    if retry_after:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+FAST_STARTUP = settings.startup_mode == "fast"
+
+# In fast startup mode the schema and docs routes are registered below so that
+# nothing is generated until the first request for them
+app = FastAPI(
+    title="Product Inventory API",
+    version="v1",
+    docs_url=None if FAST_STARTUP else "/swagger",
+    redoc_url=None if FAST_STARTUP else "/redoc",
+    openapi_url=None if FAST_STARTUP else "/openapi.json",
+    dependencies=[Depends(enforce_rate_limit)],
+    lifespan=lifespan
+)
+app.title = "Product Inventory API"
+app.version = "v1"
+app.description = "Product Inventory Management API"
+
+# Configure CORS to allow all origins
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Allow all origins
+    allow_credentials=True,
+    allow_methods=["*"],  # Allow all HTTP methods
+    allow_headers=["*"],  # Allow all headers
+)
+
+# Added last so that it runs first and turns away overload before any other work
+if settings.admission_max_concurrency > 0:
+    from admission import AdmissionMiddleware
+    app.add_middleware(
+        AdmissionMiddleware,
+        max_concurrency=settings.admission_max_concurrency,
+        max_queue=settings.admission_max_queue,
+        queue_timeout=settings.admission_queue_timeout_seconds
+    )
+
+if FAST_STARTUP:
+    _openapi_document: Optional[bytes] = None
+    
+    @app.get("/openapi.json", include_in_schema=False)
+    async def get_precomputed_openapi():
+        # Serve the document written by generate_api_specification.py as-is
+        global _openapi_document
+        if _openapi_document is None:
+            with open(settings.openapi_schema_file, "rb") as f:
+                _openapi_document = f.read()
+        return Response(content=_openapi_document, media_type="application/json")
+    
+    @app.get("/swagger", include_in_schema=False)
+    async def get_swagger_ui():
+        from fastapi.openapi.docs import get_swagger_ui_html
+        return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{app.title} - Swagger UI")
+    
+    @app.get("/redoc", include_in_schema=False)
+    async def get_redoc():
+        from fastapi.openapi.docs import get_redoc_html
+        return get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc")
+
+# Send interactive user to swagger page by default
+@app.get("/")
+async def redirect_to_swagger():
+    return RedirectResponse(url="/swagger")
+
+
+@app.get("/api/Diagnostics/single-flight", response_model=SingleFlightReport, tags=["Diagnostics"], operation_id="GetSingleFlightReport")
+async def get_single_flight_report():
+    """How many list reads were computed, and how many shared a computation already in flight"""
+    return SingleFlightReport(
+        inFlight=single_flight.in_flight(),
+        endpoints=[
+            SingleFlightStats(endpoint=endpoint, executions=executions, coalesced=single_flight.coalesced[endpoint])
+            for endpoint, executions in sorted(single_flight.executions.items())
+        ]
+    )
+
+# Sparse fieldsets: ?fields=id,sku,quantity limits the columns returned
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated list of ProductItem fields to return, e.g. `id,sku,quantity`"
+)
+AS_OF_QUERY = Query(
+    None, alias="asOf",
+    description="Return price and quantity as they were at this time; other fields are always current"
+)
+VELOCITY_DAYS_QUERY = Query(
+    7, gt=0, le=365,
+    description="Window in days; up to 7 is measured by the hour, longer windows by the day"
+)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if fields is None:
+        return None
+    
+    requested = []
+    for field in fields.split(","):
+        field = field.strip()
+        if not field or field in requested:
+            continue
+        if field not in PRODUCT_ITEM_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{field}'")
+        requested.append(field)
+    
+    if not requested:
+        raise HTTPException(status_code=400, detail="At least one field must be requested")
+    return requested
+
+
+def product_response(result, fields: Optional[List[str]]):
+    # Projected rows are plain dicts that would fail ProductItem validation,
+    # so they bypass the response model and are serialized as-is
+    if fields is None:
+        return result
+    return JSONResponse(content=result)
+
+
+CATEGORY_ITEM_FIELDS = tuple(ProductCategoryItem.model_fields)
+
+
+async def binary_format(request: Request) -> Optional[str]:
+    return negotiate_format(request.headers.get("accept"))
+
+# Internal consumers can ask list endpoints for MessagePack (see binary_format)
+# through the Accept header. The binary formats are kept out of the OpenAPI
+# document, which describes the public JSON contract only.
+BINARY_FORMAT = Depends(binary_format)
+
+
+def list_response(rows, fields: Optional[List[str]], media_type: Optional[str],
+                  all_fields=PRODUCT_ITEM_FIELDS):
+    if media_type is None:
+        return product_response(rows, fields)
+    return Response(content=pack(media_type, rows, fields or all_fields), media_type=media_type,
+                    headers={"Vary": "Accept"})
+
+
+async def shared_list_response(key: tuple, read, fields: Optional[List[str]], media_type: Optional[str]):
+    """A list_response whose read and encoding identical concurrent requests share.
+    
+    `key` names the read and its arguments; the fields, format and store
+    version are added to it, so a request never shares a result read
+    before a write that preceded it.
+    """
+    def render() -> bytes:
+        rows = read()
+        if media_type is None:
+            return listing_encoder.dump_json(rows)
+        return pack(media_type, rows, fields or PRODUCT_ITEM_FIELDS)
+    
+    if settings.single_flight_enabled:
+        body = await single_flight.run((*key, tuple(fields or ()), media_type, db.version), render)
+    else:
+        body = render()
+    return Response(content=body, media_type=media_type or "application/json",
+                    headers={"Vary": "Accept"} if media_type else None)
+
+
+# Catalog listings are encoded once per store version, fields= projection and
+# format, and compressed at most once per content coding; see Settings.compression_*
+listing_cache = EncodedResponseCache(
+    max_bytes=settings.listing_cache_max_bytes,
+    min_size=settings.compression_min_size_bytes,
+    level=settings.compression_level
+)
+# Encodes ProductItem models and projected rows alike, byte for byte as the response model would
+listing_encoder = TypeAdapter(List[Any])
+
+
+async def listing_response(request: Request, fields: Optional[List[str]], media_type: Optional[str]) -> Response:
+    def render():
+        version, rows = db.get_versioned_products(fields)
+        if media_type is None:
+            return version, listing_encoder.dump_json(rows)
+        return version, pack(media_type, rows, fields or PRODUCT_ITEM_FIELDS)
+    
+    coding = None
+    if settings.compression_enabled:
+        coding = negotiate_encoding(request.headers.get("accept-encoding"))
+    key = ("products", tuple(fields or ()), media_type)
+    version = db.version
+    # Hits are answered on the event loop; a miss renders and compresses in the threadpool
+    cached = listing_cache.lookup(key, version, coding)
+    if cached is None:
+        cached = await run_in_threadpool(listing_cache.get, key, version, render, coding)
+    body, coding = cached
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=media_type or "application/json", headers=headers)
+
+
+# Product endpoints
+@app.get("/api/Products", response_model=List[ProductItem], tags=["Products"], operation_id="GetProducts")
+async def get_products(request: Request, fields: Optional[str] = FIELDS_QUERY,
+                       as_of: Optional[datetime] = AS_OF_QUERY, media_type: Optional[str] = BINARY_FORMAT):
+    requested = parse_fields(fields)
+    if as_of is None:
+        return await listing_response(request, requested, media_type)
+    try:
+        products = db.get_all_products(requested, as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return list_response(products, requested, media_type)
+
+
+@app.get("/api/Products/valuation", response_model=CatalogValuation, tags=["Products"], operation_id="GetCatalogValuation")
+async def get_catalog_valuation(as_of: Optional[datetime] = AS_OF_QUERY):
+    """Units in stock and their value across the catalog, including since-deleted products for past times"""
+    try:
+        return db.get_catalog_valuation(as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/Products/low-stock", response_model=List[ProductItem], tags=["Products"], operation_id="GetLowStockProducts")
+async def get_low_stock_products(fields: Optional[str] = FIELDS_QUERY, media_type: Optional[str] = BINARY_FORMAT):
+    """Products whose quantity is below their own or their category's reorder threshold"""
+    requested = parse_fields(fields)
+    return list_response(db.get_low_stock_products(requested), requested, media_type)
+
+
+# Changes returned by one change feed request when no limit is given, and the most allowed
+DEFAULT_CHANGES_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+
+
+@app.get("/api/Products/changes", response_model=ProductChangeFeed, tags=["Products"], operation_id="GetProductChanges")
+async def get_product_changes(since: int = Query(0, ge=0, description="Version returned by the previous call; 0 for everything"),
+                              limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT)):
+    """Products created, updated or deleted since a version, for delta sync and cache invalidation"""
+    return db.get_changes(since, limit)
+
+
+@app.get("/api/Products/{id}", response_model=ProductItem, tags=["Products"], operation_id="GetProductById")
+async def get_product_by_id(id: int, fields: Optional[str] = FIELDS_QUERY, as_of: Optional[datetime] = AS_OF_QUERY):
+    requested = parse_fields(fields)
+    try:
+        product = db.get_product_item_by_id(id, requested, as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return product_response(product, requested)
+
+
+@app.get("/api/Products/sku/{sku}", response_model=ProductItem, tags=["Products"], operation_id="GetProductBySku")
+async def get_product_by_sku(sku: str, fields: Optional[str] = FIELDS_QUERY, as_of: Optional[datetime] = AS_OF_QUERY):
+    requested = parse_fields(fields)
+    try:
+        product = db.get_product_item_by_sku(sku, requested, as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return product_response(product, requested)
+
+
+@app.get("/api/Products/status/{status}", response_model=List[ProductItem], tags=["Products"], operation_id="GetProductsByStatus")
+async def get_products_by_status(status: ProductStatus, fields: Optional[str] = FIELDS_QUERY,
+                                 media_type: Optional[str] = BINARY_FORMAT):
+    requested = parse_fields(fields)
+    return await shared_list_response(("GetProductsByStatus", status),
+                                      lambda: db.get_products_by_status(status, requested), requested, media_type)
+
+
+@app.get("/api/Products/category/{category_id}", response_model=List[ProductItem], tags=["Products"], operation_id="GetProductsByCategory")
+async def get_products_by_category(category_id: int, fields: Optional[str] = FIELDS_QUERY,
+                                   media_type: Optional[str] = BINARY_FORMAT):
+    requested = parse_fields(fields)
+    return await shared_list_response(("GetProductsByCategory", category_id),
+                                      lambda: db.get_products_by_category(category_id, requested), requested, media_type)
+
+
+# Rows returned by a range query when no limit is given, and the most allowed
+DEFAULT_RANGE_LIMIT = 100
+MAX_RANGE_LIMIT = 10000
+
+
+@app.get("/api/Products/range/{field}", response_model=List[ProductItem], tags=["Products"], operation_id="GetProductsInRange")
+async def get_products_in_range(field: RangeField,
+                                minimum: Optional[float] = Query(None, alias="min", description="Inclusive lower bound"),
+                                maximum: Optional[float] = Query(None, alias="max", description="Inclusive upper bound"),
+                                limit: int = Query(DEFAULT_RANGE_LIMIT, ge=1, le=MAX_RANGE_LIMIT),
+                                descending: bool = Query(False, description="Highest values first; with no bounds this gives the top `limit` products"),
+                                fields: Optional[str] = FIELDS_QUERY, media_type: Optional[str] = BINARY_FORMAT):
+    """Products whose price or quantity lies within [min, max], ordered by that field"""
+    requested = parse_fields(fields)
+    products = db.get_products_in_range(field, minimum, maximum, limit, descending, requested)
+    return list_response(products, requested, media_type)
+
+
+# Upper bound on ids + SKUs accepted by a single batch lookup
+MAX_LOOKUP_KEYS = 1000
+
+
+@app.post("/api/Products/lookup", response_model=ProductLookupResult, tags=["Products"], operation_id="LookupProducts")
+async def lookup_products(command: ProductLookupCommand, fields: Optional[str] = FIELDS_QUERY):
+    if len(command.ids) + len(command.skus) > MAX_LOOKUP_KEYS:
+        raise HTTPException(status_code=400, detail=f"A lookup accepts at most {MAX_LOOKUP_KEYS} ids and SKUs")
+    
+    requested = parse_fields(fields)
+    items, missing_ids, missing_skus = db.lookup_products(command.ids, command.skus, requested)
+    if requested is not None:
+        return JSONResponse(content={"items": items, "missingIds": missing_ids, "missingSkus": missing_skus})
+    
+    return ProductLookupResult(items=items, missingIds=missing_ids, missingSkus=missing_skus)
+
+
+IMPORT_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "text/csv": {"schema": {"type": "string", "format": "binary"}},
+        "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}
+    }
+}
+
+
+def import_format(format: Optional[ImportFormat], content_type: str) -> ImportFormat:
+    if format:
+        return format
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "jsonl"
+    raise HTTPException(status_code=400, detail="Specify format=csv or format=jsonl, or send a text/csv or application/x-ndjson body")
+
+
+@app.post("/api/Products/import", response_model=ImportResult, tags=["Products"], operation_id="ImportProducts",
+          openapi_extra={"requestBody": IMPORT_REQUEST_BODY})
+async def import_products(request: Request, format: Optional[ImportFormat] = None):
+    """Upsert products by SKU from a CSV or JSON-lines body, streamed in batches"""
+    from importer import CatalogImporter
+    importer = CatalogImporter(db, import_format(format, request.headers.get("content-type", "")))
+    # Parsing and batch upserts run in the threadpool so a large upload does
+    # not hold up the event loop while it waits on the store lock
+    async for chunk in request.stream():
+        await run_in_threadpool(importer.feed, chunk)
+    return await run_in_threadpool(importer.finish)
+
+
+@app.post("/api/Products", response_model=int, tags=["Products"], operation_id="CreateProduct")
+async def create_product(command: CreateProductCommand):
+    try:
+        product_id = db.create_product(
+            name=command.name,
+            sku=command.sku,
+            quantity=command.quantity,
+            price=command.price,
+            status=command.status,
+            description=command.description,
+            category_id=command.categoryId,
+            reorder_threshold=command.reorderThreshold
+        )
+        return product_id
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.put("/api/Products/{id}", tags=["Products"], operation_id="UpdateProduct")
+async def update_product(id: int, command: UpdateProductCommand):
+    try:
+        success = db.update_product(
+            id=id,
+            name=command.name,
+            sku=command.sku,
+            quantity=command.quantity,
+            price=command.price,
+            status=command.status,
+            description=command.description,
+            category_id=command.categoryId,
+            reorder_threshold=command.reorderThreshold
+        )
+        if not success:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        return Response(status_code=200)
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/Products/{id}/availability", response_model=ProductAvailability, tags=["Products"], operation_id="GetProductAvailability")
+async def get_product_availability(id: int):
+    availability = db.get_product_availability(id)
+    if not availability:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return availability
+
+
+@app.patch("/api/Products/{id}/inventory", tags=["Products"], operation_id="UpdateInventory")
+async def update_inventory(id: int, command: UpdateInventoryCommand):
+    try:
+        success = db.update_product_inventory(id, command.quantity)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return Response(status_code=200)
+
+
+@app.post("/api/Products/{id}/inventory/adjustments", response_model=InventoryLevel, tags=["Products"], operation_id="AdjustInventory")
+async def adjust_inventory(id: int, command: AdjustInventoryCommand):
+    try:
+        quantity = db.adjust_product_inventory(id, command.delta, command.reason)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if quantity is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return InventoryLevel(productId=id, quantity=quantity)
+
+
+@app.get("/api/Products/{id}/history", response_model=List[PriceVersion], tags=["Products"], operation_id="GetProductPriceHistory")
+async def get_product_price_history(id: int):
+    """Retained price and quantity versions of a product, oldest first"""
+    history = db.get_price_history(id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return history
+
+
+@app.get("/api/Products/{id}/velocity", response_model=SalesVelocity, tags=["Products"], operation_id="GetProductVelocity")
+async def get_product_velocity(id: int, days: float = VELOCITY_DAYS_QUERY):
+    """Units sold per day over the last `days` days, and how many days current stock would last"""
+    velocity = db.get_product_velocity(id, days)
+    if not velocity:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return velocity
+
+
+@app.get("/api/Products/{id}/locations", response_model=ProductLocationStock, tags=["Locations"], operation_id="GetProductLocations")
+async def get_product_locations(id: int):
+    stock = db.get_product_locations(id)
+    if not stock:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return stock
+
+
+@app.put("/api/Products/{id}/locations/{location_id}", response_model=InventoryLevel, tags=["Locations"], operation_id="UpdateLocationStock")
+async def update_location_stock(id: int, location_id: int, command: UpdateInventoryCommand):
+    """Set the stock held at one location; the product's total quantity moves by the same amount"""
+    try:
+        quantity = db.set_location_stock(id, location_id, command.quantity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if quantity is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return InventoryLevel(productId=id, quantity=quantity)
+
+
+@app.put("/api/Products/{id}/status", tags=["Products"], operation_id="UpdateProductStatus")
+async def update_product_status(id: int, command: UpdateStatusCommand):
+    try:
+        success = db.change_product_status(id, command.status)
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return Response(status_code=200)
+
+
+@app.put("/api/Products/{id}/status/schedule", response_model=ScheduledStatusChange, tags=["Products"], operation_id="ScheduleProductStatus")
+async def schedule_product_status(id: int, command: ScheduleStatusCommand):
+    """Change the status at `at` (e.g. PreOrder to InStock on release day); replaces any earlier schedule"""
+    try:
+        scheduled = db.schedule_status_change(id, command.status, command.at)
+    except InvalidTransitionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not scheduled:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return scheduled
+
+
+@app.get("/api/Products/{id}/status/schedule", response_model=ScheduledStatusChange, tags=["Products"], operation_id="GetScheduledProductStatus")
+async def get_scheduled_product_status(id: int):
+    scheduled = db.get_scheduled_status_change(id)
+    if not scheduled:
+        raise HTTPException(status_code=404, detail="No status change scheduled")
+    
+    return scheduled
+
+
+@app.delete("/api/Products/{id}/status/schedule", tags=["Products"], operation_id="CancelScheduledProductStatus")
+async def cancel_scheduled_product_status(id: int):
+    if not db.cancel_status_change(id):
+        raise HTTPException(status_code=404, detail="No status change scheduled")
+    
+    return Response(status_code=200)
+
+
+@app.delete("/api/Products/{id}", tags=["Products"], operation_id="DeleteProduct")
+async def delete_product(id: int):
+    success = db.delete_product(id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return Response(status_code=200)
+
+
+# Inventory movement endpoints
+DEFAULT_MOVEMENTS_LIMIT = 1000
+MAX_MOVEMENTS_LIMIT = 10000
+
+
+@app.get("/api/Inventory/movements", response_model=StockMovementPage, tags=["Inventory"], operation_id="GetStockMovements")
+async def get_stock_movements(since: int = Query(0, ge=0, description="`next` from the previous page; 0 for the oldest retained"),
+                              limit: int = Query(DEFAULT_MOVEMENTS_LIMIT, ge=1, le=MAX_MOVEMENTS_LIMIT)):
+    """Every stock movement in the order it happened"""
+    return db.get_movements(since, limit)
+
+
+# Location endpoints
+@app.get("/api/Locations", response_model=List[Location], tags=["Locations"], operation_id="GetLocations")
+async def get_locations():
+    return db.get_locations()
+
+
+@app.post("/api/Locations", response_model=Location, tags=["Locations"], operation_id="CreateLocation")
+async def create_location(command: CreateLocationCommand):
+    return db.create_location(command.name)
+
+
+@app.post("/api/Locations/stock-matrix", response_model=StockMatrix, tags=["Locations"], operation_id="GetStockMatrix")
+async def get_stock_matrix(command: StockMatrixCommand):
+    """Stock of the given products (by id or SKU) at each of the given locations"""
+    if len(command.productIds) + len(command.skus) > MAX_LOOKUP_KEYS:
+        raise HTTPException(status_code=400, detail=f"A matrix accepts at most {MAX_LOOKUP_KEYS} ids and SKUs")
+    try:
+        return db.get_stock_matrix(command.locationIds, command.productIds, command.skus)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Transaction endpoints
+MAX_TRANSACTION_OPERATIONS = 1000
+
+
+@app.post("/api/Transactions", response_model=TransactionResult, tags=["Transactions"], operation_id="ApplyTransaction")
+async def apply_transaction(command: TransactionCommand):
+    """Apply product, stock and category changes together; if any operation fails, none is applied"""
+    if len(command.operations) > MAX_TRANSACTION_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"A transaction accepts at most {MAX_TRANSACTION_OPERATIONS} operations")
+    try:
+        return db.apply_transaction(command.operations)
+    except TransactionError as e:
+        conflict = isinstance(e.error, (InsufficientStockError, InvalidTransitionError))
+        raise HTTPException(status_code=409 if conflict else 400, detail=str(e))
+
+
+# Reservation endpoints
+@app.post("/api/Reservations", response_model=Reservation, tags=["Reservations"], operation_id="CreateReservation")
+async def create_reservation(command: CreateReservationCommand):
+    try:
+        reservation = db.reserve_inventory(command.productId, command.quantity, command.ttlSeconds)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    return reservation
+
+
+@app.get("/api/Reservations/{id}", response_model=Reservation, tags=["Reservations"], operation_id="GetReservation")
+async def get_reservation(id: int):
+    reservation = db.get_reservation(id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    return reservation
+
+
+@app.post("/api/Reservations/{id}/confirm", tags=["Reservations"], operation_id="ConfirmReservation")
+async def confirm_reservation(id: int):
+    try:
+        success = db.confirm_reservation(id)
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not success:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    return Response(status_code=200)
+
+
+@app.delete("/api/Reservations/{id}", tags=["Reservations"], operation_id="ReleaseReservation")
+async def release_reservation(id: int):
+    success = db.release_reservation(id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    
+    return Response(status_code=200)
+
+
+# Job endpoints
+# Uploaded feeds stay in memory up to this size before spilling to disk
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@app.post("/api/Jobs/import", response_model=Job, status_code=202, tags=["Jobs"], operation_id="SubmitImportJob",
+          openapi_extra={"requestBody": IMPORT_REQUEST_BODY})
+async def submit_import_job(request: Request, format: Optional[ImportFormat] = None):
+    from jobs import import_job
+    import tempfile
+    feed_format = import_format(format, request.headers.get("content-type", ""))
+    feed = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    async for chunk in request.stream():
+        feed.write(chunk)
+    return job_manager().submit("import", import_job(db, feed, feed_format), discard=feed.close)
+
+
+@app.post("/api/Jobs/reindex", response_model=Job, status_code=202, tags=["Jobs"], operation_id="SubmitReindexJob")
+async def submit_reindex_job():
+    from jobs import reindex_job
+    return job_manager().submit("reindex", reindex_job(db))
+
+
+@app.post("/api/Jobs/export", response_model=Job, status_code=202, tags=["Jobs"], operation_id="SubmitExportJob")
+async def submit_export_job():
+    from jobs import export_job, new_export_path
+    path = new_export_path()
+    return job_manager().submit("export", export_job(db, path), artifact=path)
+
+
+@app.get("/api/Jobs/{id}", response_model=Job, tags=["Jobs"], operation_id="GetJob")
+async def get_job(id: int):
+    job = job_manager().get(id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+
+@app.get("/api/Jobs/{id}/download", tags=["Jobs"], operation_id="DownloadJobResult")
+async def download_job_result(id: int):
+    manager = job_manager()
+    if not manager.get(id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    path = manager.get_artifact(id)
+    if not path:
+        raise HTTPException(status_code=409, detail="Job has no downloadable result")
+    
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"products-{id}.jsonl")
+
+
+@app.delete("/api/Jobs/{id}", response_model=Job, tags=["Jobs"], operation_id="CancelJob")
+async def cancel_job(id: int):
+    job = job_manager().cancel(id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
+
+
+# Category endpoints
+@app.get("/api/ProductCategories", response_model=List[ProductCategoryItem], tags=["Categories"], operation_id="GetCategories")
+async def get_categories(media_type: Optional[str] = BINARY_FORMAT):
+    return list_response(db.get_all_categories(), None, media_type, CATEGORY_ITEM_FIELDS)
+
+
+@app.get("/api/ProductCategories/{id}", response_model=ProductCategoryItem, tags=["Categories"], operation_id="GetCategoryById")
+async def get_category_by_id(id: int):
+    category = db.get_category_item_by_id(id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return category
+
+
+@app.get("/api/ProductCategories/{id}/products", response_model=List[ProductItem], tags=["Categories"], operation_id="GetProductsInCategory")
+async def get_products_in_category(id: int, media_type: Optional[str] = BINARY_FORMAT):
+    category = db.get_category_by_id(id)
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return await shared_list_response(("GetProductsByCategory", id), lambda: db.get_products_by_category(id),
+                                      None, media_type)
+
+
+@app.get("/api/ProductCategories/{id}/descendants", response_model=List[ProductCategoryItem], tags=["Categories"], operation_id="GetCategoryDescendants")
+async def get_category_descendants(id: int, media_type: Optional[str] = BINARY_FORMAT):
+    """All categories below this one, level by level"""
+    descendants = db.get_category_descendants(id)
+    if descendants is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return list_response(descendants, None, media_type, CATEGORY_ITEM_FIELDS)
+
+
+@app.get("/api/ProductCategories/{id}/velocity", response_model=SalesVelocity, tags=["Categories"], operation_id="GetCategoryVelocity")
+async def get_category_velocity(id: int, days: float = VELOCITY_DAYS_QUERY):
+    """Sales velocity of every product in this category and the categories below it"""
+    velocity = db.get_category_velocity(id, days)
+    if not velocity:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return velocity
+
+
+@app.get("/api/ProductCategories/{id}/subtree/products", response_model=List[ProductItem], tags=["Categories"], operation_id="GetProductsInCategorySubtree")
+async def get_products_in_category_subtree(id: int, fields: Optional[str] = FIELDS_QUERY,
+                                           media_type: Optional[str] = BINARY_FORMAT):
+    """Products of this category and all categories below it"""
+    requested = parse_fields(fields)
+    products = db.get_products_in_subtree(id, requested)
+    if products is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return list_response(products, requested, media_type)
+
+
+@app.post("/api/ProductCategories", response_model=int, tags=["Categories"], operation_id="CreateCategory")
+async def create_category(command: CreateProductCategoryCommand):
+    try:
+        category_id = db.create_category(
+            name=command.name,
+            description=command.description,
+            is_active=command.isActive,
+            reorder_threshold=command.reorderThreshold,
+            parent_id=command.parentId
+        )
+        return category_id
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.put("/api/ProductCategories/{id}", tags=["Categories"], operation_id="UpdateCategory")
+async def update_category(id: int, command: UpdateProductCategoryCommand):
+    try:
+        success = db.update_category(
+            id=id,
+            name=command.name,
+            description=command.description,
+            is_active=command.isActive,
+            reorder_threshold=command.reorderThreshold,
+            parent_id=command.parentId
+        )
+        if not success:
+            raise HTTPException(status_code=404, detail="Category not found")
+        
+        return Response(status_code=200)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/ProductCategories/{id}/products/move", response_model=MoveCategoryProductsResult, tags=["Categories"], operation_id="MoveCategoryProducts")
+async def move_category_products(id: int, command: MoveCategoryProductsCommand):
+    """Move every product of this category to another category in one step"""
+    try:
+        moved = db.move_category_products(id, command.targetCategoryId)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if moved is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    return MoveCategoryProductsResult(moved=moved)
+
+
+@app.delete("/api/ProductCategories/{id}", tags=["Categories"], operation_id="DeleteCategory")
+async def delete_category(id: int,
+                          reassign_to: Optional[int] = Query(None, alias="reassignTo",
+                                                             description="Move the category's products here first"),
+                          orphan_products: bool = Query(False, alias="orphanProducts",
+                                                        description="Leave the category's products without a category")):
+    if reassign_to is not None and orphan_products:
+        raise HTTPException(status_code=400, detail="Pass either reassignTo or orphanProducts, not both")
+    try:
+        success = db.delete_category(id, reassign_to, orphan_products)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not success:
+        # Check if it's because there are products in this category
+        category = db.get_category_item_by_id(id)
+        if category and category.productCount:
+            raise HTTPException(status_code=400, detail="Cannot delete category with existing products; "
+                                                        "pass reassignTo or orphanProducts=true")
+        else:
+            raise HTTPException(status_code=404, detail="Category not found")
+    
+    return Response(status_code=200)
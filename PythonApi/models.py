@@ -1,84 +1,396 @@
-from pydantic import BaseModel
-from typing import Optional
-from enum import IntEnum
-
-
-class ProductStatus(IntEnum):
-    InStock = 0
-    OutOfStock = 1
-    Discontinued = 2
-    PreOrder = 3
-
-
-class ProductItem(BaseModel):
-    id: int
-    name: str
-    sku: str
-    quantity: int
-    price: float
-    status: ProductStatus
-    description: Optional[str] = None
-    categoryId: Optional[int] = None
-    categoryName: Optional[str] = None
-
-
-class Product(BaseModel):
-    id: int
-    name: str
-    sku: str
-    quantity: int
-    price: float
-    status: ProductStatus
-    description: Optional[str] = None
-    categoryId: Optional[int] = None
-
-
-class CreateProductCommand(BaseModel):
-    name: str
-    sku: str
-    quantity: int
-    price: float
-    status: ProductStatus = ProductStatus.InStock
-    description: Optional[str] = None
-    categoryId: Optional[int] = None
-
-
-class UpdateProductCommand(BaseModel):
-    name: str
-    sku: str
-    quantity: int
-    price: float
-    status: ProductStatus
-    description: Optional[str] = None
-    categoryId: Optional[int] = None
-
-
-class UpdateInventoryCommand(BaseModel):
-    quantity: int
-
-
-class ProductCategoryItem(BaseModel):
-    id: int
-    name: str
-    description: Optional[str] = None
-    isActive: bool = True
-    productCount: int = 0
-
-
-class ProductCategory(BaseModel):
-    id: int
-    name: str
-    description: Optional[str] = None
-    isActive: bool = True
-
-
-class CreateProductCategoryCommand(BaseModel):
-    name: str
-    description: Optional[str] = None
-    isActive: bool = True
-
-
-class UpdateProductCategoryCommand(BaseModel):
-    name: str
-    description: Optional[str] = None
-    isActive: bool
\ No newline at end of file
+from pydantic import BaseModel, model_validator
+from typing import Any, Dict, List, Literal, Optional
+from datetime import datetime
+from enum import IntEnum
+
+
+class ProductStatus(IntEnum):
+    InStock = 0
+    OutOfStock = 1
+    Discontinued = 2
+    PreOrder = 3
+
+
+class MovementReason(IntEnum):
+    Count = 0
+    Sale = 1
+    Restock = 2
+    Adjustment = 3
+    ProductUpdate = 4
+
+
+class ProductItem(BaseModel):
+    id: int
+    name: str
+    sku: str
+    quantity: int
+    price: float
+    status: ProductStatus
+    description: Optional[str] = None
+    categoryId: Optional[int] = None
+    categoryName: Optional[str] = None
+    reorderThreshold: Optional[int] = None
+
+
+# Columns that can be requested through the `fields=` projection parameter
+PRODUCT_ITEM_FIELDS = tuple(ProductItem.model_fields)
+
+
+class Product(BaseModel):
+    id: int
+    name: str
+    sku: str
+    quantity: int
+    price: float
+    status: ProductStatus
+    description: Optional[str] = None
+    categoryId: Optional[int] = None
+    # Stock level below which the product counts as low; falls back to the category's
+    reorderThreshold: Optional[int] = None
+
+
+class CreateProductCommand(BaseModel):
+    name: str
+    sku: str
+    quantity: int
+    price: float
+    status: ProductStatus = ProductStatus.InStock
+    description: Optional[str] = None
+    categoryId: Optional[int] = None
+    reorderThreshold: Optional[int] = None
+
+
+class UpdateProductCommand(BaseModel):
+    name: str
+    sku: str
+    quantity: int
+    price: float
+    status: ProductStatus
+    description: Optional[str] = None
+    categoryId: Optional[int] = None
+    reorderThreshold: Optional[int] = None
+
+
+class UpdateInventoryCommand(BaseModel):
+    quantity: int
+
+
+class AdjustInventoryCommand(BaseModel):
+    delta: int
+    # Defaults to Sale for negative deltas and Restock for positive ones
+    reason: Optional[MovementReason] = None
+
+
+class StockMovement(BaseModel):
+    sequence: int
+    timestamp: datetime
+    productId: int
+    delta: int
+    reason: MovementReason
+
+
+class StockMovementPage(BaseModel):
+    movements: List[StockMovement] = []
+    # Pass back as `since` to continue
+    next: int
+
+
+class SalesVelocity(BaseModel):
+    productId: Optional[int] = None
+    categoryId: Optional[int] = None
+    windowDays: float
+    unitsSold: int
+    unitsPerDay: float
+    quantity: int
+    # None when nothing sold in the window
+    daysOfStock: Optional[float] = None
+
+
+class PriceVersion(BaseModel):
+    # None for the values a product had before history was kept for it
+    since: Optional[datetime] = None
+    price: float
+    quantity: int
+
+
+class CatalogValuation(BaseModel):
+    asOf: datetime
+    productsInStock: int = 0
+    totalQuantity: int = 0
+    totalValue: float = 0.0
+
+
+class UpdateStatusCommand(BaseModel):
+    status: ProductStatus
+
+
+class ScheduleStatusCommand(BaseModel):
+    status: ProductStatus
+    at: datetime
+
+
+class ScheduledStatusChange(BaseModel):
+    productId: int
+    status: ProductStatus
+    at: datetime
+
+
+class InventoryLevel(BaseModel):
+    productId: int
+    quantity: int
+
+
+class ProductLookupCommand(BaseModel):
+    ids: List[int] = []
+    skus: List[str] = []
+
+
+class ProductLookupResult(BaseModel):
+    items: List[ProductItem] = []
+    missingIds: List[int] = []
+    missingSkus: List[str] = []
+
+
+class ProductChange(BaseModel):
+    version: int
+    productId: int
+    sku: str
+    deleted: bool = False
+    deletedAt: Optional[datetime] = None
+    # Current state; absent for deleted products
+    product: Optional[ProductItem] = None
+
+
+class ProductChangeFeed(BaseModel):
+    # Pass back as `since` to get the next changes
+    version: int
+    changes: List[ProductChange] = []
+    hasMore: bool = False
+    # Deletions after `since` may have been compacted; reload the full catalog
+    resyncRequired: bool = False
+
+
+class Location(BaseModel):
+    id: int
+    name: str
+    # Units of all products stocked here
+    totalQuantity: int = 0
+
+
+class CreateLocationCommand(BaseModel):
+    name: str
+
+
+class LocationQuantity(BaseModel):
+    locationId: int
+    quantity: int
+
+
+class ProductLocationStock(BaseModel):
+    productId: int
+    quantity: int
+    # Part of `quantity` not held at any location
+    unassigned: int
+    locations: List[LocationQuantity] = []
+
+
+class StockMatrixCommand(BaseModel):
+    locationIds: List[int]
+    productIds: List[int] = []
+    skus: List[str] = []
+
+
+class StockMatrixRow(BaseModel):
+    productId: int
+    sku: str
+    # One entry per requested location, in request order
+    quantities: List[int]
+
+
+class StockMatrix(BaseModel):
+    locationIds: List[int]
+    rows: List[StockMatrixRow] = []
+
+
+class CreateReservationCommand(BaseModel):
+    productId: int
+    quantity: int
+    ttlSeconds: float = 300
+
+
+class Reservation(BaseModel):
+    id: int
+    productId: int
+    quantity: int
+    expiresAt: datetime
+
+
+class ProductAvailability(BaseModel):
+    productId: int
+    quantity: int
+    reserved: int
+    available: int
+
+
+class LowStockEvent(BaseModel):
+    """Published when a product's stock crosses its reorder threshold, in either direction"""
+    id: int
+    productId: int
+    sku: str
+    quantity: int
+    threshold: Optional[int] = None
+    belowThreshold: bool
+    occurredAt: datetime
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errorsTruncated: bool = False
+
+
+class JobStatus(IntEnum):
+    Queued = 0
+    Running = 1
+    Succeeded = 2
+    Failed = 3
+    Cancelled = 4
+
+
+class Job(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    progress: float = 0.0
+    createdAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class ProductCategoryItem(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    isActive: bool = True
+    reorderThreshold: Optional[int] = None
+    parentId: Optional[int] = None
+    productCount: int = 0
+    # Totals over this category and all its descendants
+    subtreeProductCount: int = 0
+    subtreeQuantity: int = 0
+    subtreeStockValue: float = 0.0
+
+
+class ProductCategory(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    isActive: bool = True
+    reorderThreshold: Optional[int] = None
+    parentId: Optional[int] = None
+
+
+class CreateProductCategoryCommand(BaseModel):
+    name: str
+    description: Optional[str] = None
+    isActive: bool = True
+    reorderThreshold: Optional[int] = None
+    parentId: Optional[int] = None
+
+
+class UpdateProductCategoryCommand(BaseModel):
+    name: str
+    description: Optional[str] = None
+    isActive: bool
+    reorderThreshold: Optional[int] = None
+    parentId: Optional[int] = None
+
+
+class MoveCategoryProductsCommand(BaseModel):
+    # None moves the products out of any category
+    targetCategoryId: Optional[int] = None
+
+
+class MoveCategoryProductsResult(BaseModel):
+    moved: int
+
+
+class SingleFlightStats(BaseModel):
+    endpoint: str
+    # Computations run, and requests that shared one already in flight
+    executions: int
+    coalesced: int
+
+
+class SingleFlightReport(BaseModel):
+    inFlight: int
+    endpoints: List[SingleFlightStats]
+
+
+# Formats the catalog importer reads
+ImportFormat = Literal["csv", "jsonl"]
+
+
+TransactionOperationType = Literal["updateProduct", "setInventory", "adjustInventory", "updateCategory"]
+# Attributes each kind of transaction operation takes besides op and id
+TRANSACTION_OPERATION_FIELDS = {
+    "updateProduct": {"name", "sku", "price", "status", "description", "categoryId", "reorderThreshold"},
+    "setInventory": {"quantity", "reason"},
+    "adjustInventory": {"delta", "reason"},
+    "updateCategory": {"name", "description", "reorderThreshold", "isActive", "parentId"},
+}
+
+
+class TransactionOperation(BaseModel):
+    """One step of a transaction.
+    
+    `id` is the product (or, for updateCategory, the category) to change.
+    Updates are partial: attributes left out keep their current value.
+    """
+    op: TransactionOperationType
+    id: int
+    # updateProduct
+    name: Optional[str] = None
+    sku: Optional[str] = None
+    price: Optional[float] = None
+    status: Optional[ProductStatus] = None
+    description: Optional[str] = None
+    categoryId: Optional[int] = None
+    reorderThreshold: Optional[int] = None
+    # setInventory and adjustInventory
+    quantity: Optional[int] = None
+    delta: Optional[int] = None
+    reason: Optional[MovementReason] = None
+    # updateCategory (also name, description and reorderThreshold)
+    isActive: Optional[bool] = None
+    parentId: Optional[int] = None
+    
+    @model_validator(mode="after")
+    def check_fields(self) -> "TransactionOperation":
+        # Reject attributes the operation would otherwise silently ignore
+        unexpected = self.model_fields_set - {"op", "id"} - TRANSACTION_OPERATION_FIELDS[self.op]
+        if unexpected:
+            raise ValueError(f"{self.op} does not take {', '.join(sorted(unexpected))}")
+        return self
+
+
+class TransactionCommand(BaseModel):
+    operations: List[TransactionOperation]
+
+
+class TransactionResult(BaseModel):
+    # Change feed version after the transaction
+    version: int
+    # Products and categories changed, in the order first touched
+    productIds: List[int] = []
+    categoryIds: List[int] = []
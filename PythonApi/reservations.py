@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from models import Reservation
+from timers import TimerHeap
+
+
+class ReservationBook:
+    """Active inventory holds with TTL expiry.
+    
+    Keeps a running held total per product so available stock is O(1), and
+    a timer heap so expiry only touches the holds that are actually due.
+    Not thread-safe; InMemoryDatabase calls it while holding its lock.
+    """
+    
+    def __init__(self):
+        self._holds: Dict[int, Reservation] = {}
+        self._held: Dict[int, int] = {}
+        self._by_product: Dict[int, Set[int]] = {}
+        self._timers = TimerHeap()
+        self._next_id = 1
+    
+    def __len__(self) -> int:
+        return len(self._holds)
+    
+    def held(self, product_id: int) -> int:
+        return self._held.get(product_id, 0)
+    
+    def get(self, id: int) -> Optional[Reservation]:
+        return self._holds.get(id)
+    
+    def add(self, product_id: int, quantity: int, expires_at: float) -> Reservation:
+        reservation = Reservation(
+            id=self._next_id,
+            productId=product_id,
+            quantity=quantity,
+            expiresAt=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+        )
+        self._next_id += 1
+        
+        self._holds[reservation.id] = reservation
+        self._held[product_id] = self._held.get(product_id, 0) + quantity
+        self._by_product.setdefault(product_id, set()).add(reservation.id)
+        self._timers.schedule(reservation.id, expires_at)
+        return reservation
+    
+    def remove(self, id: int) -> Optional[Reservation]:
+        reservation = self._holds.pop(id, None)
+        if reservation is None:
+            return None
+        
+        self._timers.cancel(id)
+        self._release(reservation)
+        return reservation
+    
+    def remove_product(self, product_id: int) -> List[Reservation]:
+        """Drop every hold on a product, e.g. when the product is deleted"""
+        return [self.remove(id) for id in list(self._by_product.get(product_id, ()))]
+    
+    def expire(self, now: float) -> List[Reservation]:
+        """Reclaim holds whose TTL has passed"""
+        expired = []
+        for id in self._timers.pop_due(now):
+            reservation = self._holds.pop(id)
+            self._release(reservation)
+            expired.append(reservation)
+        return expired
+    
+    def next_expiry(self) -> Optional[float]:
+        return self._timers.next_deadline()
+    
+    def _release(self, reservation: Reservation):
+        product_id = reservation.productId
+        remaining = self._held[product_id] - reservation.quantity
+        if remaining:
+            self._held[product_id] = remaining
+        else:
+            del self._held[product_id]
+        
+        ids = self._by_product[product_id]
+        ids.discard(reservation.id)
+        if not ids:
+            del self._by_product[product_id]
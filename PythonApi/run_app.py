@@ -1,16 +1,33 @@
 # run_app.py
 
 import uvicorn
-import os
+from settings import settings
 
-if __name__ == "__main__":
-    # Retrieve the PORT environment variable if it exists, otherwise default to 8000
-    port = int(os.environ.get("PORT", 8000))
 
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=port,
-        workers=1, # Can only be 1 since we are using an in-memory database
+def server_options() -> dict:
+    """uvicorn options for the serving profile in Settings.server_*"""
+    options = dict(
+        loop=settings.server_loop,
+        http=settings.server_http,
+        ws="none",  # No WebSocket endpoints
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keep_alive_seconds,
+        limit_concurrency=settings.server_limit_concurrency,
+        # In-flight requests get this long to finish on SIGTERM before the
+        # lifespan shutdown (which writes Settings.snapshot_file) runs
+        timeout_graceful_shutdown=settings.server_graceful_shutdown_seconds,
+        access_log=settings.server_access_log,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.server_forwarded_allow_ips,
+        workers=1,  # Can only be 1 since we are using an in-memory database
         reload=False  # Set to False in production
     )
+    if settings.server_uds:
+        options["uds"] = settings.server_uds
+    else:
+        options.update(host=settings.server_host, port=settings.port)
+    return options
+
+
+if __name__ == "__main__":
+    uvicorn.run("main:app", **server_options())
@@ -0,0 +1,237 @@
+"""Catalog seeding: the built-in sample data, catalog files and synthetic catalogs.
+
+Synthetic catalogs can also be written to a file for repeatable benchmarks:
+
+    python seeding.py catalog.json --products 1000000 --categories 500
+"""
+import argparse
+import json
+import math
+import os
+import random
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple, Type, TypeVar
+from pydantic import BaseModel, TypeAdapter
+from models import Product, ProductCategory, ProductStatus
+
+if TYPE_CHECKING:
+    from database import InMemoryDatabase
+    from settings import Settings
+
+Catalog = Tuple[List[ProductCategory], List[Product]]
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+SAMPLE_CATEGORIES = [
+    {"name": "Electronics", "description": "Electronic devices and accessories"},
+    {"name": "Clothing", "description": "Apparel and fashion items"},
+    {"name": "Books", "description": "Books and educational materials"},
+    {"name": "Home & Garden", "description": "Home improvement and garden supplies"},
+    {"name": "Sports", "description": "Sports equipment and accessories"}
+]
+
+# categoryId is the 1-based position in SAMPLE_CATEGORIES
+SAMPLE_PRODUCTS = [
+    {"name": "Wireless Headphones", "sku": "WH-001", "price": 199.99, "quantity": 50, "categoryId": 1},
+    {"name": "Smartphone", "sku": "SP-002", "price": 699.99, "quantity": 25, "categoryId": 1},
+    {"name": "Cotton T-Shirt", "sku": "CT-003", "price": 29.99, "quantity": 100, "categoryId": 2},
+    {"name": "Jeans", "sku": "JN-004", "price": 79.99, "quantity": 75, "categoryId": 2},
+    {"name": "Python Programming Book", "sku": "PB-005", "price": 49.99, "quantity": 30, "categoryId": 3},
+    {"name": "Garden Hose", "sku": "GH-006", "price": 39.99, "quantity": 20, "categoryId": 4},
+    {"name": "Basketball", "sku": "BB-007", "price": 24.99, "quantity": 15, "categoryId": 5}
+]
+
+_category_list = TypeAdapter(List[ProductCategory])
+_product_list = TypeAdapter(List[Product])
+
+
+# Slot setters for _slot_model; going through the descriptors directly is
+# noticeably cheaper than object.__setattr__ when building millions of rows
+try:
+    _set_fields_set = BaseModel.__dict__["__pydantic_fields_set__"].__set__
+    _set_extra = BaseModel.__dict__["__pydantic_extra__"].__set__
+    _set_private = BaseModel.__dict__["__pydantic_private__"].__set__
+except (KeyError, AttributeError):
+    _set_fields_set = _set_extra = _set_private = None
+
+
+def _validated_model(cls: Type[ModelT], values: Dict[str, Any], fields_set: Optional[Set[str]] = None) -> ModelT:
+    return cls.model_validate(values)
+
+
+def _slot_model(cls: Type[ModelT], values: Dict[str, Any], fields_set: Optional[Set[str]] = None) -> ModelT:
+    model = object.__new__(cls)
+    object.__setattr__(model, "__dict__", values)
+    _set_fields_set(model, fields_set if fields_set is not None else set(values))
+    _set_extra(model, None)
+    _set_private(model, None)
+    return model
+
+
+def _pick_model_builder():
+    """The slot-filling builder if it still yields the same models as validation, else validation.
+    
+    Filling __dict__ and pydantic's instance slots directly relies on
+    pydantic internals, so it is checked against the public constructor
+    once at import and dropped if a pydantic upgrade changes them. The
+    public model_construct is no substitute: it is slower than validating
+    (about 6 us against 2.3 us per Product with pydantic 2.9, and 1.3 us
+    for the slot builder).
+    """
+    if _set_fields_set is None:
+        return _validated_model
+    values = {"id": 1, "name": "Probe", "sku": "PROBE", "quantity": 1, "price": 1.0,
+              "status": ProductStatus.InStock, "description": None, "categoryId": None, "reorderThreshold": None}
+    try:
+        probe = _slot_model(Product, dict(values))
+        expected = Product.model_validate(values)
+        if probe == expected and probe.model_fields_set == expected.model_fields_set \
+                and probe.model_copy(update={"quantity": 2}).quantity == 2:
+            return _slot_model
+    except Exception:
+        pass
+    return _validated_model
+
+
+_build_model = _pick_model_builder()
+
+
+def trusted_model(cls: Type[ModelT], values: Dict[str, Any], fields_set: Optional[Set[str]] = None) -> ModelT:
+    """Build a model from already-valid values, skipping validation where possible.
+    
+    Several times faster than the model constructor, which matters when
+    seeding millions of rows. `values` must hold every field of the model.
+    Bulk callers can share one `fields_set` between all the models they build.
+    """
+    return _build_model(cls, values, fields_set)
+
+
+def sample_catalog(first_category_id: int = 1, first_product_id: int = 1) -> Catalog:
+    """The small demo catalog, numbered from the given ids"""
+    categories = [
+        ProductCategory(id=first_category_id + i, name=data["name"], description=data["description"], isActive=True)
+        for i, data in enumerate(SAMPLE_CATEGORIES)
+    ]
+    products = [
+        Product(
+            id=first_product_id + i,
+            name=data["name"],
+            sku=data["sku"],
+            price=data["price"],
+            quantity=data["quantity"],
+            status=ProductStatus.InStock if data["quantity"] > 0 else ProductStatus.OutOfStock,
+            categoryId=first_category_id + data["categoryId"] - 1
+        )
+        for i, data in enumerate(SAMPLE_PRODUCTS)
+    ]
+    return categories, products
+
+
+def generate_catalog(products: int, categories: int, seed: int = 0) -> Catalog:
+    """Generate a synthetic catalog with production-like skew.
+    
+    Category sizes follow a Zipf-like distribution, so a few categories hold
+    most of the products. Each category has its own typical price and prices
+    are log-normally spread around it. Stock levels are long-tailed with a
+    share of sold-out items, and a small share of products are discontinued
+    or on pre-order.
+    """
+    if categories < 1 and products:
+        raise ValueError("A catalog with products needs at least one category")
+    
+    rng = random.Random(seed)
+    category_models = [
+        trusted_model(ProductCategory, {
+            "id": i, "name": f"Category {i:05d}", "description": f"Synthetic category {i}", "isActive": True,
+            "reorderThreshold": None, "parentId": None
+        })
+        for i in range(1, categories + 1)
+    ]
+    
+    # Zipf-like weights (s = 1.1) and a typical price per category
+    cumulative = list(accumulate(1 / rank ** 1.1 for rank in range(1, categories + 1)))
+    medians = [rng.lognormvariate(3.5, 1.0) for _ in range(categories)]
+    category_ids = rng.choices(range(categories), cum_weights=cumulative, k=products)
+    
+    in_stock, out_of_stock = ProductStatus.InStock, ProductStatus.OutOfStock
+    discontinued, pre_order = ProductStatus.Discontinued, ProductStatus.PreOrder
+    random_value, gauss, exp, log = rng.random, rng.gauss, math.exp, math.log
+    fields_set = set(Product.model_fields)
+    
+    product_models = []
+    append = product_models.append
+    for i in range(products):
+        category = category_ids[i]
+        roll = random_value()
+        if roll < 0.08:
+            quantity = 0
+        else:
+            # Exponential with a mean of about 60 units
+            quantity = int(-60 * log(1.0 - random_value())) + 1
+        if roll > 0.98:
+            status = pre_order
+        elif roll > 0.95:
+            status = discontinued
+        else:
+            status = in_stock if quantity else out_of_stock
+        
+        product_id = i + 1
+        append(trusted_model(Product, {
+            "id": product_id,
+            "name": f"Product {product_id}",
+            "sku": f"SYN-{product_id:08d}",
+            "quantity": quantity,
+            "price": round(medians[category] * exp(gauss(0, 0.35)), 2),
+            "status": status,
+            "description": None,
+            "categoryId": category + 1,
+            "reorderThreshold": None
+        }, fields_set))
+    
+    return category_models, product_models
+
+
+def load_catalog_file(path: str) -> Catalog:
+    """Read a catalog written by save_catalog_file, validating every record"""
+    with open(path, "rb") as f:
+        document = json.load(f)
+    return (
+        _category_list.validate_python(document.get("categories", [])),
+        _product_list.validate_python(document.get("products", []))
+    )
+
+
+def save_catalog_file(path: str, catalog: Catalog):
+    categories, products = catalog
+    document = {
+        "categories": _category_list.dump_python(categories, mode="json"),
+        "products": _product_list.dump_python(products, mode="json")
+    }
+    # Written aside and renamed into place, so a reader (or the next start)
+    # never sees a half-written file
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(document, f)
+    os.replace(temporary, path)
+
+
+def seed_database(db: "InMemoryDatabase", settings: "Settings"):
+    """Populate the store according to Settings.seed_mode"""
+    if settings.seed_mode == "sample":
+        db.initialize_sample_data()
+    elif settings.seed_mode == "file":
+        if not settings.seed_file:
+            raise ValueError("SEED_FILE must be set when SEED_MODE is 'file'")
+        db.bulk_load(*load_catalog_file(settings.seed_file))
+    elif settings.seed_mode == "synthetic":
+        db.bulk_load(*generate_catalog(settings.seed_products, settings.seed_categories, settings.seed_random_seed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic catalog file")
+    parser.add_argument("path")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--categories", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    save_catalog_file(args.path, generate_catalog(args.products, args.categories, args.seed))
@@ -0,0 +1,98 @@
+from typing import List, Literal, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Runtime configuration, read from environment variables or a .env file"""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+    
+    # "fast" serves the OpenAPI document written by generate_api_specification.py
+    # from disk instead of building it at runtime, and defers the docs UI
+    startup_mode: Literal["standard", "fast"] = "standard"
+    openapi_schema_file: str = "openapi.json"
+    
+    # How the store is populated at startup: the built-in sample data, nothing,
+    # a catalog file (see seeding.save_catalog_file) or a synthetic catalog
+    seed_mode: Literal["sample", "empty", "file", "synthetic"] = "sample"
+    seed_file: Optional[str] = None
+    seed_products: int = 10000
+    seed_categories: int = 100
+    seed_random_seed: int = 0
+    
+    # Worker threads for background jobs (imports, reindexing, exports)
+    job_workers: int = 2
+    
+    # Endpoints that receive a POST for every low-stock threshold crossing, and
+    # how often a failed delivery is attempted (with exponential backoff)
+    low_stock_webhook_urls: List[str] = []
+    alert_max_attempts: int = 5
+    alert_retry_base_seconds: float = 1.0
+    
+    # How long deleted products stay visible to the change feed as tombstones
+    tombstone_retention_seconds: float = 24 * 60 * 60
+    
+    # Stock movements kept in the ledger (rounded up to whole 64k chunks);
+    # sales rollups for velocity are kept regardless
+    ledger_max_entries: int = 10_000_000
+    
+    # How far back point-in-time (asOf) reads can go, and the most price and
+    # quantity versions kept per product within that window
+    history_retention_days: float = 365
+    history_max_versions: int = 1000
+    
+    # Token-bucket rate limits per API key (or client IP when no key is sent).
+    # List, bulk and export endpoints draw on their own, smaller budget
+    rate_limit_enabled: bool = False
+    rate_limit_api_key_header: str = "X-API-Key"
+    rate_limit_lookup_per_second: float = 50
+    rate_limit_lookup_burst: float = 100
+    rate_limit_list_per_second: float = 2
+    rate_limit_list_burst: float = 10
+    rate_limit_max_clients: int = 100_000
+    
+    # Requests handled at once before new ones queue, how many may queue and
+    # how long they wait before being turned away with 503; 0 disables
+    admission_max_concurrency: int = 0
+    admission_max_queue: int = 100
+    admission_queue_timeout_seconds: float = 1.0
+    
+    # Catalog listings of at least this many bytes are compressed with gzip or
+    # deflate, as the client accepts. Encoded and compressed listings are
+    # cached per store version, up to a total size
+    compression_enabled: bool = True
+    compression_min_size_bytes: int = 1024
+    compression_level: int = 6
+    listing_cache_max_bytes: int = 64 * 1024 * 1024
+    
+    # Identical concurrent requests for category and status listings share
+    # one scan and encoding, run off the event loop
+    single_flight_enabled: bool = True
+    
+    # Serving profile used by run_app.py. "auto" picks uvloop and httptools
+    # when they are installed (uvicorn[standard]) and asyncio and h11 otherwise.
+    # Keep-alive outlasts the idle timeout of common load balancers (60s) so
+    # that the proxy, not the server, closes idle connections. The concurrency
+    # limit is uvicorn's hard cap on open connections plus running requests,
+    # answered with 503, so it must be well above the proxy's connection pool;
+    # admission_* queues excess requests instead. With server_uds set the server listens on that
+    # Unix socket instead of host and port, for a proxy on the same machine;
+    # set server_forwarded_allow_ips="*" then so its X-Forwarded-For is used.
+    server_host: str = "0.0.0.0"
+    # Read from PORT, as hosting platforms set it
+    port: int = 8000
+    server_loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    server_http: Literal["auto", "h11", "httptools"] = "auto"
+    server_backlog: int = 2048
+    server_keep_alive_seconds: int = 75
+    server_limit_concurrency: Optional[int] = None
+    server_graceful_shutdown_seconds: float = 30
+    server_access_log: bool = True
+    server_uds: Optional[str] = None
+    server_forwarded_allow_ips: str = "127.0.0.1"
+    
+    # On graceful shutdown the whole catalog is written here, in the format
+    # SEED_MODE=file reads, so pointing SEED_FILE at it restores it on start
+    snapshot_file: Optional[str] = None
+
+
+settings = Settings()
@@ -0,0 +1,136 @@
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# (key, product id); the id breaks ties so every entry is unique
+Entry = Tuple[float, int]
+
+
+class SortedIndex:
+    """Product ids ordered by a numeric key, for range and top-k queries.
+    
+    Entries live in a list of sorted chunks of at most 2 * `load` items
+    (the layout used by sortedcontainers), so adding or removing an entry
+    shifts one chunk instead of the whole index. Locating a bound costs
+    two bisects, then entries are streamed in order.
+    """
+    
+    def __init__(self, load: int = 1000):
+        self._load = load
+        self._chunks: List[List[Entry]] = []
+        # Last entry of each chunk, to bisect for the owning chunk
+        self._maxes: List[Entry] = []
+        self._len = 0
+    
+    def __len__(self) -> int:
+        return self._len
+    
+    def __iter__(self) -> Iterator[Entry]:
+        return chain.from_iterable(self._chunks)
+    
+    def __contains__(self, entry: Entry) -> bool:
+        pos = bisect_left(self._maxes, entry)
+        if pos == len(self._maxes):
+            return False
+        chunk = self._chunks[pos]
+        i = bisect_left(chunk, entry)
+        return i < len(chunk) and chunk[i] == entry
+    
+    def clear(self):
+        self._chunks = []
+        self._maxes = []
+        self._len = 0
+    
+    def update(self, entries: Iterable[Entry]):
+        """Add many entries; rebuilds the chunks when that is cheaper than inserting"""
+        entries = list(entries)
+        if len(entries) < self._len // 8:
+            for key, id in entries:
+                self.add(key, id)
+            return
+        
+        ordered = sorted(chain(self, entries))
+        self._chunks = [ordered[i:i + self._load] for i in range(0, len(ordered), self._load)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+    
+    def add(self, key: float, id: int):
+        entry = (key, id)
+        chunks, maxes = self._chunks, self._maxes
+        self._len += 1
+        if not chunks:
+            chunks.append([entry])
+            maxes.append(entry)
+            return
+        
+        pos = bisect_left(maxes, entry)
+        if pos == len(maxes):
+            pos -= 1
+            chunks[pos].append(entry)
+            maxes[pos] = entry
+        else:
+            insort(chunks[pos], entry)
+        
+        chunk = chunks[pos]
+        if len(chunk) > 2 * self._load:
+            # Split an oversized chunk in half
+            chunks.insert(pos + 1, chunk[self._load:])
+            del chunk[self._load:]
+            maxes.insert(pos, chunk[-1])
+    
+    def remove(self, key: float, id: int):
+        """Remove an entry; raises KeyError if it is not indexed"""
+        entry = (key, id)
+        pos = bisect_left(self._maxes, entry)
+        if pos == len(self._maxes):
+            raise KeyError(entry)
+        chunk = self._chunks[pos]
+        i = bisect_left(chunk, entry)
+        if i == len(chunk) or chunk[i] != entry:
+            raise KeyError(entry)
+        
+        del chunk[i]
+        self._len -= 1
+        if not chunk:
+            del self._chunks[pos]
+            del self._maxes[pos]
+        elif i == len(chunk):
+            self._maxes[pos] = chunk[-1]
+    
+    def _position(self, entry: Entry) -> Tuple[int, int]:
+        """(chunk, offset) of the first entry not less than `entry`"""
+        pos = bisect_left(self._maxes, entry)
+        if pos == len(self._maxes):
+            return pos, 0
+        return pos, bisect_left(self._chunks[pos], entry)
+    
+    def irange(self, minimum: Optional[float] = None, maximum: Optional[float] = None,
+               reverse: bool = False) -> Iterator[int]:
+        """Ids whose key lies within [minimum, maximum], in key order"""
+        chunks = self._chunks
+        # (k,) sorts before every (k, id) and (k, inf) after every one
+        start = self._position((minimum,)) if minimum is not None else (0, 0)
+        stop = self._position((maximum, float("inf"))) if maximum is not None else (len(chunks), 0)
+        
+        if not reverse:
+            pos, i = start
+            while (pos, i) < stop:
+                chunk = chunks[pos]
+                end = stop[1] if pos == stop[0] else len(chunk)
+                for j in range(i, end):
+                    yield chunk[j][1]
+                pos, i = pos + 1, 0
+        else:
+            pos, i = stop
+            while (pos, i) > start:
+                if i == 0:
+                    pos -= 1
+                    i = len(chunks[pos])
+                    continue
+                chunk = chunks[pos]
+                begin = start[1] if pos == start[0] else 0
+                for j in range(i - 1, begin - 1, -1):
+                    yield chunk[j][1]
+                i = begin
+                if pos == start[0]:
+                    return
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from admission import AdmissionMiddleware, RateLimiter
+
+
+class TestAdmission:
+    """Unit tests for rate limiting and admission control"""
+    
+    def test_rate_limiter_buckets(self):
+        """Test token buckets per client and budget, refill and idle eviction"""
+        now = [0.0]
+        limiter = RateLimiter({"lookup": (10, 5), "list": (1, 2)}, clock=lambda: now[0])
+        
+        assert [limiter.acquire("a", "lookup") for _ in range(5)] == [0.0] * 5
+        assert limiter.acquire("a", "lookup") == pytest.approx(0.1)
+        assert limiter.acquire("b", "lookup") == 0.0
+        assert limiter.acquire("a", "list") == 0.0
+        
+        now[0] = 0.25
+        assert limiter.acquire("a", "lookup") == 0.0
+        assert limiter.acquire("a", "lookup") == 0.0
+        assert limiter.acquire("a", "lookup") > 0
+        assert len(limiter) == 3
+        
+        # Everything has refilled after 2 seconds and is dropped as new clients arrive
+        now[0] = 10.0
+        for client in ("c", "d"):
+            limiter.acquire(client, "lookup")
+        assert len(limiter) == 2
+    
+    def test_admission_middleware_queues_and_rejects(self):
+        """Test that requests over the concurrency limit queue, and overflow gets 503"""
+        async def run():
+            release = asyncio.Event()
+            
+            async def app(scope, receive, send):
+                await release.wait()
+                await send({"type": "http.response.start", "status": 200, "headers": []})
+            
+            middleware = AdmissionMiddleware(app, max_concurrency=1, max_queue=1, queue_timeout=5)
+            statuses = []
+            
+            async def request():
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        statuses.append(message["status"])
+                await middleware({"type": "http"}, None, send)
+            
+            tasks = [asyncio.create_task(request()) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            assert statuses == [503]
+            release.set()
+            await asyncio.gather(*tasks)
+            return statuses, middleware
+        
+        statuses, middleware = asyncio.run(run())
+        assert statuses == [503, 200, 200]
+        assert middleware.rejected == 1
+        assert (middleware._active, len(middleware._waiters)) == (0, 0)
@@ -0,0 +1,33 @@
+import threading
+from alerts import AlertDispatcher
+from database import InMemoryDatabase
+
+
+class TestAlertDispatcher:
+    """Unit tests for background delivery of low-stock alerts"""
+    
+    def setup_method(self):
+        self.db = InMemoryDatabase()
+    
+    def test_alert_dispatcher_retries(self):
+        """Test that failed deliveries are retried without blocking publish"""
+        attempts = []
+        delivered = threading.Event()
+        
+        def flaky(event):
+            attempts.append(event.id)
+            if len(attempts) < 3:
+                raise ConnectionError("consumer unavailable")
+            delivered.set()
+        
+        dispatcher = AlertDispatcher(max_attempts=3, retry_base_seconds=0.01)
+        dispatcher.subscribe(flaky)
+        dispatcher.start()
+        try:
+            self.db.add_low_stock_listener(dispatcher.publish)
+            self.db.create_product("Washer", "LOW-003", 1, 0.1, reorder_threshold=2)
+            assert delivered.wait(5)
+        finally:
+            dispatcher.stop()
+        assert attempts == [1, 1, 1]
+        assert (dispatcher.delivered, dispatcher.failed) == (1, 0)
@@ -1,455 +1,993 @@
-import pytest
-from fastapi.testclient import TestClient
-from main import app
-from database import db
-from models import ProductStatus
-
-client = TestClient(app)
-
-
-def setup_function():
-    """Reset database before each test"""
-    db.clear_data()
-    db.initialize_sample_data()
-
-
-class TestProducts:
-    def test_get_all_products(self):
-        """Test getting all products returns sample data"""
-        response = client.get("/api/Products")
-        assert response.status_code == 200
-        products = response.json()
-        assert len(products) > 0
-        
-        # Check structure of first product
-        product = products[0]
-        assert "id" in product
-        assert "name" in product
-        assert "sku" in product
-        assert "quantity" in product
-        assert "price" in product
-        assert "status" in product
-        assert "categoryName" in product
-
-
-    def test_get_product_by_id_exists(self):
-        """Test getting existing product by ID"""
-        response = client.get("/api/Products/1")
-        assert response.status_code == 200
-        product = response.json()
-        assert product["id"] == 1
-        assert product["name"] == "Wireless Bluetooth Headphones"
-        assert product["sku"] == "WBH-001"
-
-
-    def test_get_product_by_id_not_found(self):
-        """Test getting non-existent product by ID"""
-        response = client.get("/api/Products/999")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Product not found"
-
-
-    def test_get_product_by_sku_exists(self):
-        """Test getting existing product by SKU"""
-        response = client.get("/api/Products/sku/WBH-001")
-        assert response.status_code == 200
-        product = response.json()
-        assert product["sku"] == "WBH-001"
-        assert product["name"] == "Wireless Bluetooth Headphones"
-
-
-    def test_get_product_by_sku_not_found(self):
-        """Test getting non-existent product by SKU"""
-        response = client.get("/api/Products/sku/INVALID-SKU")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Product not found"
-
-
-    def test_get_products_by_status_active(self):
-        """Test getting products by status"""
-        response = client.get(f"/api/Products/status/{ProductStatus.ACTIVE}")
-        assert response.status_code == 200
-        products = response.json()
-        assert len(products) > 0
-        # All returned products should have Active status
-        for product in products:
-            assert product["status"] == ProductStatus.ACTIVE
-
-
-    def test_get_products_by_status_discontinued(self):
-        """Test getting discontinued products"""
-        response = client.get(f"/api/Products/status/{ProductStatus.DISCONTINUED}")
-        assert response.status_code == 200
-        products = response.json()
-        # Should have one discontinued product in sample data
-        assert len(products) == 1
-        assert products[0]["status"] == ProductStatus.DISCONTINUED
-
-
-    def test_get_products_by_category(self):
-        """Test getting products by category"""
-        response = client.get("/api/Products/category/1")
-        assert response.status_code == 200
-        products = response.json()
-        assert len(products) > 0
-        # All returned products should belong to category 1
-        for product in products:
-            assert product["categoryId"] == 1
-
-
-    def test_create_product_valid(self):
-        """Test creating a new product with valid data"""
-        new_product = {
-            "name": "Test Product",
-            "sku": "TEST-001",
-            "quantity": 50,
-            "price": 29.99,
-            "status": ProductStatus.ACTIVE,
-            "description": "A test product",
-            "categoryId": 1
-        }
-        
-        response = client.post("/api/Products", json=new_product)
-        assert response.status_code == 200
-        product_id = response.json()
-        assert isinstance(product_id, int)
-        assert product_id > 0
-        
-        # Verify product was created
-        get_response = client.get(f"/api/Products/{product_id}")
-        assert get_response.status_code == 200
-        created_product = get_response.json()
-        assert created_product["name"] == new_product["name"]
-        assert created_product["sku"] == new_product["sku"]
-
-
-    def test_create_product_duplicate_sku(self):
-        """Test creating a product with duplicate SKU should fail"""
-        new_product = {
-            "name": "Duplicate SKU Product",
-            "sku": "WBH-001",  # This SKU already exists in sample data
-            "quantity": 10,
-            "price": 19.99,
-            "status": ProductStatus.ACTIVE,
-            "description": "Should fail due to duplicate SKU",
-            "categoryId": 1
-        }
-        
-        response = client.post("/api/Products", json=new_product)
-        assert response.status_code == 400
-        assert "SKU already exists" in response.json()["detail"]
-
-
-    def test_update_product_valid(self):
-        """Test updating existing product with valid data"""
-        update_data = {
-            "name": "Updated Headphones",
-            "sku": "WBH-001-UPDATED",
-            "quantity": 25,
-            "price": 89.99,
-            "status": ProductStatus.ACTIVE,
-            "description": "Updated description",
-            "categoryId": 1
-        }
-        
-        response = client.put("/api/Products/1", json=update_data)
-        assert response.status_code == 200
-        
-        # Verify product was updated
-        get_response = client.get("/api/Products/1")
-        assert get_response.status_code == 200
-        updated_product = get_response.json()
-        assert updated_product["name"] == update_data["name"]
-        assert updated_product["sku"] == update_data["sku"]
-        assert updated_product["quantity"] == update_data["quantity"]
-
-
-    def test_update_product_not_found(self):
-        """Test updating non-existent product"""
-        update_data = {
-            "name": "Non-existent Product",
-            "sku": "NON-EXIST",
-            "quantity": 0,
-            "price": 0.0,
-            "status": ProductStatus.ACTIVE,
-            "description": "",
-            "categoryId": 1
-        }
-        
-        response = client.put("/api/Products/999", json=update_data)
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Product not found"
-
-
-    def test_update_inventory_valid(self):
-        """Test updating product inventory"""
-        new_quantity = 100
-        
-        response = client.patch("/api/Products/1/inventory", json={"quantity": new_quantity})
-        assert response.status_code == 200
-        
-        # Verify inventory was updated
-        get_response = client.get("/api/Products/1")
-        assert get_response.status_code == 200
-        product = get_response.json()
-        assert product["quantity"] == new_quantity
-
-
-    def test_update_inventory_not_found(self):
-        """Test updating inventory for non-existent product"""
-        response = client.patch("/api/Products/999/inventory", json={"quantity": 50})
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Product not found"
-
-
-    def test_delete_product_valid(self):
-        """Test deleting existing product"""
-        response = client.delete("/api/Products/1")
-        assert response.status_code == 200
-        
-        # Verify product was deleted
-        get_response = client.get("/api/Products/1")
-        assert get_response.status_code == 404
-
-
-    def test_delete_product_not_found(self):
-        """Test deleting non-existent product"""
-        response = client.delete("/api/Products/999")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Product not found"
-
-
-class TestCategories:
-    def test_get_all_categories(self):
-        """Test getting all categories returns sample data"""
-        response = client.get("/api/ProductCategories")
-        assert response.status_code == 200
-        categories = response.json()
-        assert len(categories) == 5  # Sample data has 5 categories
-        
-        # Check structure of first category
-        category = categories[0]
-        assert "id" in category
-        assert "name" in category
-        assert "description" in category
-        assert "isActive" in category
-        assert "productCount" in category
-
-
-    def test_get_category_by_id_exists(self):
-        """Test getting existing category by ID"""
-        response = client.get("/api/ProductCategories/1")
-        assert response.status_code == 200
-        category = response.json()
-        assert category["id"] == 1
-        assert category["name"] == "Electronics"
-        assert category["productCount"] > 0
-
-
-    def test_get_category_by_id_not_found(self):
-        """Test getting non-existent category by ID"""
-        response = client.get("/api/ProductCategories/999")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Category not found"
-
-
-    def test_get_products_in_category_exists(self):
-        """Test getting products in existing category"""
-        response = client.get("/api/ProductCategories/1/products")
-        assert response.status_code == 200
-        products = response.json()
-        assert len(products) > 0
-        # All products should belong to category 1
-        for product in products:
-            assert product["categoryId"] == 1
-
-
-    def test_get_products_in_category_not_found(self):
-        """Test getting products in non-existent category"""
-        response = client.get("/api/ProductCategories/999/products")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Category not found"
-
-
-    def test_create_category_valid(self):
-        """Test creating a new category with valid data"""
-        new_category = {
-            "name": "Test Category",
-            "description": "A test category",
-            "isActive": True
-        }
-        
-        response = client.post("/api/ProductCategories", json=new_category)
-        assert response.status_code == 200
-        category_id = response.json()
-        assert isinstance(category_id, int)
-        assert category_id > 0
-        
-        # Verify category was created
-        get_response = client.get(f"/api/ProductCategories/{category_id}")
-        assert get_response.status_code == 200
-        created_category = get_response.json()
-        assert created_category["name"] == new_category["name"]
-        assert created_category["description"] == new_category["description"]
-
-
-    def test_update_category_valid(self):
-        """Test updating existing category with valid data"""
-        update_data = {
-            "name": "Updated Electronics",
-            "description": "Updated description for electronics",
-            "isActive": True
-        }
-        
-        response = client.put("/api/ProductCategories/1", json=update_data)
-        assert response.status_code == 200
-        
-        # Verify category was updated
-        get_response = client.get("/api/ProductCategories/1")
-        assert get_response.status_code == 200
-        updated_category = get_response.json()
-        assert updated_category["name"] == update_data["name"]
-        assert updated_category["description"] == update_data["description"]
-
-
-    def test_update_category_not_found(self):
-        """Test updating non-existent category"""
-        update_data = {
-            "name": "Non-existent Category",
-            "description": "Should fail",
-            "isActive": True
-        }
-        
-        response = client.put("/api/ProductCategories/999", json=update_data)
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Category not found"
-
-
-    def test_delete_category_with_products(self):
-        """Test deleting category that has products should fail"""
-        response = client.delete("/api/ProductCategories/1")
-        assert response.status_code == 400
-        assert "Cannot delete category with existing products" in response.json()["detail"]
-
-
-    def test_delete_category_without_products(self):
-        """Test deleting category without products should succeed"""
-        # First create a new category without products
-        new_category = {
-            "name": "Empty Category",
-            "description": "Category without products",
-            "isActive": True
-        }
-        
-        create_response = client.post("/api/ProductCategories", json=new_category)
-        assert create_response.status_code == 200
-        category_id = create_response.json()
-        
-        # Now delete it
-        delete_response = client.delete(f"/api/ProductCategories/{category_id}")
-        assert delete_response.status_code == 200
-        
-        # Verify category was deleted
-        get_response = client.get(f"/api/ProductCategories/{category_id}")
-        assert get_response.status_code == 404
-
-
-    def test_delete_category_not_found(self):
-        """Test deleting non-existent category"""
-        response = client.delete("/api/ProductCategories/999")
-        assert response.status_code == 404
-        assert response.json()["detail"] == "Category not found"
-
-
-class TestIntegration:
-    def test_product_category_relationship(self):
-        """Test that product-category relationships work correctly"""
-        # Get a product and verify its category information
-        response = client.get("/api/Products/1")
-        assert response.status_code == 200
-        product = response.json()
-        
-        category_id = product["categoryId"]
-        category_name = product["categoryName"]
-        
-        # Get the category directly and verify it matches
-        cat_response = client.get(f"/api/ProductCategories/{category_id}")
-        assert cat_response.status_code == 200
-        category = cat_response.json()
-        assert category["name"] == category_name
-
-
-    def test_inventory_management_workflow(self):
-        """Test complete inventory management workflow"""
-        # Create a new product
-        new_product = {
-            "name": "Workflow Test Product",
-            "sku": "WTP-001",
-            "quantity": 100,
-            "price": 49.99,
-            "status": ProductStatus.ACTIVE,
-            "description": "Product for testing workflow",
-            "categoryId": 1
-        }
-        
-        create_response = client.post("/api/Products", json=new_product)
-        assert create_response.status_code == 200
-        product_id = create_response.json()
-        
-        # Update inventory
-        client.patch(f"/api/Products/{product_id}/inventory", json={"quantity": 75})
-        
-        # Verify inventory was updated
-        get_response = client.get(f"/api/Products/{product_id}")
-        product = get_response.json()
-        assert product["quantity"] == 75
-        
-        # Update product status to discontinued
-        update_data = new_product.copy()
-        update_data["status"] = ProductStatus.DISCONTINUED
-        update_data["quantity"] = 75  # Keep the updated quantity
-        
-        client.put(f"/api/Products/{product_id}", json=update_data)
-        
-        # Verify product is now discontinued
-        get_response = client.get(f"/api/Products/{product_id}")
-        product = get_response.json()
-        assert product["status"] == ProductStatus.DISCONTINUED
-        
-        # Clean up - delete the product
-        delete_response = client.delete(f"/api/Products/{product_id}")
-        assert delete_response.status_code == 200
-
-
-class TestErrorHandling:
-    def test_invalid_product_status(self):
-        """Test handling of invalid product status"""
-        response = client.get("/api/Products/status/999")
-        assert response.status_code == 422  # FastAPI validation error
-
-
-    def test_invalid_product_data(self):
-        """Test creating product with invalid data"""
-        invalid_product = {
-            "name": "",  # Empty name
-            "sku": "",   # Empty SKU
-            "quantity": -1,  # Negative quantity
-            "price": -10.0,  # Negative price
-            "status": ProductStatus.ACTIVE,
-            "categoryId": 1
-        }
-        
-        response = client.post("/api/Products", json=invalid_product)
-        assert response.status_code == 422  # FastAPI validation error
-
-
-    def test_invalid_category_data(self):
-        """Test creating category with invalid data"""
-        invalid_category = {
-            "name": "",  # Empty name
-            "description": None,  # None description should be ok
-            "isActive": "not_boolean"  # Invalid boolean
-        }
-        
-        response = client.post("/api/ProductCategories", json=invalid_category)
-        assert response.status_code == 422  # FastAPI validation error
\ No newline at end of file
+import pytest
+from fastapi.testclient import TestClient
+import time
+from datetime import datetime, timezone
+import main
+from main import app
+from admission import RateLimiter
+from binary_format import COLUMNAR, MSGPACK, packb
+from database import db
+from models import ProductStatus
+
+client = TestClient(app)
+
+
+def setup_function():
+    """Reset database before each test"""
+    db.clear_data()
+    db.initialize_sample_data()
+
+
+class TestProducts:
+    def test_get_all_products(self):
+        """Test getting all products returns sample data"""
+        response = client.get("/api/Products")
+        assert response.status_code == 200
+        products = response.json()
+        assert len(products) > 0
+        
+        # Check structure of first product
+        product = products[0]
+        assert "id" in product
+        assert "name" in product
+        assert "sku" in product
+        assert "quantity" in product
+        assert "price" in product
+        assert "status" in product
+        assert "categoryName" in product
+
+
+    def test_get_product_by_id_exists(self):
+        """Test getting existing product by ID"""
+        response = client.get("/api/Products/1")
+        assert response.status_code == 200
+        product = response.json()
+        assert product["id"] == 1
+        assert product["name"] == "Wireless Bluetooth Headphones"
+        assert product["sku"] == "WBH-001"
+
+
+    def test_get_product_by_id_not_found(self):
+        """Test getting non-existent product by ID"""
+        response = client.get("/api/Products/999")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product not found"
+
+
+    def test_get_product_by_sku_exists(self):
+        """Test getting existing product by SKU"""
+        response = client.get("/api/Products/sku/WBH-001")
+        assert response.status_code == 200
+        product = response.json()
+        assert product["sku"] == "WBH-001"
+        assert product["name"] == "Wireless Bluetooth Headphones"
+
+
+    def test_get_product_by_sku_not_found(self):
+        """Test getting non-existent product by SKU"""
+        response = client.get("/api/Products/sku/INVALID-SKU")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product not found"
+
+
+    def test_get_products_by_status_active(self):
+        """Test getting products by status"""
+        response = client.get(f"/api/Products/status/{ProductStatus.ACTIVE}")
+        assert response.status_code == 200
+        products = response.json()
+        assert len(products) > 0
+        # All returned products should have Active status
+        for product in products:
+            assert product["status"] == ProductStatus.ACTIVE
+
+
+    def test_get_products_by_status_discontinued(self):
+        """Test getting discontinued products"""
+        response = client.get(f"/api/Products/status/{ProductStatus.DISCONTINUED}")
+        assert response.status_code == 200
+        products = response.json()
+        # Should have one discontinued product in sample data
+        assert len(products) == 1
+        assert products[0]["status"] == ProductStatus.DISCONTINUED
+
+
+    def test_get_products_by_category(self):
+        """Test getting products by category"""
+        response = client.get("/api/Products/category/1")
+        assert response.status_code == 200
+        products = response.json()
+        assert len(products) > 0
+        # All returned products should belong to category 1
+        for product in products:
+            assert product["categoryId"] == 1
+
+
+    def test_create_product_valid(self):
+        """Test creating a new product with valid data"""
+        new_product = {
+            "name": "Test Product",
+            "sku": "TEST-001",
+            "quantity": 50,
+            "price": 29.99,
+            "status": ProductStatus.ACTIVE,
+            "description": "A test product",
+            "categoryId": 1
+        }
+        
+        response = client.post("/api/Products", json=new_product)
+        assert response.status_code == 200
+        product_id = response.json()
+        assert isinstance(product_id, int)
+        assert product_id > 0
+        
+        # Verify product was created
+        get_response = client.get(f"/api/Products/{product_id}")
+        assert get_response.status_code == 200
+        created_product = get_response.json()
+        assert created_product["name"] == new_product["name"]
+        assert created_product["sku"] == new_product["sku"]
+
+
+    def test_create_product_duplicate_sku(self):
+        """Test creating a product with duplicate SKU should fail"""
+        new_product = {
+            "name": "Duplicate SKU Product",
+            "sku": "WBH-001",  # This SKU already exists in sample data
+            "quantity": 10,
+            "price": 19.99,
+            "status": ProductStatus.ACTIVE,
+            "description": "Should fail due to duplicate SKU",
+            "categoryId": 1
+        }
+        
+        response = client.post("/api/Products", json=new_product)
+        assert response.status_code == 400
+        assert "SKU already exists" in response.json()["detail"]
+
+
+    def test_update_product_valid(self):
+        """Test updating existing product with valid data"""
+        update_data = {
+            "name": "Updated Headphones",
+            "sku": "WBH-001-UPDATED",
+            "quantity": 25,
+            "price": 89.99,
+            "status": ProductStatus.ACTIVE,
+            "description": "Updated description",
+            "categoryId": 1
+        }
+        
+        response = client.put("/api/Products/1", json=update_data)
+        assert response.status_code == 200
+        
+        # Verify product was updated
+        get_response = client.get("/api/Products/1")
+        assert get_response.status_code == 200
+        updated_product = get_response.json()
+        assert updated_product["name"] == update_data["name"]
+        assert updated_product["sku"] == update_data["sku"]
+        assert updated_product["quantity"] == update_data["quantity"]
+
+
+    def test_update_product_not_found(self):
+        """Test updating non-existent product"""
+        update_data = {
+            "name": "Non-existent Product",
+            "sku": "NON-EXIST",
+            "quantity": 0,
+            "price": 0.0,
+            "status": ProductStatus.ACTIVE,
+            "description": "",
+            "categoryId": 1
+        }
+        
+        response = client.put("/api/Products/999", json=update_data)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product not found"
+
+
+    def test_update_inventory_valid(self):
+        """Test updating product inventory"""
+        new_quantity = 100
+        
+        response = client.patch("/api/Products/1/inventory", json={"quantity": new_quantity})
+        assert response.status_code == 200
+        
+        # Verify inventory was updated
+        get_response = client.get("/api/Products/1")
+        assert get_response.status_code == 200
+        product = get_response.json()
+        assert product["quantity"] == new_quantity
+
+
+    def test_update_inventory_not_found(self):
+        """Test updating inventory for non-existent product"""
+        response = client.patch("/api/Products/999/inventory", json={"quantity": 50})
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product not found"
+
+
+    def test_delete_product_valid(self):
+        """Test deleting existing product"""
+        response = client.delete("/api/Products/1")
+        assert response.status_code == 200
+        
+        # Verify product was deleted
+        get_response = client.get("/api/Products/1")
+        assert get_response.status_code == 404
+
+
+    def test_delete_product_not_found(self):
+        """Test deleting non-existent product"""
+        response = client.delete("/api/Products/999")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Product not found"
+
+
+class TestCategories:
+    def test_get_all_categories(self):
+        """Test getting all categories returns sample data"""
+        response = client.get("/api/ProductCategories")
+        assert response.status_code == 200
+        categories = response.json()
+        assert len(categories) == 5  # Sample data has 5 categories
+        
+        # Check structure of first category
+        category = categories[0]
+        assert "id" in category
+        assert "name" in category
+        assert "description" in category
+        assert "isActive" in category
+        assert "productCount" in category
+
+
+    def test_get_category_by_id_exists(self):
+        """Test getting existing category by ID"""
+        response = client.get("/api/ProductCategories/1")
+        assert response.status_code == 200
+        category = response.json()
+        assert category["id"] == 1
+        assert category["name"] == "Electronics"
+        assert category["productCount"] > 0
+
+
+    def test_get_category_by_id_not_found(self):
+        """Test getting non-existent category by ID"""
+        response = client.get("/api/ProductCategories/999")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Category not found"
+
+
+    def test_get_products_in_category_exists(self):
+        """Test getting products in existing category"""
+        response = client.get("/api/ProductCategories/1/products")
+        assert response.status_code == 200
+        products = response.json()
+        assert len(products) > 0
+        # All products should belong to category 1
+        for product in products:
+            assert product["categoryId"] == 1
+
+
+    def test_get_products_in_category_not_found(self):
+        """Test getting products in non-existent category"""
+        response = client.get("/api/ProductCategories/999/products")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Category not found"
+
+
+    def test_create_category_valid(self):
+        """Test creating a new category with valid data"""
+        new_category = {
+            "name": "Test Category",
+            "description": "A test category",
+            "isActive": True
+        }
+        
+        response = client.post("/api/ProductCategories", json=new_category)
+        assert response.status_code == 200
+        category_id = response.json()
+        assert isinstance(category_id, int)
+        assert category_id > 0
+        
+        # Verify category was created
+        get_response = client.get(f"/api/ProductCategories/{category_id}")
+        assert get_response.status_code == 200
+        created_category = get_response.json()
+        assert created_category["name"] == new_category["name"]
+        assert created_category["description"] == new_category["description"]
+
+
+    def test_update_category_valid(self):
+        """Test updating existing category with valid data"""
+        update_data = {
+            "name": "Updated Electronics",
+            "description": "Updated description for electronics",
+            "isActive": True
+        }
+        
+        response = client.put("/api/ProductCategories/1", json=update_data)
+        assert response.status_code == 200
+        
+        # Verify category was updated
+        get_response = client.get("/api/ProductCategories/1")
+        assert get_response.status_code == 200
+        updated_category = get_response.json()
+        assert updated_category["name"] == update_data["name"]
+        assert updated_category["description"] == update_data["description"]
+
+
+    def test_update_category_not_found(self):
+        """Test updating non-existent category"""
+        update_data = {
+            "name": "Non-existent Category",
+            "description": "Should fail",
+            "isActive": True
+        }
+        
+        response = client.put("/api/ProductCategories/999", json=update_data)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Category not found"
+
+
+    def test_delete_category_with_products(self):
+        """Test deleting category that has products should fail"""
+        response = client.delete("/api/ProductCategories/1")
+        assert response.status_code == 400
+        assert "Cannot delete category with existing products" in response.json()["detail"]
+
+
+    def test_delete_category_without_products(self):
+        """Test deleting category without products should succeed"""
+        # First create a new category without products
+        new_category = {
+            "name": "Empty Category",
+            "description": "Category without products",
+            "isActive": True
+        }
+        
+        create_response = client.post("/api/ProductCategories", json=new_category)
+        assert create_response.status_code == 200
+        category_id = create_response.json()
+        
+        # Now delete it
+        delete_response = client.delete(f"/api/ProductCategories/{category_id}")
+        assert delete_response.status_code == 200
+        
+        # Verify category was deleted
+        get_response = client.get(f"/api/ProductCategories/{category_id}")
+        assert get_response.status_code == 404
+
+
+    def test_delete_category_not_found(self):
+        """Test deleting non-existent category"""
+        response = client.delete("/api/ProductCategories/999")
+        assert response.status_code == 404
+        assert response.json()["detail"] == "Category not found"
+
+
+class TestIntegration:
+    def test_product_category_relationship(self):
+        """Test that product-category relationships work correctly"""
+        # Get a product and verify its category information
+        response = client.get("/api/Products/1")
+        assert response.status_code == 200
+        product = response.json()
+        
+        category_id = product["categoryId"]
+        category_name = product["categoryName"]
+        
+        # Get the category directly and verify it matches
+        cat_response = client.get(f"/api/ProductCategories/{category_id}")
+        assert cat_response.status_code == 200
+        category = cat_response.json()
+        assert category["name"] == category_name
+
+
+    def test_inventory_management_workflow(self):
+        """Test complete inventory management workflow"""
+        # Create a new product
+        new_product = {
+            "name": "Workflow Test Product",
+            "sku": "WTP-001",
+            "quantity": 100,
+            "price": 49.99,
+            "status": ProductStatus.ACTIVE,
+            "description": "Product for testing workflow",
+            "categoryId": 1
+        }
+        
+        create_response = client.post("/api/Products", json=new_product)
+        assert create_response.status_code == 200
+        product_id = create_response.json()
+        
+        # Update inventory
+        client.patch(f"/api/Products/{product_id}/inventory", json={"quantity": 75})
+        
+        # Verify inventory was updated
+        get_response = client.get(f"/api/Products/{product_id}")
+        product = get_response.json()
+        assert product["quantity"] == 75
+        
+        # Update product status to discontinued
+        update_data = new_product.copy()
+        update_data["status"] = ProductStatus.DISCONTINUED
+        update_data["quantity"] = 75  # Keep the updated quantity
+        
+        client.put(f"/api/Products/{product_id}", json=update_data)
+        
+        # Verify product is now discontinued
+        get_response = client.get(f"/api/Products/{product_id}")
+        product = get_response.json()
+        assert product["status"] == ProductStatus.DISCONTINUED
+        
+        # Clean up - delete the product
+        delete_response = client.delete(f"/api/Products/{product_id}")
+        assert delete_response.status_code == 200
+
+
+class TestErrorHandling:
+    def test_invalid_product_status(self):
+        """Test handling of invalid product status"""
+        response = client.get("/api/Products/status/999")
+        assert response.status_code == 422  # FastAPI validation error
+
+
+    def test_invalid_product_data(self):
+        """Test creating product with invalid data"""
+        invalid_product = {
+            "name": "",  # Empty name
+            "sku": "",   # Empty SKU
+            "quantity": -1,  # Negative quantity
+            "price": -10.0,  # Negative price
+            "status": ProductStatus.ACTIVE,
+            "categoryId": 1
+        }
+        
+        response = client.post("/api/Products", json=invalid_product)
+        assert response.status_code == 422  # FastAPI validation error
+
+
+    def test_invalid_category_data(self):
+        """Test creating category with invalid data"""
+        invalid_category = {
+            "name": "",  # Empty name
+            "description": None,  # None description should be ok
+            "isActive": "not_boolean"  # Invalid boolean
+        }
+        
+        response = client.post("/api/ProductCategories", json=invalid_category)
+        assert response.status_code == 422  # FastAPI validation error
+
+
+class TestFieldProjection:
+    def test_get_products_with_fields(self):
+        """Test that the fields parameter limits the returned columns"""
+        response = client.get("/api/Products?fields=id,sku,quantity")
+        assert response.status_code == 200
+        products = response.json()
+        assert len(products) > 0
+        for product in products:
+            assert set(product) == {"id", "sku", "quantity"}
+
+
+    def test_get_product_by_id_with_fields(self):
+        """Test projection on a single product lookup"""
+        product_id = client.get("/api/Products").json()[0]["id"]
+        response = client.get(f"/api/Products/{product_id}?fields=sku,categoryName")
+        assert response.status_code == 200
+        assert set(response.json()) == {"sku", "categoryName"}
+
+
+    def test_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        response = client.get("/api/Products?fields=id,secret")
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unknown field 'secret'"
+
+
+class TestBatchLookup:
+    def test_lookup_by_ids_and_skus(self):
+        """Test resolving ids and SKUs in a single request"""
+        products = client.get("/api/Products").json()
+        first, second = products[0], products[1]
+        
+        response = client.post("/api/Products/lookup", json={
+            "ids": [first["id"], 99999],
+            "skus": [second["sku"], "NO-SUCH-SKU"]
+        })
+        assert response.status_code == 200
+        result = response.json()
+        assert [item["id"] for item in result["items"]] == [first["id"], second["id"]]
+        assert result["missingIds"] == [99999]
+        assert result["missingSkus"] == ["NO-SUCH-SKU"]
+
+
+    def test_lookup_with_fields(self):
+        """Test that lookups honour the fields parameter"""
+        sku = client.get("/api/Products").json()[0]["sku"]
+        response = client.post("/api/Products/lookup?fields=sku,quantity", json={"skus": [sku]})
+        assert response.status_code == 200
+        assert set(response.json()["items"][0]) == {"sku", "quantity"}
+
+
+    def test_lookup_too_many_keys(self):
+        """Test that oversized lookups are rejected"""
+        response = client.post("/api/Products/lookup", json={"ids": list(range(1001))})
+        assert response.status_code == 400
+
+
+class TestReservations:
+    def test_reservation_workflow(self):
+        """Test reserving, confirming and releasing stock"""
+        product_id = client.post("/api/Products", json={
+            "name": "Flash Sale Item", "sku": "FLASH-001", "quantity": 5, "price": 9.99, "status": 0
+        }).json()
+        
+        response = client.post("/api/Reservations", json={"productId": product_id, "quantity": 3, "ttlSeconds": 60})
+        assert response.status_code == 200
+        reservation = response.json()
+        assert reservation["quantity"] == 3
+        
+        availability = client.get(f"/api/Products/{product_id}/availability").json()
+        assert availability == {"productId": product_id, "quantity": 5, "reserved": 3, "available": 2}
+        
+        # Overselling is refused while the hold is active
+        response = client.post("/api/Reservations", json={"productId": product_id, "quantity": 3})
+        assert response.status_code == 409
+        
+        assert client.post(f"/api/Reservations/{reservation['id']}/confirm").status_code == 200
+        assert client.get(f"/api/Products/{product_id}").json()["quantity"] == 2
+        assert client.delete(f"/api/Reservations/{reservation['id']}").status_code == 404
+
+
+    def test_confirm_reservation_after_stock_drop(self):
+        """Test that confirming a hold that stock no longer covers is a conflict"""
+        product_id = client.post("/api/Products", json={
+            "name": "Shrinking Item", "sku": "FLASH-002", "quantity": 5, "price": 9.99, "status": 0
+        }).json()
+        reservation = client.post("/api/Reservations", json={"productId": product_id, "quantity": 4}).json()
+        client.patch(f"/api/Products/{product_id}/inventory", json={"quantity": 1})
+        
+        assert client.post(f"/api/Reservations/{reservation['id']}/confirm").status_code == 409
+        assert client.get(f"/api/Products/{product_id}").json()["quantity"] == 1
+        assert client.delete(f"/api/Reservations/{reservation['id']}").status_code == 200
+
+
+    def test_reservation_unknown_product(self):
+        """Test reserving stock for a product that does not exist"""
+        response = client.post("/api/Reservations", json={"productId": 99999, "quantity": 1})
+        assert response.status_code == 404
+
+
+class TestInventoryAdjustments:
+    def test_adjust_inventory(self):
+        """Test applying a stock delta returns the resulting quantity"""
+        product_id = client.post("/api/Products", json={
+            "name": "Adjusted Item", "sku": "ADJ-001", "quantity": 10, "price": 4.99, "status": 0
+        }).json()
+        
+        response = client.post(f"/api/Products/{product_id}/inventory/adjustments", json={"delta": -3})
+        assert response.status_code == 200
+        assert response.json() == {"productId": product_id, "quantity": 7}
+        
+        response = client.post(f"/api/Products/{product_id}/inventory/adjustments", json={"delta": -8})
+        assert response.status_code == 409
+
+
+    def test_adjust_inventory_not_found(self):
+        """Test adjusting stock of a product that does not exist"""
+        response = client.post("/api/Products/99999/inventory/adjustments", json={"delta": 1})
+        assert response.status_code == 404
+
+
+class TestImport:
+    def test_import_csv(self):
+        """Test uploading a CSV feed"""
+        feed = "name,sku,quantity,price\nFeed Item 1,FEED-001,5,1.50\nFeed Item 2,FEED-002,x,2.50\n"
+        response = client.post("/api/Products/import", content=feed, headers={"Content-Type": "text/csv"})
+        assert response.status_code == 200
+        result = response.json()
+        assert result["processed"] == 2
+        assert result["created"] + result["updated"] == 1
+        assert result["failed"] == 1
+        assert client.get("/api/Products/sku/FEED-001").json()["quantity"] == 5
+
+
+    def test_import_jsonl(self):
+        """Test uploading a JSON-lines feed"""
+        feed = '{"name": "Line Item", "sku": "LINE-001", "quantity": 2, "price": 3.0}\n'
+        response = client.post("/api/Products/import?format=jsonl", content=feed)
+        assert response.status_code == 200
+        assert response.json()["failed"] == 0
+
+
+    def test_import_unknown_format(self):
+        """Test that the feed format must be known"""
+        response = client.post("/api/Products/import", content="x", headers={"Content-Type": "text/plain"})
+        assert response.status_code == 400
+
+
+def wait_for_job(id):
+    """Poll a job until it has finished"""
+    for _ in range(500):
+        job = client.get(f"/api/Jobs/{id}").json()
+        if job["status"] >= 2:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+class TestJobs:
+    def test_import_job(self):
+        """Test importing a feed in the background"""
+        feed = "name,sku,quantity,price\nJob Item,JOB-001,3,4.50\n"
+        response = client.post("/api/Jobs/import", content=feed, headers={"Content-Type": "text/csv"})
+        assert response.status_code == 202
+        job = wait_for_job(response.json()["id"])
+        assert job["status"] == 2
+        assert job["progress"] == 1.0
+        assert job["result"]["created"] == 1
+        assert client.get("/api/Products/sku/JOB-001").status_code == 200
+
+
+    def test_export_job_download(self):
+        """Test downloading the result of an export job"""
+        response = client.post("/api/Jobs/export")
+        assert response.status_code == 202
+        job = wait_for_job(response.json()["id"])
+        assert job["result"]["products"] == len(db.get_all_products())
+        
+        download = client.get(f"/api/Jobs/{job['id']}/download")
+        assert download.status_code == 200
+        assert len(download.text.splitlines()) == job["result"]["products"]
+
+
+    def test_reindex_job_has_no_download(self):
+        """Test that only export jobs can be downloaded"""
+        job = wait_for_job(client.post("/api/Jobs/reindex").json()["id"])
+        assert job["result"]["repaired"] == 0
+        assert client.get(f"/api/Jobs/{job['id']}/download").status_code == 409
+
+
+    def test_job_not_found(self):
+        """Test polling and cancelling a job that does not exist"""
+        assert client.get("/api/Jobs/99999").status_code == 404
+        assert client.delete("/api/Jobs/99999").status_code == 404
+
+
+class TestRangeQueries:
+    def test_price_range(self):
+        """Test getting products within a price range, cheapest first"""
+        response = client.get("/api/Products/range/price?min=20&max=50")
+        assert response.status_code == 200
+        prices = [product["price"] for product in response.json()]
+        assert prices == sorted(prices)
+        assert all(20 <= price <= 50 for price in prices)
+
+
+    def test_top_quantity(self):
+        """Test getting the best-stocked products"""
+        response = client.get("/api/Products/range/quantity?descending=true&limit=3&fields=id,quantity")
+        assert response.status_code == 200
+        quantities = [product["quantity"] for product in response.json()]
+        assert quantities == sorted((p.quantity for p in db.get_all_products()), reverse=True)[:3]
+
+
+    def test_range_unknown_field(self):
+        """Test that only indexed fields can be queried"""
+        response = client.get("/api/Products/range/name")
+        assert response.status_code == 422
+
+
+class TestLowStock:
+    def test_low_stock_products(self):
+        """Test that products drop into the low-stock list when stock falls below threshold"""
+        response = client.post("/api/Products", json={
+            "name": "Reorder Me", "sku": "LOW-API-001", "quantity": 10, "price": 5.0, "reorderThreshold": 5
+        })
+        product_id = response.json()
+        assert product_id not in [p["id"] for p in client.get("/api/Products/low-stock").json()]
+        
+        client.patch(f"/api/Products/{product_id}/inventory", json={"quantity": 4})
+        low_stock = client.get("/api/Products/low-stock?fields=id,quantity").json()
+        assert {"id": product_id, "quantity": 4} in low_stock
+
+
+    def test_category_threshold(self):
+        """Test that a category threshold applies to products without their own"""
+        category_id = client.post("/api/ProductCategories", json={"name": "Low", "reorderThreshold": 100}).json()
+        product_id = client.post("/api/Products", json={
+            "name": "Inherits", "sku": "LOW-API-002", "quantity": 50, "price": 5.0, "categoryId": category_id
+        }).json()
+        assert product_id in [p["id"] for p in client.get("/api/Products/low-stock").json()]
+        assert client.get(f"/api/ProductCategories/{category_id}").json()["reorderThreshold"] == 100
+
+
+class TestStatusTransitions:
+    def test_invalid_transition(self):
+        """Test that a disallowed status change is rejected"""
+        product_id = client.post("/api/Products", json={
+            "name": "Stocked", "sku": "STS-API-001", "quantity": 5, "price": 1.0, "status": 0
+        }).json()
+        response = client.put(f"/api/Products/{product_id}/status", json={"status": ProductStatus.PreOrder})
+        assert response.status_code == 409
+
+
+    def test_schedule_status_change(self):
+        """Test scheduling, reading and cancelling a status change"""
+        product_id = client.post("/api/Products", json={
+            "name": "Coming Soon", "sku": "STS-API-002", "quantity": 0, "price": 1.0, "status": ProductStatus.PreOrder
+        }).json()
+        schedule = {"status": ProductStatus.InStock, "at": "2030-01-01T00:00:00Z"}
+        response = client.put(f"/api/Products/{product_id}/status/schedule", json=schedule)
+        assert response.status_code == 200
+        assert client.get(f"/api/Products/{product_id}/status/schedule").json()["status"] == ProductStatus.InStock
+        
+        assert client.delete(f"/api/Products/{product_id}/status/schedule").status_code == 200
+        assert client.get(f"/api/Products/{product_id}/status/schedule").status_code == 404
+
+
+class TestChangeFeed:
+    def test_deletion_in_change_feed(self):
+        """Test that a deleted product is reported by the change feed"""
+        product_id = client.post("/api/Products", json={
+            "name": "Short Lived", "sku": "CHG-API-001", "quantity": 1, "price": 1.0
+        }).json()
+        version = client.get("/api/Products/changes").json()["version"]
+        assert client.delete(f"/api/Products/{product_id}").status_code == 200
+        
+        feed = client.get(f"/api/Products/changes?since={version}").json()
+        assert [(c["productId"], c["deleted"]) for c in feed["changes"]] == [(product_id, True)]
+        assert feed["version"] > version
+        assert client.get(f"/api/Products/{product_id}").status_code == 404
+
+
+class TestCategoryHierarchy:
+    def test_subtree_products_and_totals(self):
+        """Test reading a category subtree and its aggregates"""
+        parent_id = client.post("/api/ProductCategories", json={"name": "Outdoors"}).json()
+        child_id = client.post("/api/ProductCategories", json={"name": "Tents", "parentId": parent_id}).json()
+        client.post("/api/Products", json={
+            "name": "Two Person Tent", "sku": "TREE-API-001", "quantity": 3, "price": 100.0, "categoryId": child_id
+        })
+        
+        descendants = client.get(f"/api/ProductCategories/{parent_id}/descendants").json()
+        assert [c["id"] for c in descendants] == [child_id]
+        products = client.get(f"/api/ProductCategories/{parent_id}/subtree/products").json()
+        assert [p["sku"] for p in products] == ["TREE-API-001"]
+        
+        parent = client.get(f"/api/ProductCategories/{parent_id}").json()
+        assert parent["productCount"] == 0
+        assert parent["subtreeProductCount"] == 1
+        assert parent["subtreeStockValue"] == 300.0
+
+
+    def test_category_cycle_rejected(self):
+        """Test that a category cannot become its own descendant"""
+        parent_id = client.post("/api/ProductCategories", json={"name": "Loop A"}).json()
+        child_id = client.post("/api/ProductCategories", json={"name": "Loop B", "parentId": parent_id}).json()
+        response = client.put(f"/api/ProductCategories/{parent_id}", json={
+            "name": "Loop A", "isActive": True, "parentId": child_id
+        })
+        assert response.status_code == 400
+
+
+class TestLocations:
+    def test_location_stock(self):
+        """Test setting stock at a location and reading it back"""
+        location_id = client.post("/api/Locations", json={"name": "Dock 7"}).json()["id"]
+        product_id = client.post("/api/Products", json={
+            "name": "Pallet", "sku": "LOC-API-001", "quantity": 2, "price": 1.0
+        }).json()
+        
+        response = client.put(f"/api/Products/{product_id}/locations/{location_id}", json={"quantity": 5})
+        assert response.status_code == 200
+        assert response.json()["quantity"] == 7
+        
+        stock = client.get(f"/api/Products/{product_id}/locations").json()
+        assert stock["unassigned"] == 2
+        assert stock["locations"] == [{"locationId": location_id, "quantity": 5}]
+        
+        matrix = client.post("/api/Locations/stock-matrix", json={"locationIds": [location_id], "skus": ["LOC-API-001"]})
+        assert matrix.json()["rows"][0]["quantities"] == [5]
+        
+        assert client.patch(f"/api/Products/{product_id}/inventory", json={"quantity": 1}).status_code == 409
+
+
+class TestMovements:
+    def test_movements_and_velocity(self):
+        """Test that adjustments show up in the ledger and in sales velocity"""
+        product_id = client.post("/api/Products", json={
+            "name": "Widget", "sku": "LED-API-001", "quantity": 10, "price": 1.0
+        }).json()
+        start = client.get("/api/Inventory/movements", params={"limit": 10000}).json()["next"]
+        
+        client.post(f"/api/Products/{product_id}/inventory/adjustments", json={"delta": -4})
+        client.post(f"/api/Products/{product_id}/inventory/adjustments", json={"delta": -1, "reason": 3})
+        
+        page = client.get("/api/Inventory/movements", params={"since": start}).json()
+        assert [(m["delta"], m["reason"]) for m in page["movements"]] == [(-4, 1), (-1, 3)]
+        
+        velocity = client.get(f"/api/Products/{product_id}/velocity", params={"days": 2}).json()
+        assert (velocity["unitsSold"], velocity["unitsPerDay"], velocity["daysOfStock"]) == (4, 2.0, 2.5)
+        assert client.get(f"/api/Products/{product_id}/velocity", params={"days": 0}).status_code == 422
+        assert client.get("/api/ProductCategories/999999/velocity").status_code == 404
+
+
+class TestPriceHistory:
+    def test_as_of_reads(self):
+        """Test reading a product's earlier price with asOf"""
+        product_id = client.post("/api/Products", json={
+            "name": "Kettle", "sku": "HIS-API-001", "quantity": 3, "price": 20.0
+        }).json()
+        before_change = datetime.now(timezone.utc).isoformat()
+        time.sleep(0.01)
+        client.put(f"/api/Products/{product_id}", json={
+            "name": "Kettle", "sku": "HIS-API-001", "quantity": 3, "price": 25.0, "status": 0
+        })
+        
+        past = client.get("/api/Products/sku/HIS-API-001", params={"asOf": before_change})
+        assert past.status_code == 200
+        assert past.json()["price"] == 20.0
+        assert client.get(f"/api/Products/{product_id}").json()["price"] == 25.0
+        assert client.get(f"/api/Products/{product_id}", params={"asOf": "2000-01-01T00:00:00Z"}).status_code == 404
+        
+        history = client.get(f"/api/Products/{product_id}/history").json()
+        assert [v["price"] for v in history] == [20.0, 25.0]
+        assert client.get("/api/Products/valuation", params={"asOf": before_change}).status_code == 200
+
+
+class TestTransactions:
+    def test_transaction(self):
+        """Test an all-or-nothing transaction over the API"""
+        product_id = client.post("/api/Products", json={
+            "name": "Mug", "sku": "TX-API-001", "quantity": 4, "price": 3.0
+        }).json()
+        
+        response = client.post("/api/Transactions", json={"operations": [
+            {"op": "updateProduct", "id": product_id, "price": 3.5},
+            {"op": "adjustInventory", "id": product_id, "delta": -1},
+        ]})
+        assert response.status_code == 200
+        assert response.json()["productIds"] == [product_id]
+        assert client.get(f"/api/Products/{product_id}").json()["quantity"] == 3
+        
+        response = client.post("/api/Transactions", json={"operations": [
+            {"op": "updateProduct", "id": product_id, "name": "Cup"},
+            {"op": "adjustInventory", "id": product_id, "delta": -10},
+        ]})
+        assert response.status_code == 409
+        assert client.get(f"/api/Products/{product_id}").json()["name"] == "Mug"
+        
+        response = client.post("/api/Transactions", json={"operations": [{"op": "setInventory", "id": product_id}]})
+        assert response.status_code == 400
+        
+        response = client.post("/api/Transactions", json={"operations": [
+            {"op": "updateProduct", "id": product_id, "quantity": 50},
+        ]})
+        assert response.status_code == 422
+        assert client.get(f"/api/Products/{product_id}").json()["quantity"] == 3
+
+
+class TestCategoryReorganisation:
+    def test_move_and_delete_with_reassignment(self):
+        """Test bulk moving products and deleting a category with reassignment"""
+        source = client.post("/api/ProductCategories", json={"name": "Move From", "isActive": True}).json()
+        target = client.post("/api/ProductCategories", json={"name": "Move To", "isActive": True}).json()
+        for i in range(3):
+            client.post("/api/Products", json={
+                "name": f"Moved {i}", "sku": f"MOVE-API-{i}", "quantity": 1, "price": 1.0, "categoryId": source
+            })
+        
+        response = client.post(f"/api/ProductCategories/{source}/products/move", json={"targetCategoryId": target})
+        assert response.json() == {"moved": 3}
+        assert client.get(f"/api/ProductCategories/{target}").json()["productCount"] == 3
+        
+        response = client.delete(f"/api/ProductCategories/{target}", params={"reassignTo": source})
+        assert response.status_code == 200
+        assert client.get(f"/api/ProductCategories/{source}").json()["productCount"] == 3
+        assert client.delete(f"/api/ProductCategories/{source}", params={"reassignTo": 1, "orphanProducts": True}).status_code == 400
+
+
+class TestRateLimiting:
+    def test_list_budget_is_enforced_per_api_key(self):
+        """Test that list endpoints have their own budget and exhausting it returns 429"""
+        main.rate_limiter = RateLimiter({"lookup": (100, 100), "list": (0.5, 2)})
+        try:
+            headers = {"X-API-Key": "client-1"}
+            responses = [client.get("/api/Products", headers=headers) for _ in range(2)]
+            assert [r.status_code for r in responses] == [200, 200]
+            response = client.get("/api/Products", headers=headers)
+            assert response.status_code == 429
+            assert response.headers["Retry-After"] == "2"
+            
+            assert client.get(f"/api/Products/{responses[0].json()[0]['id']}", headers=headers).status_code == 200
+            assert client.get("/api/Products", headers={"X-API-Key": "client-2"}).status_code == 200
+        finally:
+            main.rate_limiter = None
+
+
+class TestCompression:
+    def test_listing_is_compressed_and_follows_writes(self):
+        """Test gzip negotiation on the catalog listing and that cached bodies follow writes"""
+        response = client.get("/api/Products", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert len(response.json()) == len(db.get_all_products())
+        
+        response = client.get("/api/Products", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert response.json() == client.get("/api/Products", headers={"Accept-Encoding": "deflate"}).json()
+        
+        product = response.json()[0]
+        product["price"] = 123.0
+        client.put(f"/api/Products/{product['id']}", json=product)
+        response = client.get("/api/Products", headers={"Accept-Encoding": "gzip"})
+        assert response.json()[0]["price"] == 123.0
+        
+        # Small projections stay uncompressed
+        response = client.get("/api/Products", params={"fields": "id"}, headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+
+
+class TestBinaryFormats:
+    def test_msgpack_lists(self):
+        """Test that list endpoints answer in MessagePack when asked, with the JSON shape"""
+        products = client.get("/api/Products").json()
+        response = client.get("/api/Products", headers={"Accept": MSGPACK})
+        assert response.headers["Content-Type"] == MSGPACK
+        assert response.content == packb(products)
+        
+        response = client.get("/api/Products", params={"fields": "id"}, headers={"Accept": COLUMNAR})
+        assert response.headers["Content-Type"] == COLUMNAR
+        assert response.content == packb({"id": [p["id"] for p in products]})
+        
+        categories = client.get("/api/ProductCategories").json()
+        response = client.get("/api/ProductCategories", headers={"Accept": MSGPACK})
+        assert response.content == packb(categories)
+        
+        category_id = categories[0]["id"]
+        in_category = client.get(f"/api/Products/category/{category_id}").json()
+        response = client.get(f"/api/Products/category/{category_id}", headers={"Accept": MSGPACK})
+        assert response.content == packb(in_category)
+        
+        # Clients that do not ask for MessagePack by name keep getting JSON
+        response = client.get("/api/Products", headers={"Accept": "*/*"})
+        assert response.headers["Content-Type"] == "application/json"
+
+
+class TestSingleFlight:
+    def test_shared_list_reads_are_counted(self):
+        """Test that category listings go through single-flight and are reported"""
+        category_id = client.get("/api/ProductCategories").json()[0]["id"]
+        before = {e["endpoint"]: e for e in client.get("/api/Diagnostics/single-flight").json()["endpoints"]}
+        
+        products = client.get(f"/api/Products/category/{category_id}").json()
+        assert products == client.get(f"/api/ProductCategories/{category_id}/products").json()
+        assert all(p["categoryId"] == category_id for p in products)
+        
+        report = client.get("/api/Diagnostics/single-flight").json()
+        after = {e["endpoint"]: e for e in report["endpoints"]}
+        executions = before.get("GetProductsByCategory", {"executions": 0})["executions"]
+        assert after["GetProductsByCategory"]["executions"] == executions + 2
+        assert report["inFlight"] == 0
+
+
+class TestServingProfile:
+    def test_server_options_follow_settings(self):
+        """Test that run_app builds uvicorn options from the serving settings"""
+        import run_app
+        from settings import settings
+        
+        options = run_app.server_options()
+        assert (options["host"], options["port"]) == (settings.server_host, settings.port)
+        assert options["timeout_keep_alive"] == settings.server_keep_alive_seconds
+        assert "uds" not in options
+        
+        settings.server_uds = "/tmp/inventory.sock"
+        try:
+            options = run_app.server_options()
+            assert options["uds"] == "/tmp/inventory.sock" and "port" not in options
+        finally:
+            settings.server_uds = None
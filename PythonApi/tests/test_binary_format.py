@@ -0,0 +1,40 @@
+import struct
+from binary_format import COLUMNAR, MSGPACK, negotiate_format, pack_columns, pack_rows, packb
+from database import InMemoryDatabase
+from models import ProductStatus
+
+
+class TestBinaryFormat:
+    """Unit tests for MessagePack and columnar encoding"""
+    
+    def setup_method(self):
+        self.db = InMemoryDatabase()
+    
+    def test_msgpack_encoding(self):
+        """Test MessagePack encoding of values, rows and columns"""
+        assert packb({"a": [1, -1, 1.5, None, True, "hi", ProductStatus.OutOfStock]}) == (
+            b"\x81\xa1a\x97\x01\xff\xcb" + struct.pack(">d", 1.5) + b"\xc0\xc3\xa2hi\x01"
+        )
+        assert packb([300, -200, 2 ** 40]) == b"\x93\xcd\x01\x2c\xd1\xff\x38\xcf" + struct.pack(">Q", 2 ** 40)
+        
+        rows = [{"id": 1, "quantity": 300, "name": "a"}, {"id": 2, "quantity": 5, "name": None}]
+        assert pack_rows(rows, ["id", "quantity", "name"]) == packb(rows)
+        # Whole numeric columns share one width
+        assert pack_columns(rows, ["id", "quantity", "name"]) == (
+            b"\x83\xa2id\x92\x01\x02\xa8quantity\x92\xcd\x01\x2c\xcd\x00\x05\xa4name\x92\xa1a\xc0"
+        )
+        
+        product_id = self.db.create_product("Widget", "BIN-001", 3, 2.5)
+        items = [self.db.get_product_item_by_id(product_id)]
+        assert pack_rows(items, ["sku", "price"]) == packb([{"sku": "BIN-001", "price": 2.5}])
+        assert pack_columns(items, ["sku", "price"]) == packb({"sku": ["BIN-001"], "price": [2.5]})
+    
+    def test_negotiate_format(self):
+        """Test that binary formats are only chosen when asked for by name"""
+        assert negotiate_format(None) is None
+        assert negotiate_format("*/*") is None
+        assert negotiate_format("application/msgpack") == MSGPACK
+        assert negotiate_format("application/x-msgpack") == MSGPACK
+        assert negotiate_format("application/json, application/msgpack") is None
+        assert negotiate_format("application/msgpack, application/json;q=0.5") == MSGPACK
+        assert negotiate_format(f"{COLUMNAR}, */*;q=0.1") == COLUMNAR
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from coalescing import SingleFlight
+
+
+class TestSingleFlight:
+    """Unit tests for sharing identical concurrent reads"""
+    
+    def test_single_flight_shares_concurrent_calls(self):
+        """Test that identical concurrent calls share one computation and errors reach them all"""
+        release = threading.Event()
+        calls = []
+        
+        def compute(value):
+            def run():
+                calls.append(value)
+                release.wait(5)
+                if value is None:
+                    raise ValueError("failed")
+                return value
+            return run
+        
+        async def run():
+            flight = SingleFlight()
+            shared = [asyncio.ensure_future(flight.run(("list", 1), compute("a"))) for _ in range(5)]
+            other = asyncio.ensure_future(flight.run(("list", 2), compute("b")))
+            failing = [asyncio.ensure_future(flight.run(("fail",), compute(None))) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            assert flight.in_flight() == 3
+            release.set()
+            results = await asyncio.gather(*shared, other)
+            errors = await asyncio.gather(*failing, return_exceptions=True)
+            return flight, results, errors
+        
+        flight, results, errors = asyncio.run(run())
+        assert results == ["a"] * 5 + ["b"]
+        assert all(isinstance(error, ValueError) for error in errors)
+        assert sorted(calls, key=str) == [None, "a", "b"]
+        assert (flight.executions["list"], flight.coalesced["list"]) == (2, 4)
+        assert (flight.executions["fail"], flight.coalesced["fail"]) == (1, 1)
+        assert flight.in_flight() == 0
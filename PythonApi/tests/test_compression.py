@@ -0,0 +1,67 @@
+import gzip
+import zlib
+from compression import EncodedResponseCache, negotiate_encoding
+from database import InMemoryDatabase
+
+
+class TestCompression:
+    """Unit tests for content-coding negotiation and the encoded response cache"""
+    
+    def setup_method(self):
+        self.db = InMemoryDatabase()
+    
+    def test_negotiate_encoding(self):
+        """Test choosing a content coding from Accept-Encoding"""
+        assert negotiate_encoding(None) is None
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("gzip, deflate, br") == "gzip"
+        assert negotiate_encoding("gzip;q=0.5, deflate") == "deflate"
+        assert negotiate_encoding("gzip;q=0, *") == "deflate"
+        assert negotiate_encoding("GZIP ; q=0.8") == "gzip"
+        assert negotiate_encoding("br") is None
+    
+    def test_encoded_response_cache(self):
+        """Test that bodies are rendered once per version and compressed once per coding"""
+        renders = []
+        
+        def render():
+            renders.append(self.db.version)
+            return self.db.version, b"x" * 2000
+        
+        cache = EncodedResponseCache(min_size=1000)
+        version = self.db.version
+        body, coding = cache.get("all", version, render, "gzip")
+        assert coding == "gzip" and gzip.decompress(body) == b"x" * 2000
+        assert cache.get("all", version, render, "gzip")[0] is body
+        assert zlib.decompress(cache.get("all", version, render, "deflate")[0]) == b"x" * 2000
+        assert cache.get("all", version, render) == (b"x" * 2000, None)
+        assert len(renders) == 1
+        
+        self.db.create_product("Widget", "ENC-001", 1, 1.0)
+        assert self.db.version > version
+        cache.get("all", self.db.version, render, "gzip")
+        assert len(renders) == 2
+        
+        small = EncodedResponseCache(min_size=10_000)
+        assert small.get("all", self.db.version, render, "gzip") == (b"x" * 2000, None)
+        
+        bounded = EncodedResponseCache(max_bytes=3000)
+        bounded.get("first", 1, lambda: (1, b"a" * 2000))
+        bounded.get("second", 1, lambda: (1, b"b" * 2000))
+        assert len(bounded) == 1 and bounded.cached_bytes == 2000
+    
+    def test_encoded_response_cache_lookup(self):
+        """Test that lookup only answers what is already rendered and compressed"""
+        cache = EncodedResponseCache(min_size=1000)
+        assert cache.lookup("all", 1, "gzip") is None
+        
+        cache.get("all", 1, lambda: (1, b"x" * 2000))
+        assert cache.lookup("all", 1) == (b"x" * 2000, None)
+        assert cache.lookup("all", 1, "gzip") is None
+        body, _ = cache.get("all", 1, lambda: (1, b"x" * 2000), "gzip")
+        assert cache.lookup("all", 1, "gzip") == (body, "gzip")
+        assert cache.lookup("all", 2, "gzip") is None
+        
+        # A slower render of an older version does not replace a newer body
+        cache.get("all", 3, lambda: (3, b"y" * 2000))
+        assert cache.get("all", 2, lambda: (2, b"z" * 2000)) == (b"y" * 2000, None)
@@ -1,312 +1,935 @@
-import pytest
-from database import InMemoryDatabase
-from models import ProductStatus
-
-
-class TestInMemoryDatabase:
-    """Unit tests for the InMemoryDatabase class"""
-    
-    def setup_method(self):
-        """Create a fresh database instance for each test"""
-        self.db = InMemoryDatabase()
-    
-    def test_initial_state(self):
-        """Test that database starts empty"""
-        products = self.db.get_all_products()
-        categories = self.db.get_all_categories()
-        assert products == []
-        assert categories == []
-    
-    def test_initialize_sample_data(self):
-        """Test that sample data initialization works"""
-        self.db.initialize_sample_data()
-        
-        products = self.db.get_all_products()
-        categories = self.db.get_all_categories()
-        
-        assert len(products) > 0
-        assert len(categories) == 5
-        
-        # Check first product has expected data
-        first_product = products[0]
-        assert first_product.name == "Wireless Bluetooth Headphones"
-        assert first_product.sku == "WBH-001"
-    
-    def test_create_category(self):
-        """Test creating a new category"""
-        category_id = self.db.create_category("Test Category", "Test description", True)
-        assert category_id == 1
-        
-        categories = self.db.get_all_categories()
-        assert len(categories) == 1
-        assert categories[0].id == 1
-        assert categories[0].name == "Test Category"
-        assert categories[0].description == "Test description"
-        assert categories[0].isActive == True
-    
-    def test_create_product(self):
-        """Test creating a new product"""
-        # First create a category
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        
-        # Create a product
-        product_id = self.db.create_product(
-            name="Test Product",
-            sku="TEST-001",
-            quantity=50,
-            price=29.99,
-            status=ProductStatus.ACTIVE,
-            description="A test product",
-            category_id=category_id
-        )
-        
-        assert product_id == 1
-        
-        products = self.db.get_all_products()
-        assert len(products) == 1
-        assert products[0].id == 1
-        assert products[0].name == "Test Product"
-        assert products[0].sku == "TEST-001"
-        assert products[0].quantity == 50
-        assert products[0].price == 29.99
-        assert products[0].status == ProductStatus.ACTIVE
-        assert products[0].categoryId == category_id
-    
-    def test_duplicate_sku_prevention(self):
-        """Test that duplicate SKUs are prevented"""
-        # Create category first
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        
-        # Create first product
-        self.db.create_product("Product 1", "DUPLICATE-SKU", 10, 19.99, ProductStatus.ACTIVE, "First product", category_id)
-        
-        # Try to create second product with same SKU
-        with pytest.raises(ValueError, match="SKU already exists"):
-            self.db.create_product("Product 2", "DUPLICATE-SKU", 20, 29.99, ProductStatus.ACTIVE, "Second product", category_id)
-    
-    def test_get_product_by_id(self):
-        """Test getting product by ID"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
-        
-        product = self.db.get_product_by_id(product_id)
-        assert product is not None
-        assert product.id == product_id
-        assert product.name == "Test Product"
-        
-        # Test non-existent product
-        non_existent = self.db.get_product_by_id(999)
-        assert non_existent is None
-    
-    def test_get_product_by_sku(self):
-        """Test getting product by SKU"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
-        
-        product = self.db.get_product_by_sku("TEST-001")
-        assert product is not None
-        assert product.sku == "TEST-001"
-        assert product.name == "Test Product"
-        
-        # Test non-existent SKU
-        non_existent = self.db.get_product_by_sku("NON-EXISTENT")
-        assert non_existent is None
-    
-    def test_get_products_by_status(self):
-        """Test getting products by status"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        
-        # Create products with different statuses
-        self.db.create_product("Active Product", "ACTIVE-001", 50, 29.99, ProductStatus.ACTIVE, "Active", category_id)
-        self.db.create_product("Discontinued Product", "DISC-001", 0, 19.99, ProductStatus.DISCONTINUED, "Discontinued", category_id)
-        self.db.create_product("Out of Stock Product", "OOS-001", 0, 39.99, ProductStatus.OUT_OF_STOCK, "Out of stock", category_id)
-        
-        active_products = self.db.get_products_by_status(ProductStatus.ACTIVE)
-        assert len(active_products) == 1
-        assert active_products[0].name == "Active Product"
-        
-        discontinued_products = self.db.get_products_by_status(ProductStatus.DISCONTINUED)
-        assert len(discontinued_products) == 1
-        assert discontinued_products[0].name == "Discontinued Product"
-    
-    def test_get_products_by_category(self):
-        """Test getting products by category"""
-        category1_id = self.db.create_category("Category 1", "First category", True)
-        category2_id = self.db.create_category("Category 2", "Second category", True)
-        
-        # Create products in different categories
-        self.db.create_product("Product 1", "PROD-001", 50, 29.99, ProductStatus.ACTIVE, "In category 1", category1_id)
-        self.db.create_product("Product 2", "PROD-002", 30, 19.99, ProductStatus.ACTIVE, "Also in category 1", category1_id)
-        self.db.create_product("Product 3", "PROD-003", 20, 39.99, ProductStatus.ACTIVE, "In category 2", category2_id)
-        
-        category1_products = self.db.get_products_by_category(category1_id)
-        assert len(category1_products) == 2
-        
-        category2_products = self.db.get_products_by_category(category2_id)
-        assert len(category2_products) == 1
-        assert category2_products[0].name == "Product 3"
-    
-    def test_update_product(self):
-        """Test updating a product"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        product_id = self.db.create_product("Original Product", "ORIG-001", 50, 29.99, ProductStatus.ACTIVE, "Original", category_id)
-        
-        # Update the product
-        success = self.db.update_product(
-            id=product_id,
-            name="Updated Product",
-            sku="UPDATED-001",
-            quantity=75,
-            price=39.99,
-            status=ProductStatus.OUT_OF_STOCK,
-            description="Updated description",
-            category_id=category_id
-        )
-        
-        assert success == True
-        
-        # Verify the update
-        updated_product = self.db.get_product_by_id(product_id)
-        assert updated_product.name == "Updated Product"
-        assert updated_product.sku == "UPDATED-001"
-        assert updated_product.quantity == 75
-        assert updated_product.price == 39.99
-        assert updated_product.status == ProductStatus.OUT_OF_STOCK
-        assert updated_product.description == "Updated description"
-    
-    def test_update_product_inventory(self):
-        """Test updating product inventory"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
-        
-        # Update inventory
-        success = self.db.update_product_inventory(product_id, 100)
-        assert success == True
-        
-        # Verify the update
-        product = self.db.get_product_by_id(product_id)
-        assert product.quantity == 100
-        
-        # Test updating non-existent product
-        success = self.db.update_product_inventory(999, 50)
-        assert success == False
-    
-    def test_delete_product(self):
-        """Test deleting a product"""
-        category_id = self.db.create_category("Electronics", "Electronics category", True)
-        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
-        
-        # Verify product exists
-        assert self.db.get_product_by_id(product_id) is not None
-        
-        # Delete the product
-        success = self.db.delete_product(product_id)
-        assert success == True
-        
-        # Verify product is deleted
-        assert self.db.get_product_by_id(product_id) is None
-        
-        # Test deleting non-existent product
-        success = self.db.delete_product(999)
-        assert success == False
-    
-    def test_update_category(self):
-        """Test updating a category"""
-        category_id = self.db.create_category("Original Category", "Original description", True)
-        
-        # Update the category
-        success = self.db.update_category(category_id, "Updated Category", "Updated description", False)
-        assert success == True
-        
-        # Verify the update
-        category = self.db.get_category_by_id(category_id)
-        assert category.name == "Updated Category"
-        assert category.description == "Updated description"
-        assert category.isActive == False
-        
-        # Test updating non-existent category
-        success = self.db.update_category(999, "Non-existent", "Should fail", True)
-        assert success == False
-    
-    def test_delete_category(self):
-        """Test deleting a category"""
-        category_id = self.db.create_category("Test Category", "Test description", True)
-        
-        # Verify category exists
-        assert self.db.get_category_by_id(category_id) is not None
-        
-        # Delete the category
-        success = self.db.delete_category(category_id)
-        assert success == True
-        
-        # Verify category is deleted
-        assert self.db.get_category_by_id(category_id) is None
-    
-    def test_delete_category_with_products(self):
-        """Test that deleting category with products fails"""
-        category_id = self.db.create_category("Category with Products", "Test description", True)
-        self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
-        
-        # Try to delete category with products
-        success = self.db.delete_category(category_id)
-        assert success == False
-        
-        # Verify category still exists
-        assert self.db.get_category_by_id(category_id) is not None
-    
-    def test_clear_data(self):
-        """Test clearing all data"""
-        # Add some data
-        self.db.initialize_sample_data()
-        
-        # Verify data exists
-        assert len(self.db.get_all_products()) > 0
-        assert len(self.db.get_all_categories()) > 0
-        
-        # Clear data
-        self.db.clear_data()
-        
-        # Verify data is cleared
-        assert len(self.db.get_all_products()) == 0
-        assert len(self.db.get_all_categories()) == 0
-    
-    def test_concurrent_access(self):
-        """Test thread safety of database operations"""
-        import threading
-        import time
-        
-        category_id = self.db.create_category("Test Category", "Test description", True)
-        results = []
-        
-        def create_products(thread_id):
-            for i in range(5):
-                try:
-                    product_id = self.db.create_product(
-                        f"Product {thread_id}-{i}",
-                        f"SKU-{thread_id}-{i}",
-                        10,
-                        19.99,
-                        ProductStatus.ACTIVE,
-                        f"Product from thread {thread_id}",
-                        category_id
-                    )
-                    results.append(product_id)
-                except ValueError:
-                    # SKU conflict, which is expected in concurrent scenarios
-                    pass
-                time.sleep(0.01)  # Small delay to increase chance of race conditions
-        
-        # Create multiple threads
-        threads = []
-        for i in range(3):
-            thread = threading.Thread(target=create_products, args=(i,))
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
-        
-        # Verify that some products were created successfully
-        products = self.db.get_all_products()
-        assert len(products) > 0
\ No newline at end of file
+from datetime import datetime, timezone
+import pytest
+from database import InMemoryDatabase, InsufficientStockError, InventoryChange, TransactionError
+from transitions import InvalidTransitionError
+from seeding import generate_catalog, load_catalog_file, save_catalog_file
+from models import MovementReason, ProductStatus, TransactionOperation
+
+
+class TestInMemoryDatabase:
+    """Unit tests for the InMemoryDatabase class"""
+    
+    def setup_method(self):
+        """Create a fresh database instance for each test"""
+        self.db = InMemoryDatabase()
+    
+    def test_initial_state(self):
+        """Test that database starts empty"""
+        products = self.db.get_all_products()
+        categories = self.db.get_all_categories()
+        assert products == []
+        assert categories == []
+    
+    def test_initialize_sample_data(self):
+        """Test that sample data initialization works"""
+        self.db.initialize_sample_data()
+        
+        products = self.db.get_all_products()
+        categories = self.db.get_all_categories()
+        
+        assert len(products) > 0
+        assert len(categories) == 5
+        
+        # Check first product has expected data
+        first_product = products[0]
+        assert first_product.name == "Wireless Bluetooth Headphones"
+        assert first_product.sku == "WBH-001"
+    
+    def test_create_category(self):
+        """Test creating a new category"""
+        category_id = self.db.create_category("Test Category", "Test description", True)
+        assert category_id == 1
+        
+        categories = self.db.get_all_categories()
+        assert len(categories) == 1
+        assert categories[0].id == 1
+        assert categories[0].name == "Test Category"
+        assert categories[0].description == "Test description"
+        assert categories[0].isActive == True
+    
+    def test_create_product(self):
+        """Test creating a new product"""
+        # First create a category
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        
+        # Create a product
+        product_id = self.db.create_product(
+            name="Test Product",
+            sku="TEST-001",
+            quantity=50,
+            price=29.99,
+            status=ProductStatus.ACTIVE,
+            description="A test product",
+            category_id=category_id
+        )
+        
+        assert product_id == 1
+        
+        products = self.db.get_all_products()
+        assert len(products) == 1
+        assert products[0].id == 1
+        assert products[0].name == "Test Product"
+        assert products[0].sku == "TEST-001"
+        assert products[0].quantity == 50
+        assert products[0].price == 29.99
+        assert products[0].status == ProductStatus.ACTIVE
+        assert products[0].categoryId == category_id
+    
+    def test_duplicate_sku_prevention(self):
+        """Test that duplicate SKUs are prevented"""
+        # Create category first
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        
+        # Create first product
+        self.db.create_product("Product 1", "DUPLICATE-SKU", 10, 19.99, ProductStatus.ACTIVE, "First product", category_id)
+        
+        # Try to create second product with same SKU
+        with pytest.raises(ValueError, match="SKU already exists"):
+            self.db.create_product("Product 2", "DUPLICATE-SKU", 20, 29.99, ProductStatus.ACTIVE, "Second product", category_id)
+    
+    def test_get_product_by_id(self):
+        """Test getting product by ID"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
+        
+        product = self.db.get_product_by_id(product_id)
+        assert product is not None
+        assert product.id == product_id
+        assert product.name == "Test Product"
+        
+        # Test non-existent product
+        non_existent = self.db.get_product_by_id(999)
+        assert non_existent is None
+    
+    def test_get_product_by_sku(self):
+        """Test getting product by SKU"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
+        
+        product = self.db.get_product_by_sku("TEST-001")
+        assert product is not None
+        assert product.sku == "TEST-001"
+        assert product.name == "Test Product"
+        
+        # Test non-existent SKU
+        non_existent = self.db.get_product_by_sku("NON-EXISTENT")
+        assert non_existent is None
+    
+    def test_get_products_by_status(self):
+        """Test getting products by status"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        
+        # Create products with different statuses
+        self.db.create_product("Active Product", "ACTIVE-001", 50, 29.99, ProductStatus.ACTIVE, "Active", category_id)
+        self.db.create_product("Discontinued Product", "DISC-001", 0, 19.99, ProductStatus.DISCONTINUED, "Discontinued", category_id)
+        self.db.create_product("Out of Stock Product", "OOS-001", 0, 39.99, ProductStatus.OUT_OF_STOCK, "Out of stock", category_id)
+        
+        active_products = self.db.get_products_by_status(ProductStatus.ACTIVE)
+        assert len(active_products) == 1
+        assert active_products[0].name == "Active Product"
+        
+        discontinued_products = self.db.get_products_by_status(ProductStatus.DISCONTINUED)
+        assert len(discontinued_products) == 1
+        assert discontinued_products[0].name == "Discontinued Product"
+    
+    def test_get_products_by_category(self):
+        """Test getting products by category"""
+        category1_id = self.db.create_category("Category 1", "First category", True)
+        category2_id = self.db.create_category("Category 2", "Second category", True)
+        
+        # Create products in different categories
+        self.db.create_product("Product 1", "PROD-001", 50, 29.99, ProductStatus.ACTIVE, "In category 1", category1_id)
+        self.db.create_product("Product 2", "PROD-002", 30, 19.99, ProductStatus.ACTIVE, "Also in category 1", category1_id)
+        self.db.create_product("Product 3", "PROD-003", 20, 39.99, ProductStatus.ACTIVE, "In category 2", category2_id)
+        
+        category1_products = self.db.get_products_by_category(category1_id)
+        assert len(category1_products) == 2
+        
+        category2_products = self.db.get_products_by_category(category2_id)
+        assert len(category2_products) == 1
+        assert category2_products[0].name == "Product 3"
+    
+    def test_update_product(self):
+        """Test updating a product"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        product_id = self.db.create_product("Original Product", "ORIG-001", 50, 29.99, ProductStatus.ACTIVE, "Original", category_id)
+        
+        # Update the product
+        success = self.db.update_product(
+            id=product_id,
+            name="Updated Product",
+            sku="UPDATED-001",
+            quantity=75,
+            price=39.99,
+            status=ProductStatus.OUT_OF_STOCK,
+            description="Updated description",
+            category_id=category_id
+        )
+        
+        assert success == True
+        
+        # Verify the update
+        updated_product = self.db.get_product_by_id(product_id)
+        assert updated_product.name == "Updated Product"
+        assert updated_product.sku == "UPDATED-001"
+        assert updated_product.quantity == 75
+        assert updated_product.price == 39.99
+        assert updated_product.status == ProductStatus.OUT_OF_STOCK
+        assert updated_product.description == "Updated description"
+    
+    def test_update_product_inventory(self):
+        """Test updating product inventory"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
+        
+        # Update inventory
+        success = self.db.update_product_inventory(product_id, 100)
+        assert success == True
+        
+        # Verify the update
+        product = self.db.get_product_by_id(product_id)
+        assert product.quantity == 100
+        
+        # Test updating non-existent product
+        success = self.db.update_product_inventory(999, 50)
+        assert success == False
+    
+    def test_delete_product(self):
+        """Test deleting a product"""
+        category_id = self.db.create_category("Electronics", "Electronics category", True)
+        product_id = self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
+        
+        # Verify product exists
+        assert self.db.get_product_by_id(product_id) is not None
+        
+        # Delete the product
+        success = self.db.delete_product(product_id)
+        assert success == True
+        
+        # Verify product is deleted
+        assert self.db.get_product_by_id(product_id) is None
+        
+        # Test deleting non-existent product
+        success = self.db.delete_product(999)
+        assert success == False
+    
+    def test_update_category(self):
+        """Test updating a category"""
+        category_id = self.db.create_category("Original Category", "Original description", True)
+        
+        # Update the category
+        success = self.db.update_category(category_id, "Updated Category", "Updated description", False)
+        assert success == True
+        
+        # Verify the update
+        category = self.db.get_category_by_id(category_id)
+        assert category.name == "Updated Category"
+        assert category.description == "Updated description"
+        assert category.isActive == False
+        
+        # Test updating non-existent category
+        success = self.db.update_category(999, "Non-existent", "Should fail", True)
+        assert success == False
+    
+    def test_delete_category(self):
+        """Test deleting a category"""
+        category_id = self.db.create_category("Test Category", "Test description", True)
+        
+        # Verify category exists
+        assert self.db.get_category_by_id(category_id) is not None
+        
+        # Delete the category
+        success = self.db.delete_category(category_id)
+        assert success == True
+        
+        # Verify category is deleted
+        assert self.db.get_category_by_id(category_id) is None
+    
+    def test_delete_category_with_products(self):
+        """Test that deleting category with products fails"""
+        category_id = self.db.create_category("Category with Products", "Test description", True)
+        self.db.create_product("Test Product", "TEST-001", 50, 29.99, ProductStatus.ACTIVE, "Test", category_id)
+        
+        # Try to delete category with products
+        success = self.db.delete_category(category_id)
+        assert success == False
+        
+        # Verify category still exists
+        assert self.db.get_category_by_id(category_id) is not None
+    
+    def test_clear_data(self):
+        """Test clearing all data"""
+        # Add some data
+        self.db.initialize_sample_data()
+        
+        # Verify data exists
+        assert len(self.db.get_all_products()) > 0
+        assert len(self.db.get_all_categories()) > 0
+        
+        # Clear data
+        self.db.clear_data()
+        
+        # Verify data is cleared
+        assert len(self.db.get_all_products()) == 0
+        assert len(self.db.get_all_categories()) == 0
+    
+    def test_concurrent_access(self):
+        """Test thread safety of database operations"""
+        import threading
+        import time
+        
+        category_id = self.db.create_category("Test Category", "Test description", True)
+        results = []
+        
+        def create_products(thread_id):
+            for i in range(5):
+                try:
+                    product_id = self.db.create_product(
+                        f"Product {thread_id}-{i}",
+                        f"SKU-{thread_id}-{i}",
+                        10,
+                        19.99,
+                        ProductStatus.ACTIVE,
+                        f"Product from thread {thread_id}",
+                        category_id
+                    )
+                    results.append(product_id)
+                except ValueError:
+                    # SKU conflict, which is expected in concurrent scenarios
+                    pass
+                time.sleep(0.01)  # Small delay to increase chance of race conditions
+        
+        # Create multiple threads
+        threads = []
+        for i in range(3):
+            thread = threading.Thread(target=create_products, args=(i,))
+            threads.append(thread)
+            thread.start()
+        
+        # Wait for all threads to complete
+        for thread in threads:
+            thread.join()
+        
+        # Verify that some products were created successfully
+        products = self.db.get_all_products()
+        assert len(products) > 0
+    
+    def test_get_all_products_with_fields(self):
+        """Test that field projection returns only the requested columns"""
+        category_id = self.db.create_category("Projection", "Projection category", True)
+        product_id = self.db.create_product("Projected Product", "PROJ-001", 12, 9.99, ProductStatus.InStock, "Projected", category_id)
+        
+        rows = self.db.get_all_products(fields=["id", "sku", "quantity"])
+        row = next(r for r in rows if r["id"] == product_id)
+        assert row == {"id": product_id, "sku": "PROJ-001", "quantity": 12}
+        
+        rows = self.db.get_products_by_category(category_id, fields=["sku", "categoryName"])
+        assert rows == [{"sku": "PROJ-001", "categoryName": "Projection"}]
+        
+        assert self.db.get_product_item_by_sku("PROJ-001", fields=["id"]) == {"id": product_id}
+        assert self.db.get_product_item_by_id(product_id).categoryName == "Projection"
+    
+    def test_lookup_products(self):
+        """Test resolving several ids and SKUs in one call"""
+        category_id = self.db.create_category("Lookup", "Lookup category", True)
+        first_id = self.db.create_product("First", "LOOK-001", 5, 1.99, ProductStatus.InStock, None, category_id)
+        second_id = self.db.create_product("Second", "LOOK-002", 6, 2.99, ProductStatus.InStock, None, category_id)
+        
+        items, missing_ids, missing_skus = self.db.lookup_products(
+            ids=[first_id, 999], skus=["LOOK-002", "LOOK-001", "MISSING"])
+        
+        assert [item.id for item in items] == [first_id, second_id]
+        assert all(item.categoryName == "Lookup" for item in items)
+        assert missing_ids == [999]
+        assert missing_skus == ["MISSING"]
+    
+    def test_update_product_sku_reindexed(self):
+        """Test that changing a SKU moves the product in the SKU index"""
+        product_id = self.db.create_product("Renamed", "OLD-SKU", 5, 1.99, ProductStatus.InStock)
+        self.db.update_product(product_id, "Renamed", "NEW-SKU", 5, 1.99, ProductStatus.InStock)
+        
+        assert self.db.get_product_by_sku("OLD-SKU") is None
+        assert self.db.get_product_by_sku("NEW-SKU").id == product_id
+        
+        # The old SKU is free again
+        other_id = self.db.create_product("Other", "OLD-SKU", 1, 1.99, ProductStatus.InStock)
+        assert self.db.get_product_by_sku("OLD-SKU").id == other_id
+    
+    def test_category_rename_refreshes_product_items(self):
+        """Test that renaming a category is reflected in cached product views"""
+        category_id = self.db.create_category("Before", "Rename me", True)
+        product_id = self.db.create_product("Cached", "CACHE-001", 5, 1.99, ProductStatus.InStock, None, category_id)
+        
+        assert self.db.get_product_item_by_id(product_id).categoryName == "Before"
+        
+        self.db.update_category(category_id, "After", "Renamed", True)
+        
+        assert self.db.get_product_item_by_id(product_id).categoryName == "After"
+        assert self.db.get_products_by_category(category_id)[0].categoryName == "After"
+    
+    def test_product_count_follows_category_changes(self):
+        """Test that category product counts track moves between categories"""
+        source_id = self.db.create_category("Source", None, True)
+        target_id = self.db.create_category("Target", None, True)
+        product_id = self.db.create_product("Mover", "MOVE-001", 5, 1.99, ProductStatus.InStock, None, source_id)
+        
+        self.db.update_product(product_id, "Mover", "MOVE-001", 5, 1.99, ProductStatus.InStock, None, target_id)
+        
+        assert self.db.get_category_item_by_id(source_id).productCount == 0
+        assert self.db.get_category_item_by_id(target_id).productCount == 1
+        assert self.db.get_products_by_category(source_id) == []
+        assert self.db.get_product_item_by_id(product_id).categoryName == "Target"
+        assert self.db.delete_category(source_id) == True
+    
+    def test_category_created_after_its_products(self):
+        """Test that products already pointing at a new category id pick up its name"""
+        product_id = self.db.create_product("Early", "EARLY-001", 3, 2.0, ProductStatus.InStock, None, 2)
+        assert self.db.get_product_item_by_id(product_id).categoryName is None
+        self.db.create_category("First")
+        version = self.db.version
+        
+        category_id = self.db.create_category("Second")
+        
+        assert category_id == 2
+        assert self.db.version > version
+        assert self.db.get_product_item_by_id(product_id).categoryName == "Second"
+        assert self.db.get_all_products()[0].categoryName == "Second"
+        assert self.db.get_changes(version).changes[0].product.categoryName == "Second"
+    
+    def test_reserve_confirm_and_release(self):
+        """Test that holds reduce availability until confirmed or released"""
+        product_id = self.db.create_product("Held", "HOLD-001", 10, 5.00, ProductStatus.InStock)
+        
+        first = self.db.reserve_inventory(product_id, 4, 60)
+        second = self.db.reserve_inventory(product_id, 3, 60)
+        availability = self.db.get_product_availability(product_id)
+        assert (availability.reserved, availability.available) == (7, 3)
+        
+        with pytest.raises(ValueError, match="available"):
+            self.db.reserve_inventory(product_id, 4, 60)
+        
+        assert self.db.confirm_reservation(first.id) == True
+        assert self.db.release_reservation(second.id) == True
+        assert self.db.get_product_by_id(product_id).quantity == 6
+        assert self.db.get_product_availability(product_id).available == 6
+        
+        # Holds can only be settled once
+        assert self.db.confirm_reservation(first.id) == False
+        assert self.db.release_reservation(second.id) == False
+    
+    def test_confirm_after_stock_fell_below_hold(self):
+        """Test that a hold is not confirmed for less than it reserved"""
+        product_id = self.db.create_product("Held", "HOLD-002", 10, 5.00, ProductStatus.InStock)
+        reservation = self.db.reserve_inventory(product_id, 6, 60)
+        self.db.update_product_inventory(product_id, 4)
+        
+        with pytest.raises(InsufficientStockError):
+            self.db.confirm_reservation(reservation.id)
+        assert self.db.get_product_by_id(product_id).quantity == 4
+        assert self.db.get_reservation(reservation.id) is not None
+        
+        self.db.adjust_product_inventory(product_id, 2)
+        assert self.db.confirm_reservation(reservation.id) == True
+        assert self.db.get_product_by_id(product_id).quantity == 0
+    
+    def test_reservation_expiry(self):
+        """Test that expired holds are reclaimed"""
+        now = [1000.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        product_id = db.create_product("Expiring", "EXP-001", 5, 5.00, ProductStatus.InStock)
+        
+        short = db.reserve_inventory(product_id, 2, 10)
+        long = db.reserve_inventory(product_id, 3, 100)
+        assert db.get_product_availability(product_id).available == 0
+        
+        now[0] += 50
+        assert db.expire_reservations() == 1
+        assert db.get_reservation(short.id) is None
+        assert db.confirm_reservation(short.id) == False
+        assert db.get_product_availability(product_id).available == 2
+        
+        now[0] += 100
+        assert db.get_reservation(long.id) is None
+        assert db.get_product_availability(product_id).reserved == 0
+    
+    def test_apply_inventory_batch(self):
+        """Test that a batch of stock writes reports the quantity after each change"""
+        product_id = self.db.create_product("Hot", "HOT-001", 10, 5.00, ProductStatus.InStock)
+        
+        results = self.db.apply_inventory_batch(product_id, [
+            InventoryChange(-4, is_delta=True),
+            InventoryChange(-20, is_delta=True),
+            InventoryChange(3, is_delta=True),
+            InventoryChange(0),
+        ])
+        
+        assert results[0] == 6
+        assert isinstance(results[1], InsufficientStockError)
+        assert results[2:] == [9, 0]
+        product = self.db.get_product_by_id(product_id)
+        assert product.quantity == 0
+        assert product.status == ProductStatus.OutOfStock
+        assert self.db.apply_inventory_batch(999, [InventoryChange(1)]) is None
+    
+    def test_bulk_load_synthetic_catalog(self):
+        """Test loading a generated catalog through the bulk path"""
+        categories, products = generate_catalog(products=2000, categories=20, seed=7)
+        self.db.bulk_load(categories, products)
+        
+        counts = sorted((c.productCount for c in self.db.get_all_categories()), reverse=True)
+        assert len(counts) == 20
+        assert sum(counts) == 2000
+        assert counts[0] > 5 * counts[-1]  # Category sizes are skewed
+        
+        product = self.db.get_product_by_sku(products[0].sku)
+        assert product.id == products[0].id
+        assert self.db.create_product("After Bulk", "AFTER-001", 1, 1.0) == 2001
+        
+        with pytest.raises(ValueError, match="already exists"):
+            self.db.bulk_load([], [products[0]])
+    
+    def test_catalog_file_round_trip(self, tmp_path):
+        """Test that a saved catalog file loads back into an empty store"""
+        path = str(tmp_path / "catalog.json")
+        save_catalog_file(path, generate_catalog(products=50, categories=5))
+        
+        self.db.bulk_load(*load_catalog_file(path))
+        
+        assert len(self.db.get_all_products()) == 50
+        assert len(self.db.get_all_categories()) == 5
+    
+    def test_catalog_snapshot_restores_store(self, tmp_path):
+        """Test that a snapshot of the store, as written on shutdown, restores it"""
+        path = str(tmp_path / "snapshot.json")
+        parent = self.db.create_category("Parent")
+        child = self.db.create_category("Child", parent_id=parent)
+        self.db.create_product("Kept", "SNAP-001", 3, 1.5, category_id=child)
+        save_catalog_file(path, self.db.get_catalog())
+        assert [entry.name for entry in tmp_path.iterdir()] == ["snapshot.json"]
+        
+        restored = InMemoryDatabase()
+        restored.bulk_load(*load_catalog_file(path))
+        assert restored.get_all_products() == self.db.get_all_products()
+        assert restored.get_category_item_by_id(parent).subtreeProductCount == 1
+    
+    def test_reindex_repairs_stale_index(self):
+        """Test that reindexing restores index entries that went out of sync"""
+        self.db.initialize_sample_data()
+        product = self.db.get_product_by_id(1)
+        self.db._products_by_sku.pop(product.sku)
+        
+        assert self.db.reindex_products(self.db.get_product_ids()) == 1
+        assert self.db.get_product_by_sku(product.sku).id == 1
+    
+    def test_products_in_range(self):
+        """Test price range and top-k queries served from the sorted indexes"""
+        self.db.initialize_sample_data()
+        products = self.db.get_all_products()
+        
+        in_range = self.db.get_products_in_range("price", 20, 50)
+        expected = sorted((p for p in products if 20 <= p.price <= 50), key=lambda p: (p.price, p.id))
+        assert [p.id for p in in_range] == [p.id for p in expected]
+        
+        top = self.db.get_products_in_range("quantity", limit=2, descending=True)
+        assert [p.quantity for p in top] == sorted((p.quantity for p in products), reverse=True)[:2]
+    
+    def test_range_index_follows_changes(self):
+        """Test that the sorted indexes are maintained on update, inventory change and delete"""
+        cheap = self.db.create_product("Cheap", "RNG-001", 5, 1.0)
+        pricey = self.db.create_product("Pricey", "RNG-002", 9, 100.0)
+        
+        self.db.update_product(cheap, "Cheap", "RNG-001", 5, 200.0, ProductStatus.InStock)
+        self.db.update_product_inventory(pricey, 0)
+        
+        assert [p.id for p in self.db.get_products_in_range("price", minimum=150)] == [cheap]
+        assert [p.id for p in self.db.get_products_in_range("quantity", maximum=0)] == [pricey]
+        
+        self.db.delete_product(cheap)
+        assert self.db.get_products_in_range("price") == [self.db.get_product_item_by_id(pricey)]
+    
+    def test_low_stock_tracking(self):
+        """Test the below-threshold set and the events emitted on crossings"""
+        events = []
+        self.db.add_low_stock_listener(events.append)
+        category = self.db.create_category("Fasteners", reorder_threshold=10)
+        bolt = self.db.create_product("Bolt", "LOW-001", 20, 0.1, category_id=category)
+        nut = self.db.create_product("Nut", "LOW-002", 20, 0.1, category_id=category, reorder_threshold=5)
+        
+        self.db.update_product_inventory(bolt, 9)
+        self.db.update_product_inventory(nut, 9)
+        assert [p.id for p in self.db.get_low_stock_products()] == [bolt]
+        
+        self.db.adjust_product_inventory(nut, -5)
+        self.db.update_category(category, "Fasteners", reorder_threshold=None)
+        assert [p.id for p in self.db.get_low_stock_products()] == [nut]
+        assert [(e.productId, e.belowThreshold) for e in events] == [(bolt, True), (nut, True), (bolt, False)]
+        
+        self.db.delete_product(nut)
+        assert self.db.get_low_stock_products() == []
+    
+    def test_status_transitions(self):
+        """Test that status changes follow the transition rules and keep the buckets current"""
+        product_id = self.db.create_product("Widget", "STS-001", 1, 5.00, ProductStatus.InStock)
+        
+        with pytest.raises(InvalidTransitionError):
+            self.db.change_product_status(product_id, ProductStatus.PreOrder)
+        
+        self.db.update_product_inventory(product_id, 0)
+        assert [p.id for p in self.db.get_products_by_status(ProductStatus.OutOfStock)] == [product_id]
+        assert self.db.get_products_by_status(ProductStatus.InStock) == []
+        
+        assert self.db.change_product_status(product_id, ProductStatus.PreOrder) == True
+        self.db.update_product_inventory(product_id, 0)
+        assert self.db.get_product_by_id(product_id).status == ProductStatus.PreOrder
+        assert self.db.change_product_status(999, ProductStatus.InStock) == False
+    
+    def test_scheduled_status_change(self):
+        """Test that a scheduled transition fires once its time has come"""
+        now = [1000.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        product_id = db.create_product("Launch", "STS-002", 0, 5.00, ProductStatus.PreOrder)
+        release = datetime.fromtimestamp(1060, tz=timezone.utc)
+        
+        assert db.schedule_status_change(product_id, ProductStatus.InStock, release).at == release
+        assert db.apply_scheduled_status_changes() == 0
+        
+        now[0] += 60
+        assert db.apply_scheduled_status_changes() == 1
+        assert [p.id for p in db.get_products_by_status(ProductStatus.InStock)] == [product_id]
+        assert db.get_scheduled_status_change(product_id) is None
+    
+    def test_change_feed(self):
+        """Test that updates and deletions show up once each, in version order"""
+        first = self.db.create_product("First", "CHG-001", 5, 1.00)
+        second = self.db.create_product("Second", "CHG-002", 5, 1.00)
+        version = self.db.get_changes(0).version
+        
+        self.db.update_product_inventory(first, 3)
+        self.db.delete_product(second)
+        self.db.update_product_inventory(first, 2)
+        feed = self.db.get_changes(version)
+        
+        assert [(c.productId, c.deleted) for c in feed.changes] == [(second, True), (first, False)]
+        assert feed.changes[0].sku == "CHG-002"
+        assert feed.changes[1].product.quantity == 2
+        assert self.db.get_changes(feed.version).changes == []
+        
+        page = self.db.get_changes(version, limit=1)
+        assert page.hasMore == True
+        assert [c.productId for c in self.db.get_changes(page.version).changes] == [first]
+    
+    def test_tombstone_compaction(self):
+        """Test that tombstones past the retention window are reclaimed in batches"""
+        now = [1000.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        ids = [db.create_product(f"Gone {i}", f"TMB-{i:03d}", 1, 1.00) for i in range(5)]
+        for id in ids[:3]:
+            db.delete_product(id)
+        now[0] += 100
+        db.delete_product(ids[3])
+        
+        assert db.compact_tombstones(retention_seconds=50, max_items=2) == 2
+        assert db.compact_tombstones(retention_seconds=50, max_items=2) == 1
+        assert db.compact_tombstones(retention_seconds=50, max_items=2) == 0
+        assert db.get_tombstone_count() == 1
+        
+        feed = db.get_changes(0)
+        assert feed.resyncRequired == True
+        assert [c.productId for c in feed.changes] == [ids[4], ids[3]]
+    
+    def test_category_subtree_totals(self):
+        """Test that subtree aggregates follow product and category changes"""
+        root = self.db.create_category("Home")
+        kitchen = self.db.create_category("Kitchen", parent_id=root)
+        knives = self.db.create_category("Knives", parent_id=kitchen)
+        garden = self.db.create_category("Garden", parent_id=root)
+        knife = self.db.create_product("Chef Knife", "TREE-001", 4, 25.0, category_id=knives)
+        self.db.create_product("Rake", "TREE-002", 2, 10.0, category_id=garden)
+        
+        totals = self.db.get_category_item_by_id(root)
+        assert (totals.subtreeProductCount, totals.subtreeQuantity, totals.subtreeStockValue) == (2, 6, 120.0)
+        
+        self.db.update_product_inventory(knife, 1)
+        self.db.update_category(knives, "Knives", parent_id=garden)
+        assert self.db.get_category_item_by_id(kitchen).subtreeProductCount == 0
+        assert self.db.get_category_item_by_id(garden).subtreeStockValue == 45.0
+        assert self.db.get_category_item_by_id(root).subtreeQuantity == 3
+        
+        assert [c.id for c in self.db.get_category_descendants(root)] == [kitchen, garden, knives]
+        assert [p.sku for p in self.db.get_products_in_subtree(garden)] == ["TREE-001", "TREE-002"]
+    
+    def test_child_category_created_after_its_products(self):
+        """Test that a child category created after its products refreshes them and its ancestors"""
+        root = self.db.create_category("Home")
+        product_id = self.db.create_product("Early", "TREE-101", 3, 5.0, category_id=root + 1)
+        version = self.db.version
+        
+        child = self.db.create_category("Kitchen", parent_id=root)
+        
+        assert child == root + 1
+        assert self.db.version > version
+        assert self.db.get_product_item_by_id(product_id).categoryName == "Kitchen"
+        totals = self.db.get_category_item_by_id(root)
+        assert (totals.subtreeProductCount, totals.subtreeQuantity, totals.subtreeStockValue) == (1, 3, 15.0)
+    
+    def test_category_hierarchy_rules(self):
+        """Test that cycles, missing parents and deleting parents are rejected"""
+        root = self.db.create_category("Root")
+        child = self.db.create_category("Child", parent_id=root)
+        
+        with pytest.raises(ValueError):
+            self.db.update_category(root, "Root", parent_id=child)
+        with pytest.raises(ValueError):
+            self.db.create_category("Orphan", parent_id=999)
+        with pytest.raises(ValueError):
+            self.db.delete_category(root)
+        
+        assert self.db.delete_category(child) == True
+        assert self.db.delete_category(root) == True
+    
+    def test_location_stock_aggregates(self):
+        """Test that per-location stock and the total quantity stay consistent"""
+        east = self.db.create_location("East").id
+        west = self.db.create_location("West").id
+        product_id = self.db.create_product("Crate", "LOC-001", 10, 5.00)
+        
+        assert self.db.set_location_stock(product_id, east, 4) == 14
+        assert self.db.set_location_stock(product_id, west, 6) == 20
+        assert self.db.set_location_stock(product_id, east, 1) == 17
+        stock = self.db.get_product_locations(product_id)
+        assert (stock.quantity, stock.unassigned) == (17, 10)
+        assert [(l.locationId, l.quantity) for l in stock.locations] == [(east, 1), (west, 6)]
+        
+        with pytest.raises(InsufficientStockError):
+            self.db.update_product_inventory(product_id, 5)
+        with pytest.raises(InsufficientStockError):
+            self.db.adjust_product_inventory(product_id, -11)
+        with pytest.raises(ValueError):
+            self.db.set_location_stock(product_id, 999, 1)
+        assert [l.totalQuantity for l in self.db.get_locations()] == [1, 6]
+    
+    def test_stock_matrix(self):
+        """Test the location x product stock matrix"""
+        east = self.db.create_location("East").id
+        west = self.db.create_location("West").id
+        first = self.db.create_product("First", "MTX-001", 0, 1.00)
+        second = self.db.create_product("Second", "MTX-002", 0, 1.00)
+        self.db.set_location_stock(first, west, 3)
+        self.db.set_location_stock(second, east, 7)
+        
+        matrix = self.db.get_stock_matrix([west, east], [second], ["MTX-001", "MISSING"])
+        assert [(row.sku, row.quantities) for row in matrix.rows] == [("MTX-002", [0, 7]), ("MTX-001", [3, 0])]
+    
+    def test_movement_ledger(self):
+        """Test that every stock write is recorded with its reason"""
+        product_id = self.db.create_product("Bolt", "LED-001", 10, 0.10)
+        self.db.adjust_product_inventory(product_id, -3)
+        self.db.adjust_product_inventory(product_id, 5)
+        self.db.apply_inventory_batch(product_id, [
+            InventoryChange(-1, is_delta=True, reason=MovementReason.Adjustment),
+            InventoryChange(-100, is_delta=True),
+            InventoryChange(20),
+        ])
+        
+        page = self.db.get_movements(0, 4)
+        assert [(m.delta, m.reason) for m in page.movements] == [
+            (10, MovementReason.ProductUpdate), (-3, MovementReason.Sale),
+            (5, MovementReason.Restock), (-1, MovementReason.Adjustment),
+        ]
+        rest = self.db.get_movements(page.next)
+        assert [(m.delta, m.reason) for m in rest.movements] == [(9, MovementReason.Count)]
+        assert self.db.get_movements(rest.next).movements == []
+    
+    def test_sales_velocity(self):
+        """Test units-per-day and days-of-stock over hourly and daily windows"""
+        now = [100 * 86400.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        parent = db.create_category("Tools")
+        child = db.create_category("Saws", parent_id=parent)
+        product_id = db.create_product("Saw", "VEL-001", 100, 20.0, category_id=child)
+        db.adjust_product_inventory(product_id, -14)
+        now[0] += 86400
+        db.adjust_product_inventory(product_id, -7)
+        db.adjust_product_inventory(product_id, 50)
+        
+        velocity = db.get_product_velocity(product_id, 7)
+        assert (velocity.unitsSold, velocity.unitsPerDay, velocity.quantity) == (21, 3.0, 129)
+        assert velocity.daysOfStock == 43.0
+        assert db.get_product_velocity(product_id, 30).unitsSold == 21
+        assert db.get_category_velocity(parent, 1).unitsSold == 7
+        
+        now[0] += 10 * 86400
+        assert db.get_product_velocity(product_id, 7).daysOfStock is None
+        assert db.get_product_velocity(999, 7) is None
+    
+    def test_point_in_time_reads(self):
+        """Test reading prices and quantities as they were at a past time"""
+        now = [1000.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        product_id = db.create_product("Lamp", "HIS-001", 5, 10.0)
+        now[0] = 2000.0
+        db.update_product(product_id, "Lamp", "HIS-001", 5, 12.0, ProductStatus.InStock)
+        now[0] = 3000.0
+        db.adjust_product_inventory(product_id, -2)
+        
+        def as_of(timestamp):
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        
+        assert db.get_product_item_by_id(product_id, as_of=as_of(500)) is None
+        assert db.get_product_item_by_sku("HIS-001", ["price", "quantity"], as_of(1500)) == {"price": 10.0, "quantity": 5}
+        assert db.get_product_item_by_id(product_id, as_of=as_of(2500)).price == 12.0
+        assert db.get_product_item_by_id(product_id).quantity == 3
+        assert [(v.price, v.quantity) for v in db.get_price_history(product_id)] == [(10.0, 5), (12.0, 5), (12.0, 3)]
+        
+        unchanged = db.create_product("Shade", "HIS-002", 1, 4.0)
+        assert [p["sku"] for p in db.get_all_products(["sku"], as_of(2500))] == ["HIS-001"]
+        assert db.get_product_item_by_id(unchanged, as_of=as_of(3000)).price == 4.0
+    
+    def test_catalog_valuation_and_history_retention(self):
+        """Test past valuations including deleted products, and pruning old history"""
+        now = [1000.0]
+        db = InMemoryDatabase(clock=lambda: now[0])
+        kept = db.create_product("Kept", "VAL-001", 2, 5.0)
+        gone = db.create_product("Gone", "VAL-002", 3, 1.0)
+        now[0] = 2000.0
+        db.delete_product(gone)
+        db.update_product_inventory(kept, 4)
+        
+        then = db.get_catalog_valuation(datetime.fromtimestamp(1500, tz=timezone.utc))
+        assert (then.productsInStock, then.totalQuantity, then.totalValue) == (2, 5, 13.0)
+        assert db.get_catalog_valuation().totalValue == 20.0
+        
+        now[0] = 5000.0
+        while db.prune_price_history(retention_seconds=1000, max_items=1):
+            pass
+        assert [(v.price, v.quantity) for v in db.get_price_history(kept)] == [(5.0, 4)]
+        assert db.get_catalog_valuation(datetime.fromtimestamp(4500, tz=timezone.utc)).totalQuantity == 4
+        with pytest.raises(ValueError):
+            db.get_catalog_valuation(datetime.fromtimestamp(1500, tz=timezone.utc))
+    
+    def test_transaction_commits_all_operations(self):
+        """Test that a transaction applies every operation, each seeing the ones before"""
+        old = self.db.create_category("Old")
+        new = self.db.create_category("New")
+        first = self.db.create_product("First", "TX-001", 5, 2.0, category_id=old)
+        second = self.db.create_product("Second", "TX-002", 5, 3.0, category_id=old)
+        
+        result = self.db.apply_transaction([
+            # Swap the two SKUs through a temporary one
+            TransactionOperation(op="updateProduct", id=first, sku="TX-TMP"),
+            TransactionOperation(op="updateProduct", id=second, sku="TX-001", categoryId=new),
+            TransactionOperation(op="updateProduct", id=first, sku="TX-002"),
+            TransactionOperation(op="adjustInventory", id=second, delta=-2),
+            TransactionOperation(op="updateCategory", id=new, name="Renamed", parentId=old),
+        ])
+        
+        assert (result.productIds, result.categoryIds) == ([first, second], [new])
+        assert [(p["sku"], p["categoryName"]) for p in self.db.lookup_products([first, second], fields=["sku", "categoryName"])[0]] == [
+            ("TX-002", "Old"), ("TX-001", "Renamed")
+        ]
+        assert self.db.get_product_by_sku("TX-001").quantity == 3
+        assert self.db.get_category_item_by_id(old).subtreeQuantity == 8
+        assert [m.delta for m in self.db.get_movements().movements][-1] == -2
+    
+    def test_transaction_rolls_back_on_failure(self):
+        """Test that a failing operation undoes the earlier ones and their side effects"""
+        events = []
+        self.db.add_low_stock_listener(events.append)
+        parent = self.db.create_category("Parent")
+        child = self.db.create_category("Child")
+        product_id = self.db.create_product("Pan", "TX-010", 10, 4.0, category_id=child, reorder_threshold=5)
+        movements = len(self.db.get_movements().movements)
+        version = self.db.version
+        
+        with pytest.raises(TransactionError) as error:
+            self.db.apply_transaction([
+                TransactionOperation(op="setInventory", id=product_id, quantity=1),
+                TransactionOperation(op="updateProduct", id=product_id, name="Skillet", price=9.0),
+                TransactionOperation(op="updateCategory", id=child, parentId=parent),
+                TransactionOperation(op="adjustInventory", id=product_id, delta=-2),
+            ])
+        assert error.value.index == 3
+        assert isinstance(error.value.error, InsufficientStockError)
+        
+        product = self.db.get_product_by_id(product_id)
+        assert (product.name, product.price, product.quantity) == ("Pan", 4.0, 10)
+        assert self.db.get_category_by_id(child).parentId is None
+        assert self.db.get_category_item_by_id(parent).subtreeQuantity == 0
+        assert self.db.get_low_stock_products() == []
+        assert events == []
+        assert len(self.db.get_movements().movements) == movements
+        assert len(self.db.get_price_history(product_id)) == 0
+        assert self.db.version == version
+        assert self.db.get_changes(version).changes == []
+        
+        with pytest.raises(TransactionError):
+            self.db.apply_transaction([TransactionOperation(op="updateProduct", id=product_id, categoryId=999)])
+    
+    def test_transaction_operation_rejects_other_fields(self):
+        """Test that attributes an operation does not use are refused instead of dropped"""
+        with pytest.raises(ValueError, match="quantity"):
+            TransactionOperation(op="updateProduct", id=1, name="Pan", quantity=3)
+        with pytest.raises(ValueError, match="delta, parentId"):
+            TransactionOperation(op="updateProduct", id=1, delta=1, parentId=2)
+        with pytest.raises(ValueError, match="sku"):
+            TransactionOperation(op="updateCategory", id=1, sku="X")
+        
+        product_id = self.db.create_product("Pan", "TX-020", 10, 4.0)
+        self.db.apply_transaction([TransactionOperation(op="setInventory", id=product_id, quantity=7,
+                                                        reason=MovementReason.Adjustment)])
+        assert self.db.get_movements().movements[-1].reason == MovementReason.Adjustment
+    
+    def test_move_category_products(self):
+        """Test moving all products of a category keeps indexes and totals consistent"""
+        parent = self.db.create_category("Parent")
+        source = self.db.create_category("Source", reorder_threshold=10)
+        target = self.db.create_category("Target", parent_id=parent)
+        ids = [self.db.create_product(f"Item {i}", f"MOVE-{i}", 5, 2.0, category_id=source) for i in range(3)]
+        self.db.create_product("Resident", "MOVE-R", 1, 1.0, category_id=target)
+        assert len(self.db.get_low_stock_products()) == 3
+        
+        assert self.db.move_category_products(source, target) == 3
+        assert [p.id for p in self.db.get_products_by_category(target)][:3] == ids
+        assert self.db.get_products_by_category(source) == []
+        totals = self.db.get_category_item_by_id(parent)
+        assert (totals.subtreeProductCount, totals.subtreeQuantity, totals.subtreeStockValue) == (4, 16, 31.0)
+        assert self.db.get_category_item_by_id(source).subtreeProductCount == 0
+        assert self.db.get_product_item_by_id(ids[0]).categoryName == "Target"
+        assert self.db.get_low_stock_products() == []
+        
+        assert self.db.move_category_products(999, target) is None
+        with pytest.raises(ValueError):
+            self.db.move_category_products(target, 999)
+    
+    def test_delete_category_reassigning_products(self):
+        """Test deleting a category after reassigning or orphaning its products"""
+        first = self.db.create_category("First")
+        second = self.db.create_category("Second")
+        product_id = self.db.create_product("Thing", "DEL-001", 2, 1.0, category_id=first)
+        
+        with pytest.raises(ValueError):
+            self.db.delete_category(first, reassign_to=999)
+        assert self.db.delete_category(first, reassign_to=second) == True
+        assert self.db.get_product_by_id(product_id).categoryId == second
+        
+        assert self.db.delete_category(second) == False
+        assert self.db.delete_category(second, orphan_products=True) == True
+        assert self.db.get_product_by_id(product_id).categoryId is None
+        assert [p.id for p in self.db.get_products_by_category(None)] == [product_id]
+    
+    def test_delete_empty_category_checks_reassign_target(self):
+        """Test that an invalid reassignment target is refused even with nothing to move"""
+        empty = self.db.create_category("Empty")
+        
+        with pytest.raises(ValueError):
+            self.db.delete_category(empty, reassign_to=999)
+        with pytest.raises(ValueError):
+            self.db.delete_category(empty, reassign_to=empty)
+        assert self.db.get_category_by_id(empty) is not None
+    
+    def test_clear_data_moves_version_on(self):
+        """Test that clearing the store invalidates anything keyed by version"""
+        version = self.db.version
+        self.db.clear_data()
+        assert self.db.version > version
+        assert self.db.get_versioned_products() == (self.db.version, [])
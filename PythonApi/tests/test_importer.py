@@ -0,0 +1,71 @@
+from database import InMemoryDatabase
+from importer import CatalogImporter
+from models import ProductStatus
+
+
+class TestCatalogImporter:
+    """Unit tests for the streaming CSV and JSON-lines importer"""
+    
+    def setup_method(self):
+        self.db = InMemoryDatabase()
+    
+    def test_import_csv_in_small_chunks(self):
+        """Test that the importer handles records split across arbitrary chunks"""
+        feed = (
+            'name,sku,quantity,price,status,description,categoryId\r\n'
+            'Lamp,IMP-001,4,19.99,InStock,"Warm, dimmable\nlight",\r\n'
+            'Desk,IMP-002,not-a-number,99.00,0,,\r\n'
+            'Chair,IMP-003,2,49.50,PreOrder,,\r\n'
+            'Lamp v2,IMP-001,6,21.99,0,,\r\n'
+        ).encode()
+        importer = CatalogImporter(self.db, "csv", batch_size=2)
+        for start in range(0, len(feed), 7):
+            importer.feed(feed[start:start + 7])
+        result = importer.finish()
+        
+        assert (result.processed, result.created, result.updated, result.failed) == (4, 2, 1, 1)
+        assert result.errors[0].row == 2
+        assert self.db.get_product_by_sku("IMP-001").name == "Lamp v2"
+        assert self.db.get_product_by_sku("IMP-003").status == ProductStatus.PreOrder
+    
+    def test_import_caps_reported_errors(self):
+        """Test that only the first errors are kept while all failures are counted"""
+        importer = CatalogImporter(self.db, "jsonl", max_errors=2)
+        importer.feed(b'not json\n[]\n{"sku": "NO-NAME"}\n{"name": "Ok", "sku": "OK-1", "quantity": 1, "price": 1}')
+        result = importer.finish()
+        
+        assert (result.processed, result.created, result.failed) == (4, 1, 3)
+        assert len(result.errors) == 2
+        assert result.errorsTruncated == True
+    
+    def test_import_drops_overlong_records(self):
+        """Test that an unclosed quote fails its record once it outgrows the limit instead of buffering the feed"""
+        feed = (
+            'name,sku,quantity,price\n'
+            'Lamp,IMP-001,"4,19.99\n'
+            + 'filler line\n' * 20 +
+            'Chair,IMP-002,2,49.50\n'
+            + 'x' * 300 + '\n'
+            'Desk,IMP-003,1,99.00\n'
+        ).encode()
+        importer = CatalogImporter(self.db, "csv", max_record_length=100)
+        for start in range(0, len(feed), 16):
+            importer.feed(feed[start:start + 16])
+            assert len(importer._record) + len(importer._partial) <= 100 + 16
+        result = importer.finish()
+        
+        assert self.db.get_product_by_sku("IMP-001") is None
+        assert self.db.get_product_by_sku("IMP-002") is not None
+        assert self.db.get_product_by_sku("IMP-003") is not None
+        assert sum("longer than 100" in error.error for error in result.errors) == 2
+    
+    def test_import_rejects_invalid_transition(self):
+        """Test that an import row with a disallowed status change fails on its own"""
+        self.db.create_product("Widget", "STS-003", 5, 5.00, ProductStatus.InStock)
+        importer = CatalogImporter(self.db, "jsonl")
+        importer.feed(b'{"name": "Widget", "sku": "STS-003", "quantity": 5, "price": 5, "status": "PreOrder"}\n'
+                      b'{"name": "Other", "sku": "STS-004", "quantity": 5, "price": 5}\n')
+        result = importer.finish()
+        
+        assert (result.created, result.updated, result.failed) == (1, 0, 1)
+        assert result.errors[0].row == 1
@@ -0,0 +1,83 @@
+import tempfile
+import threading
+import time
+from database import InMemoryDatabase
+from jobs import JobManager, import_job, reindex_job
+from models import JobStatus
+
+
+def wait_for_status(manager: JobManager, id: int, status: JobStatus, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while manager.get(id).status != status:
+        assert time.monotonic() < deadline, f"Job {id} did not reach {status.name}"
+        time.sleep(0.001)
+
+
+class TestJobManager:
+    """Unit tests for the background job runner"""
+    
+    def setup_method(self):
+        self.db = InMemoryDatabase()
+    
+    def test_job_manager_runs_and_cancels(self):
+        """Test job completion, failure and cancellation of running work"""
+        manager = JobManager(max_workers=1)
+        self.db.initialize_sample_data()
+        try:
+            done = manager.submit("reindex", reindex_job(self.db))
+            failed = manager.submit("broken", lambda context: 1 / 0)
+            
+            started = threading.Event()
+            
+            def wait_for_cancel(context):
+                started.set()
+                context.cancelled.wait(5)
+                context.check_cancelled()
+                return {}
+            blocked = manager.submit("wait", wait_for_cancel)
+            assert started.wait(5)
+            manager.cancel(blocked.id)
+            manager.shutdown()
+            
+            assert manager.get(done.id).status == JobStatus.Succeeded
+            assert manager.get(done.id).result == {"products": len(self.db.get_all_products()), "repaired": 0}
+            assert manager.get(failed.id).status == JobStatus.Failed
+            assert manager.get(blocked.id).status == JobStatus.Cancelled
+        finally:
+            manager.shutdown()
+    
+    def test_job_manager_discards_jobs_that_never_ran(self):
+        """Test that import jobs cancelled or shut down while queued still close their feeds"""
+        manager = JobManager(max_workers=1)
+        try:
+            started = threading.Event()
+            
+            def block(context):
+                started.set()
+                context.cancelled.wait(5)
+                return {}
+            manager.submit("wait", block)
+            assert started.wait(5)
+            feeds = [tempfile.SpooledTemporaryFile(max_size=1) for _ in range(2)]
+            for feed in feeds:
+                feed.write(b"sku,name\n")
+            cancelled, pending = [manager.submit("import", import_job(self.db, feed, "csv"), discard=feed.close)
+                                  for feed in feeds]
+            
+            assert manager.cancel(cancelled.id).status == JobStatus.Cancelled
+            assert feeds[0].closed
+            assert not feeds[1].closed
+        finally:
+            manager.shutdown()
+        assert manager.get(pending.id).status == JobStatus.Cancelled
+        assert feeds[1].closed
+    
+    def test_job_manager_evicts_finished_jobs(self):
+        """Test that only the most recent finished jobs are kept"""
+        manager = JobManager(max_workers=1, max_finished=2)
+        ids = [manager.submit("noop", lambda context: {}).id for _ in range(3)]
+        wait_for_status(manager, ids[2], JobStatus.Succeeded)
+        manager.shutdown()
+        
+        assert manager.get(ids[0]) is None
+        assert manager.get(ids[1]).status == JobStatus.Succeeded
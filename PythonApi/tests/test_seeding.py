@@ -0,0 +1,27 @@
+import seeding
+from seeding import trusted_model
+from models import Product, ProductCategory, ProductStatus
+
+
+class TestTrustedModel:
+    """Unit tests for building models without validation"""
+    
+    def test_matches_validated_model(self):
+        """Test that trusted models equal validated ones and behave like them"""
+        values = {"id": 3, "name": "Kettle", "sku": "TM-001", "quantity": 4, "price": 19.5,
+                  "status": ProductStatus.InStock, "description": None, "categoryId": 2, "reorderThreshold": None}
+        
+        product = trusted_model(Product, dict(values))
+        
+        assert product == Product(**values)
+        assert product.model_fields_set == set(values)
+        product.quantity = 5
+        assert product.model_dump()["quantity"] == 5
+        assert product.model_copy(update={"price": 1.0}).price == 1.0
+    
+    def test_validated_fallback(self):
+        """Test that the fallback used after an incompatible pydantic upgrade builds the same models"""
+        values = {"id": 1, "name": "Tools", "description": None, "isActive": True, "reorderThreshold": None,
+                  "parentId": None}
+        
+        assert seeding._validated_model(ProductCategory, values) == trusted_model(ProductCategory, dict(values))
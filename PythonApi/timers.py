@@ -0,0 +1,61 @@
+import heapq
+import itertools
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimerHeap:
+    """Min-heap of keyed deadlines.
+    
+    Scheduling and popping are O(log n). Cancelled or rescheduled timers
+    stay in the heap and are skipped when they reach the top. The heap is
+    rebuilt once stale entries outnumber live ones. Not thread-safe; the
+    owner is expected to hold its own lock.
+    """
+    
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, float] = {}
+        self._sequence = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self._deadlines)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+    
+    def schedule(self, key: Hashable, deadline: float):
+        """Schedule `key` to fire at `deadline`, replacing any earlier timer for it"""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+        self._compact()
+    
+    def cancel(self, key: Hashable) -> bool:
+        if self._deadlines.pop(key, None) is None:
+            return False
+        self._compact()
+        return True
+    
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Remove and return every key whose deadline is at or before `now`"""
+        due = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                due.append(key)
+        return due
+    
+    def next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap:
+            deadline, _, key = heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline
+            heapq.heappop(heap)
+        return None
+    
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(deadline, next(self._sequence), key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,37 @@
+from typing import Dict, FrozenSet
+from models import ProductStatus
+
+InStock, OutOfStock = ProductStatus.InStock, ProductStatus.OutOfStock
+Discontinued, PreOrder = ProductStatus.Discontinued, ProductStatus.PreOrder
+
+# Statuses a product may move to from each status. Any status is valid for
+# a new product, and keeping the current status is always allowed.
+ALLOWED_TRANSITIONS: Dict[ProductStatus, FrozenSet[ProductStatus]] = {
+    InStock: frozenset({OutOfStock, Discontinued}),
+    OutOfStock: frozenset({InStock, PreOrder, Discontinued}),
+    PreOrder: frozenset({InStock, OutOfStock, Discontinued}),
+    # Relisting a discontinued product
+    Discontinued: frozenset({InStock, OutOfStock}),
+}
+
+
+class InvalidTransitionError(ValueError):
+    """Raised when a product cannot move from its current status to the requested one"""
+
+
+def check_transition(current: ProductStatus, target: ProductStatus):
+    if target != current and target not in ALLOWED_TRANSITIONS[current]:
+        raise InvalidTransitionError(f"Cannot change status from {current.name} to {target.name}")
+
+
+def stock_status(current: ProductStatus, quantity: int) -> ProductStatus:
+    """The status implied by a new stock level.
+    
+    Only InStock and OutOfStock follow the stock level; pre-order and
+    discontinued products keep their status whatever the quantity.
+    """
+    if current == InStock and quantity == 0:
+        return OutOfStock
+    if current == OutOfStock and quantity > 0:
+        return InStock
+    return current